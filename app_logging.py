@@ -0,0 +1,113 @@
+"""
+應用程式日誌設定
+以 QueueHandler / QueueListener 將日誌交由背景執行緒寫出，並提供 JSON 格式與重複警告的頻率限制
+"""
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord 的內建屬性，其餘屬性視為透過 extra 傳入的欄位
+_RESERVED_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """將日誌記錄輸出為單行 JSON，透過 extra 傳入的欄位會一併輸出"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """限制同一個呼叫位置在時間區間內輸出的記錄數，超過的記錄會被略過並在下次輸出時註明略過筆數
+
+    只套用於 max_level（含）以下的記錄，錯誤等級以上的記錄一律輸出。
+    """
+
+    def __init__(self, burst=5, interval=60.0, max_level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.burst <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                skipped = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+            else:
+                skipped = 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+            window[1] += 1
+        if skipped:
+            record.suppressed = skipped
+            record.msg = f'{record.msg}（前一區間略過 {skipped} 筆相同位置的訊息）'
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """將記錄原樣放入佇列，訊息與例外的格式化交由背景執行緒中的 handlers 進行
+
+    內建的 QueueHandler.prepare() 會在請求執行緒上先格式化訊息；同一行程內的佇列不需序列化，
+    因此直接傳遞記錄物件。
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _stop_listener(listener):
+    """結束時送出佇列中剩餘的記錄，已停止的 listener 不再重複停止"""
+    if getattr(listener, '_thread', None) is not None:
+        listener.stop()
+
+
+def configure_logging(level, handlers, log_format='text', warning_burst=5, warning_interval=60.0):
+    """將根日誌改為寫入佇列，由背景執行緒交給實際的 handlers 輸出，返回已啟動的 QueueListener"""
+    formatter = JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = BackgroundQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(warning_burst, warning_interval))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
@@ -0,0 +1,159 @@
+"""
+靜態資源預先壓縮工具
+為靜態資源與模型檔案產生 gzip / brotli 壓縮版本，供伺服器依 Accept-Encoding 直接傳送
+"""
+import os
+import sys
+import glob
+import gzip
+import shutil
+import argparse
+import threading
+import logging
+
+# brotli 為選用相依套件，未安裝時只產生 gzip 版本
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 值得壓縮的檔案類型（圖片等已壓縮格式不在此列）
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg', '.glb', '.gltf')
+
+# 依偏好順序排列的編碼與對應副檔名
+ENCODING_EXTENSIONS = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+# 離線產生時使用最高壓縮等級；請求時即時產生則使用較快的等級
+BEST_LEVELS = {'br': 11, 'gzip': 9}
+FAST_LEVELS = {'br': 5, 'gzip': 6}
+
+# 小於此大小的檔案壓縮效益有限
+MIN_COMPRESS_SIZE = 1024
+
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+_generation_locks = {}
+_generation_locks_lock = threading.Lock()
+
+def available_encodings():
+    """返回目前環境可產生的壓縮編碼（依偏好順序）"""
+    return [encoding for encoding in ENCODING_EXTENSIONS
+            if encoding != 'br' or BROTLI_AVAILABLE]
+
+def is_compressible(path):
+    """檢查檔案類型是否值得壓縮"""
+    return path.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+def get_variant_path(path, encoding):
+    """取得壓縮版本的檔案路徑"""
+    return path + ENCODING_EXTENSIONS[encoding]
+
+def is_variant_fresh(path, variant_path):
+    """檢查壓縮版本是否存在且不早於原始檔案"""
+    try:
+        return os.stat(variant_path).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+def _get_generation_lock(variant_path):
+    with _generation_locks_lock:
+        lock = _generation_locks.get(variant_path)
+        if lock is None:
+            lock = threading.Lock()
+            _generation_locks[variant_path] = lock
+        return lock
+
+def compress_file(path, encoding, level=None):
+    """產生單一檔案的壓縮版本，以暫存檔寫入後再原子替換"""
+    if level is None:
+        level = BEST_LEVELS[encoding]
+    variant_path = get_variant_path(path, encoding)
+    tmp_path = f'{variant_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        if encoding == 'gzip':
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as raw:
+                # 固定 mtime 讓相同內容產生相同的壓縮結果
+                with gzip.GzipFile(filename='', mode='wb', compresslevel=level,
+                                   fileobj=raw, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, _COPY_BUFFER_SIZE)
+        elif encoding == 'br':
+            if not BROTLI_AVAILABLE:
+                raise RuntimeError('brotli 套件未安裝')
+            compressor = brotli.Compressor(quality=level)
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(_COPY_BUFFER_SIZE), b''):
+                    dst.write(compressor.process(chunk))
+                dst.write(compressor.finish())
+        else:
+            raise ValueError(f'不支援的壓縮編碼: {encoding}')
+        os.replace(tmp_path, variant_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return variant_path
+
+def ensure_variant(path, encoding, level=None):
+    """確保壓縮版本存在且為最新，必要時產生；同一檔案同時只會有一個執行緒壓縮"""
+    variant_path = get_variant_path(path, encoding)
+    if is_variant_fresh(path, variant_path):
+        return variant_path
+    with _get_generation_lock(variant_path):
+        if not is_variant_fresh(path, variant_path):
+            compress_file(path, encoding, level)
+    return variant_path
+
+def default_asset_paths(root=PROJECT_ROOT):
+    """返回預設需要預先壓縮的資源檔案"""
+    paths = [os.path.join(root, name) for name in ('main.js', 'style.css', os.path.join('templates', 'index.html'))]
+    paths.extend(sorted(glob.glob(os.path.join(root, 'models', '*.glb'))))
+    return [path for path in paths if os.path.isfile(path)]
+
+def precompress_assets(paths, encodings=None, force=False):
+    """為多個檔案產生壓縮版本，返回每個檔案的大小報告"""
+    encodings = encodings or available_encodings()
+    report = []
+    for path in paths:
+        original_size = os.path.getsize(path)
+        sizes = {}
+        for encoding in encodings:
+            variant_path = get_variant_path(path, encoding)
+            if force or not is_variant_fresh(path, variant_path):
+                compress_file(path, encoding)
+            sizes[encoding] = os.path.getsize(variant_path)
+        report.append({'path': path, 'size': original_size, 'variants': sizes})
+    return report
+
+def main(argv=None):
+    """命令列進入點：預先產生靜態資源的壓縮版本"""
+    parser = argparse.ArgumentParser(description='為靜態資源與模型檔案產生 gzip / brotli 壓縮版本')
+    parser.add_argument('paths', nargs='*', help='要壓縮的檔案，預設為 main.js、style.css、templates/index.html 與 models/*.glb')
+    parser.add_argument('--force', action='store_true', help='即使壓縮版本已是最新也重新產生')
+    parser.add_argument('--encoding', action='append', choices=list(ENCODING_EXTENSIONS), help='只產生指定的編碼（可重複指定）')
+    args = parser.parse_args(argv)
+
+    encodings = args.encoding or available_encodings()
+    if 'br' in encodings and not BROTLI_AVAILABLE:
+        parser.error('brotli 套件未安裝，無法產生 .br 版本')
+    if not BROTLI_AVAILABLE:
+        print('brotli 套件未安裝，只產生 gzip 版本')
+
+    paths = args.paths or default_asset_paths()
+    for entry in precompress_assets(paths, encodings, force=args.force):
+        variants = ', '.join(
+            f'{encoding}: {size:,} bytes ({size / entry["size"]:.0%})' if entry['size'] else f'{encoding}: {size:,} bytes'
+            for encoding, size in entry['variants'].items()
+        )
+        print(f'{os.path.relpath(entry["path"], PROJECT_ROOT)}: {entry["size"]:,} bytes -> {variants}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+後端效能基準測試工具
+以多執行緒 WSGI 伺服器啟動應用程式，並以並行用戶端依指定速率送出請求，回報各路徑的吞吐量與延遲百分位數
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import http.client
+import logging
+
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = os.path.join(PROJECT_ROOT, 'benchmarks', 'baseline.json')
+
+# 預設量測的路徑：(名稱, 請求路徑, 額外標頭)
+DEFAULT_ROUTES = (
+    ('api_phones', '/api/phones', {}),
+    ('api_phone', '/api/phones/iphone_16_pro_max', {}),
+    ('api_search', '/api/phones/search?q=%E5%8B%95%E6%85%8B%E5%B3%B6', {}),
+    ('model_glb', '/models/iphone_16_pro_max.glb', {'Accept-Encoding': 'identity'}),
+    ('static_css', '/style.css', {'Accept-Encoding': 'gzip'}),
+)
+
+# 與基準比較的指標：延遲越高越差、吞吐量越低越差
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+THROUGHPUT_METRIC = 'rps'
+
+DEFAULT_TOLERANCE = 0.25
+# 延遲低於此毫秒數的差異視為量測雜訊
+DEFAULT_MIN_DELTA_MS = 2.0
+
+
+class BenchmarkServer:
+    """在背景執行緒中執行的多執行緒 WSGI 伺服器"""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self._server = make_server(host, port, app, threaded=True)
+        self.host = host
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._thread.join()
+        self._server.server_close()
+
+
+def percentile(sorted_values, fraction):
+    """以最近排名法計算已排序數列的百分位數"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_route(host, port, path, headers=None, requests=200, concurrency=8, rps=0.0):
+    """以並行用戶端對單一路徑送出請求並統計結果
+
+    rps 大於 0 時第 i 個請求排定在開始後 i / rps 秒送出，延遲自排定時間起算，
+    避免伺服器變慢時用戶端同步放慢而低估延遲；rps 為 0 時各用戶端盡快送出。
+    """
+    headers = headers or {}
+    latencies = []
+    errors = []
+    total_bytes = [0]
+    lock = threading.Lock()
+    next_index = [0]
+    started = time.perf_counter()
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            while True:
+                with lock:
+                    index = next_index[0]
+                    if index >= requests:
+                        return
+                    next_index[0] += 1
+                scheduled = started + index / rps if rps > 0 else None
+                if scheduled is not None:
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                request_start = scheduled if scheduled is not None else time.perf_counter()
+                try:
+                    conn.request('GET', path, headers=headers)
+                    response = conn.getresponse()
+                    body = response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    conn = http.client.HTTPConnection(host, port, timeout=30)
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - request_start
+                with lock:
+                    if status >= 400:
+                        errors.append(f'HTTP {status}')
+                    else:
+                        latencies.append(elapsed)
+                        total_bytes[0] += len(body)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': requests,
+        'errors': len(errors),
+        'duration_s': round(duration, 4),
+        'rps': round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+        'bytes': total_bytes[0],
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def run_benchmark(app, routes=DEFAULT_ROUTES, requests=200, concurrency=8, rps=0.0, warmup=10):
+    """啟動伺服器並依序量測每個路徑，返回 {名稱: 結果}"""
+    results = {}
+    with BenchmarkServer(app) as server:
+        for name, path, headers in routes:
+            if warmup:
+                run_route(server.host, server.port, path, headers, requests=warmup, concurrency=1)
+            results[name] = run_route(server.host, server.port, path, headers,
+                                      requests=requests, concurrency=concurrency, rps=rps)
+    return results
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """與基準結果比較，返回退步項目的說明清單"""
+    regressions = []
+    for name, expected in baseline.get('routes', {}).items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual['errors']:
+            regressions.append(f'{name}: {actual["errors"]} 個請求失敗')
+        for metric in LATENCY_METRICS:
+            if metric not in expected:
+                continue
+            limit = expected[metric] * (1 + tolerance)
+            if actual[metric] > limit and actual[metric] - expected[metric] > min_delta_ms:
+                regressions.append(f'{name}: {metric} {actual[metric]:.2f} > 基準 {expected[metric]:.2f}（容許 {limit:.2f}）')
+        if THROUGHPUT_METRIC in expected:
+            limit = expected[THROUGHPUT_METRIC] * (1 - tolerance)
+            if actual[THROUGHPUT_METRIC] < limit:
+                regressions.append(f'{name}: rps {actual[THROUGHPUT_METRIC]:.1f} < 基準 '
+                                   f'{expected[THROUGHPUT_METRIC]:.1f}（容許 {limit:.1f}）')
+    return regressions
+
+
+def format_results(results):
+    """將結果格式化為表格文字"""
+    lines = [f'{"路徑":<12} {"rps":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"max ms":>9} {"錯誤":>5}']
+    for name, result in results.items():
+        lines.append(f'{name:<12} {result["rps"]:>9.1f} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                     f'{result["p99_ms"]:>9.2f} {result["max_ms"]:>9.2f} {result["errors"]:>5}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """命令列進入點"""
+    parser = argparse.ArgumentParser(description='以並行 HTTP 請求量測後端各路徑的吞吐量與延遲')
+    parser.add_argument('--requests', type=int, default=200, help='每個路徑的請求數')
+    parser.add_argument('--concurrency', type=int, default=8, help='並行用戶端數')
+    parser.add_argument('--rps', type=float, default=0.0, help='每個路徑的目標請求速率，0 表示盡快送出')
+    parser.add_argument('--warmup', type=int, default=10, help='量測前的暖機請求數')
+    parser.add_argument('--route', action='append', help='只量測指定名稱的路徑（可重複指定）')
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE_PATH,
+                        help='與此基準 JSON（預設為 benchmarks/baseline.json）比較，退步超過容許範圍時以狀態碼 1 結束')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='容許的相對退步比例')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS, help='忽略小於此毫秒數的延遲差異')
+    parser.add_argument('--save-baseline', help='將本次結果寫入基準 JSON')
+    parser.add_argument('--json', action='store_true', help='以 JSON 輸出結果')
+    args = parser.parse_args(argv)
+
+    routes = DEFAULT_ROUTES
+    if args.route:
+        unknown = set(args.route) - {name for name, _, _ in DEFAULT_ROUTES}
+        if unknown:
+            parser.error(f'未知的路徑名稱: {", ".join(sorted(unknown))}')
+        routes = [route for route in DEFAULT_ROUTES if route[0] in args.route]
+
+    from index import app
+
+    results = run_benchmark(app, routes, requests=args.requests, concurrency=args.concurrency,
+                            rps=args.rps, warmup=args.warmup)
+    print(json.dumps(results, indent=2, ensure_ascii=False) if args.json else format_results(results))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        baseline = {
+            'settings': {'requests': args.requests, 'concurrency': args.concurrency, 'rps': args.rps},
+            'routes': {name: {metric: result[metric] for metric in LATENCY_METRICS + (THROUGHPUT_METRIC,)}
+                       for name, result in results.items()},
+        }
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'已寫入基準 {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print('效能退步：')
+            for regression in regressions:
+                print(f'  {regression}')
+            return 1
+        print(f'與基準 {args.baseline} 比較無退步（容許 {args.tolerance:.0%}）')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,991 @@
+"""
+GLB 模型工具
+解析與寫入 GLB 檔案，並提供頂點屬性量化、去除未使用資料與合併重複頂點等幾何最佳化
+"""
+import os
+import sys
+import json
+import math
+import struct
+import argparse
+import threading
+
+# NumPy 只有幾何處理需要，僅解析 JSON 時不需安裝
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+BYTE = 5120
+UNSIGNED_BYTE = 5121
+SHORT = 5122
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+
+COMPONENT_SIZES = {BYTE: 1, UNSIGNED_BYTE: 1, SHORT: 2, UNSIGNED_SHORT: 2, UNSIGNED_INT: 4, FLOAT: 4}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+TYPES_BY_SIZE = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4'}
+
+# 這些擴充功能會以其他方式引用緩衝區資料，重建緩衝區後將無法正確還原
+UNSUPPORTED_EXTENSIONS = ('KHR_draco_mesh_compression', 'EXT_meshopt_compression', 'EXT_mesh_gpu_instancing')
+
+QUANTIZATION_EXTENSION = 'KHR_mesh_quantization'
+
+DEFAULT_LOD_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'lod')
+
+
+class GLBError(ValueError):
+    """GLB 檔案格式錯誤或不支援的內容"""
+
+
+def _component_dtype(component_type):
+    """取得 glTF 元件型別對應的 NumPy 型別（小端序）"""
+    dtypes = {
+        BYTE: np.int8, UNSIGNED_BYTE: np.uint8, SHORT: np.int16,
+        UNSIGNED_SHORT: np.uint16, UNSIGNED_INT: np.uint32, FLOAT: np.float32,
+    }
+    return np.dtype(dtypes[component_type]).newbyteorder('<')
+
+
+def _pad4(length):
+    """返回對齊 4 位元組所需的補齊長度"""
+    return (4 - length % 4) % 4
+
+
+def parse_glb(data):
+    """解析 GLB 位元組內容，返回 (glTF JSON, BIN 區塊)"""
+    if len(data) < 20:
+        raise GLBError('檔案過小，不是有效的 GLB')
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC:
+        raise GLBError('不是 GLB 檔案')
+    if version != GLB_VERSION:
+        raise GLBError(f'不支援的 GLB 版本: {version}')
+    if length > len(data):
+        raise GLBError('GLB 檔案長度不完整')
+
+    gltf = None
+    bin_chunk = b''
+    offset = 12
+    while offset + 8 <= length:
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(chunk.decode('utf-8'))
+        elif chunk_type == CHUNK_BIN and not bin_chunk:
+            bin_chunk = bytes(chunk)
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise GLBError('GLB 缺少 JSON 區塊')
+    return gltf, bin_chunk
+
+
+def read_glb(path):
+    """讀取並解析 GLB 檔案"""
+    with open(path, 'rb') as f:
+        return parse_glb(f.read())
+
+
+def build_glb(gltf, bin_chunk):
+    """將 glTF JSON 與 BIN 區塊組合成 GLB 位元組內容"""
+    json_bytes = json.dumps(gltf, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    json_bytes += b' ' * _pad4(len(json_bytes))
+    bin_bytes = bytes(bin_chunk) + b'\x00' * _pad4(len(bin_chunk))
+
+    total_length = 12 + 8 + len(json_bytes) + (8 + len(bin_bytes) if bin_bytes else 0)
+    parts = [
+        struct.pack('<III', GLB_MAGIC, GLB_VERSION, total_length),
+        struct.pack('<II', len(json_bytes), CHUNK_JSON),
+        json_bytes,
+    ]
+    if bin_bytes:
+        parts.append(struct.pack('<II', len(bin_bytes), CHUNK_BIN))
+        parts.append(bin_bytes)
+    return b''.join(parts)
+
+
+def read_glb_json(path):
+    """只讀取 GLB 的標頭與 JSON 區塊，返回 (glTF JSON, BIN 區塊在檔案中的位移, BIN 長度)"""
+    with open(path, 'rb') as f:
+        header = f.read(20)
+        if len(header) < 20:
+            raise GLBError('檔案過小，不是有效的 GLB')
+        magic, version, length, json_length, json_type = struct.unpack('<IIIII', header)
+        if magic != GLB_MAGIC:
+            raise GLBError('不是 GLB 檔案')
+        if version != GLB_VERSION:
+            raise GLBError(f'不支援的 GLB 版本: {version}')
+        if json_type != CHUNK_JSON:
+            raise GLBError('GLB 第一個區塊不是 JSON')
+        gltf = json.loads(f.read(json_length).decode('utf-8'))
+
+        bin_offset, bin_length = None, 0
+        chunk_header = f.read(8)
+        if len(chunk_header) == 8:
+            chunk_length, chunk_type = struct.unpack('<II', chunk_header)
+            if chunk_type == CHUNK_BIN:
+                bin_offset, bin_length = 20 + json_length + 8, chunk_length
+    return gltf, bin_offset, bin_length
+
+
+def image_dimensions(header):
+    """由 PNG 或 JPEG 檔頭取得影像寬高，無法辨識時返回 None"""
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and len(header) >= 24:
+        return struct.unpack('>II', header[16:24])
+    if header[:2] == b'\xff\xd8':
+        offset = 2
+        while offset + 9 < len(header):
+            if header[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = header[offset + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            segment_length = struct.unpack('>H', header[offset + 2:offset + 4])[0]
+            # SOF0~SOF15（排除 DHT、JPG、DAC）記錄影像尺寸
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', header[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + segment_length
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP' and len(header) >= 30:
+        chunk = header[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', header[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(header[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(header[24:27], 'little') + 1, int.from_bytes(header[27:30], 'little') + 1
+    return None
+
+
+def _node_matrix(node):
+    """取得節點的區域轉換矩陣（列優先 4x4）"""
+    if 'matrix' in node:
+        m = node['matrix']
+        # glTF 以行優先儲存矩陣
+        return [[m[col * 4 + row] for col in range(4)] for row in range(4)]
+    tx, ty, tz = node.get('translation', [0.0, 0.0, 0.0])
+    qx, qy, qz, qw = node.get('rotation', [0.0, 0.0, 0.0, 1.0])
+    sx, sy, sz = node.get('scale', [1.0, 1.0, 1.0])
+    return [
+        [(1 - 2 * (qy * qy + qz * qz)) * sx, (2 * (qx * qy - qz * qw)) * sy, (2 * (qx * qz + qy * qw)) * sz, tx],
+        [(2 * (qx * qy + qz * qw)) * sx, (1 - 2 * (qx * qx + qz * qz)) * sy, (2 * (qy * qz - qx * qw)) * sz, ty],
+        [(2 * (qx * qz - qy * qw)) * sx, (2 * (qy * qz + qx * qw)) * sy, (1 - 2 * (qx * qx + qy * qy)) * sz, tz],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+
+
+def _multiply_matrices(a, b):
+    return [[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+
+
+def _scene_bounds(gltf):
+    """以 POSITION accessor 的 min/max 與節點轉換計算場景的世界座標邊界"""
+    nodes = gltf.get('nodes', [])
+    meshes = gltf.get('meshes', [])
+    accessors = gltf.get('accessors', [])
+    scenes = gltf.get('scenes', [])
+    if scenes:
+        roots = scenes[gltf.get('scene', 0)].get('nodes', [])
+    else:
+        children = {child for node in nodes for child in node.get('children', [])}
+        roots = [index for index in range(len(nodes)) if index not in children]
+
+    low = [math.inf] * 3
+    high = [-math.inf] * 3
+    identity = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+    stack = [(index, identity) for index in roots]
+    visited = set()
+    while stack:
+        index, parent_matrix = stack.pop()
+        if index in visited:
+            continue
+        visited.add(index)
+        node = nodes[index]
+        world = _multiply_matrices(parent_matrix, _node_matrix(node))
+        if 'mesh' in node:
+            for primitive in meshes[node['mesh']]['primitives']:
+                position = primitive['attributes'].get('POSITION')
+                if position is None:
+                    continue
+                accessor = accessors[position]
+                if 'min' not in accessor or 'max' not in accessor:
+                    continue
+                bounds = (accessor['min'], accessor['max'])
+                if accessor.get('normalized') and accessor['componentType'] != FLOAT:
+                    maximum = {BYTE: 127, UNSIGNED_BYTE: 255, SHORT: 32767, UNSIGNED_SHORT: 65535}[accessor['componentType']]
+                    bounds = tuple([max(v / maximum, -1.0) for v in values] for values in bounds)
+                for corner in range(8):
+                    point = [bounds[(corner >> axis) & 1][axis] for axis in range(3)]
+                    for axis in range(3):
+                        value = sum(world[axis][k] * point[k] for k in range(3)) + world[axis][3]
+                        low[axis] = min(low[axis], value)
+                        high[axis] = max(high[axis], value)
+        stack.extend((child, world) for child in node.get('children', []))
+
+    if low[0] == math.inf:
+        return None
+    return {
+        'min': low,
+        'max': high,
+        'size': [high[axis] - low[axis] for axis in range(3)],
+        'center': [(high[axis] + low[axis]) / 2 for axis in range(3)],
+    }
+
+
+# 讀取影像檔頭時的最大位元組數（JPEG 的尺寸資訊可能位於 EXIF 之後）
+IMAGE_HEADER_BYTES = 64 * 1024
+
+
+def summarize_glb(path):
+    """只解析 GLB 的 JSON 區塊與影像檔頭，返回模型的統計資訊"""
+    gltf, bin_offset, _ = read_glb_json(path)
+    accessors = gltf.get('accessors', [])
+    buffer_views = gltf.get('bufferViews', [])
+
+    primitives = [primitive for mesh in gltf.get('meshes', []) for primitive in mesh['primitives']]
+    vertex_count = sum(accessors[p['attributes']['POSITION']]['count']
+                       for p in primitives if 'POSITION' in p['attributes'])
+
+    textures = []
+    with open(path, 'rb') as f:
+        for index, image in enumerate(gltf.get('images', [])):
+            texture = {'index': index, 'name': image.get('name'), 'mime_type': image.get('mimeType')}
+            if 'bufferView' in image and bin_offset is not None:
+                view = buffer_views[image['bufferView']]
+                texture['byte_length'] = view['byteLength']
+                f.seek(bin_offset + view.get('byteOffset', 0))
+                dimensions = image_dimensions(f.read(min(view['byteLength'], IMAGE_HEADER_BYTES)))
+                if dimensions:
+                    texture['width'], texture['height'] = dimensions
+            textures.append(texture)
+
+    return {
+        'byte_size': os.path.getsize(path),
+        'meshes': len(gltf.get('meshes', [])),
+        'primitives': len(primitives),
+        'triangles': _count_triangles(gltf),
+        'vertices': vertex_count,
+        'materials': len(gltf.get('materials', [])),
+        'nodes': len(gltf.get('nodes', [])),
+        'textures': textures,
+        'bounding_box': _scene_bounds(gltf),
+        'extensions': gltf.get('extensionsUsed', []),
+    }
+
+
+def read_accessor(gltf, bin_chunk, index):
+    """讀取 accessor 的原始資料，返回形狀為 (count, 元件數) 的陣列"""
+    accessor = gltf['accessors'][index]
+    dtype = _component_dtype(accessor['componentType'])
+    components = TYPE_SIZES[accessor['type']]
+    count = accessor['count']
+
+    if 'bufferView' in accessor:
+        view = gltf['bufferViews'][accessor['bufferView']]
+        if view.get('buffer', 0) != 0 or 'uri' in gltf['buffers'][view.get('buffer', 0)]:
+            raise GLBError('只支援內嵌於 GLB 的緩衝區')
+        offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+        stride = view.get('byteStride') or dtype.itemsize * components
+        values = np.ndarray(shape=(count, components), dtype=dtype, buffer=bin_chunk,
+                            offset=offset, strides=(stride, dtype.itemsize)).copy()
+    else:
+        values = np.zeros((count, components), dtype=dtype)
+
+    sparse = accessor.get('sparse')
+    if sparse:
+        sparse_count = sparse['count']
+        index_info = sparse['indices']
+        index_view = gltf['bufferViews'][index_info['bufferView']]
+        index_dtype = _component_dtype(index_info['componentType'])
+        sparse_indices = np.frombuffer(
+            bin_chunk, dtype=index_dtype, count=sparse_count,
+            offset=index_view.get('byteOffset', 0) + index_info.get('byteOffset', 0))
+        value_info = sparse['values']
+        value_view = gltf['bufferViews'][value_info['bufferView']]
+        sparse_values = np.frombuffer(
+            bin_chunk, dtype=dtype, count=sparse_count * components,
+            offset=value_view.get('byteOffset', 0) + value_info.get('byteOffset', 0))
+        values[sparse_indices.astype(np.int64)] = sparse_values.reshape(sparse_count, components)
+    return values
+
+
+def to_float(values, component_type, normalized):
+    """將 accessor 資料轉為浮點數，正規化整數依 glTF 規則還原"""
+    values = values.astype(np.float64)
+    if normalized and component_type != FLOAT:
+        info = np.iinfo(_component_dtype(component_type))
+        values = values / info.max
+        if info.min < 0:
+            values = np.maximum(values, -1.0)
+    return values
+
+
+def read_accessor_float(gltf, bin_chunk, index):
+    """讀取 accessor 並轉為浮點數"""
+    accessor = gltf['accessors'][index]
+    return to_float(read_accessor(gltf, bin_chunk, index),
+                    accessor['componentType'], accessor.get('normalized', False))
+
+
+class BufferBuilder:
+    """收集 accessor 與 bufferView 資料，依用途與步幅合併為緊密排列的單一 BIN 緩衝區"""
+
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.buffer_views = []
+        self.accessors = []
+        # (target, byteStride) -> [(accessor 索引, 資料)]
+        self._groups = {}
+
+    def add_view(self, data, target=None, byte_stride=None):
+        """立即新增一個獨立的 bufferView 並返回其索引"""
+        padding = _pad4(self.length)
+        if padding:
+            self.chunks.append(b'\x00' * padding)
+            self.length += padding
+        view = {'buffer': 0, 'byteOffset': self.length, 'byteLength': len(data)}
+        if byte_stride:
+            view['byteStride'] = byte_stride
+        if target:
+            view['target'] = target
+        self.chunks.append(data)
+        self.length += len(data)
+        self.buffer_views.append(view)
+        return len(self.buffer_views) - 1
+
+    def add_accessor(self, values, component_type, normalized=False, target=None,
+                     with_bounds=False, accessor_type=None, extra=None):
+        """新增以 values 為內容的 accessor，頂點屬性會補齊為 4 位元組對齊的步幅"""
+        values = np.ascontiguousarray(values, dtype=_component_dtype(component_type))
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        count, components = values.shape
+        element_size = values.dtype.itemsize * components
+        raw = values.view(np.uint8).reshape(count, element_size)
+        byte_stride = None
+        if target == ARRAY_BUFFER:
+            # 頂點屬性的每個元素必須對齊 4 位元組
+            byte_stride = element_size + _pad4(element_size)
+            if byte_stride != element_size:
+                padded = np.zeros((count, byte_stride), dtype=np.uint8)
+                padded[:, :element_size] = raw
+                raw = padded
+
+        accessor = {
+            'componentType': component_type,
+            'count': count,
+            'type': accessor_type or TYPES_BY_SIZE[components],
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if with_bounds and count:
+            cast = float if component_type == FLOAT else int
+            accessor['min'] = [cast(v) for v in values.min(axis=0)]
+            accessor['max'] = [cast(v) for v in values.max(axis=0)]
+        if extra:
+            accessor.update(extra)
+        self.accessors.append(accessor)
+        index = len(self.accessors) - 1
+        if count:
+            self._groups.setdefault((target, byte_stride), []).append((index, raw.tobytes()))
+        return index
+
+    def finish(self):
+        """將收集的 accessor 資料寫入共用的 bufferView，返回 BIN 內容"""
+        for (target, byte_stride), entries in self._groups.items():
+            parts = []
+            offset = 0
+            for accessor_index, data in entries:
+                self.accessors[accessor_index]['byteOffset'] = offset
+                padding = _pad4(len(data))
+                parts.append(data + b'\x00' * padding)
+                offset += len(data) + padding
+            view_index = self.add_view(b''.join(parts), target=target, byte_stride=byte_stride)
+            for accessor_index, _ in entries:
+                self.accessors[accessor_index]['bufferView'] = view_index
+        self._groups = {}
+        return b''.join(self.chunks)
+
+
+def _quantize_signed(values, dtype):
+    """將 [-1, 1] 範圍的浮點數量化為正規化有號整數"""
+    maximum = np.iinfo(dtype).max
+    return np.round(np.clip(values, -1.0, 1.0) * maximum).astype(dtype)
+
+
+def _quantize_unsigned(values, dtype):
+    """將 [0, 1] 範圍的浮點數量化為正規化無號整數"""
+    maximum = np.iinfo(dtype).max
+    return np.round(np.clip(values, 0.0, 1.0) * maximum).astype(dtype)
+
+
+def _normalize_vectors(values):
+    """將向量正規化為單位長度，零向量保持不變"""
+    lengths = np.linalg.norm(values, axis=1, keepdims=True)
+    return np.divide(values, lengths, out=np.zeros_like(values), where=lengths > 0)
+
+
+def _encode_attribute(name, gltf, bin_chunk, accessor_index, quantize, position_transform):
+    """依屬性語意選擇編碼方式，返回 (資料, 元件型別, 是否正規化)"""
+    accessor = gltf['accessors'][accessor_index]
+    component_type = accessor['componentType']
+    normalized = accessor.get('normalized', False)
+
+    if quantize and component_type == FLOAT:
+        if name == 'POSITION' and position_transform is not None:
+            center, scale = position_transform
+            values = read_accessor_float(gltf, bin_chunk, accessor_index)
+            return np.round((values - center) / scale).astype(np.int16), SHORT, False
+        if name == 'NORMAL':
+            values = _normalize_vectors(read_accessor_float(gltf, bin_chunk, accessor_index))
+            return _quantize_signed(values, np.int8), BYTE, True
+        if name == 'TANGENT':
+            values = read_accessor_float(gltf, bin_chunk, accessor_index)
+            values[:, :3] = _normalize_vectors(values[:, :3])
+            return _quantize_signed(values, np.int8), BYTE, True
+        if name.startswith('TEXCOORD_'):
+            values = read_accessor_float(gltf, bin_chunk, accessor_index)
+            # 超出 [0, 1] 的貼圖座標（例如重複貼圖）無法以正規化整數表示
+            if values.size and values.min() >= 0.0 and values.max() <= 1.0:
+                return _quantize_unsigned(values, np.uint16), UNSIGNED_SHORT, True
+
+    return read_accessor(gltf, bin_chunk, accessor_index), component_type, normalized
+
+
+def _dedupe_vertices(attributes, indices):
+    """合併所有屬性皆相同的頂點，保持頂點首次出現的順序並重新編排索引"""
+    rows = [values.view(np.uint8).reshape(values.shape[0], -1) for values, _, _ in attributes.values()]
+    keys = np.ascontiguousarray(np.concatenate(rows, axis=1))
+    keys = keys.view(np.dtype((np.void, keys.shape[1]))).ravel()
+    _, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    kept = first_index[order]
+    remap = rank[inverse.ravel()]
+
+    deduped = {name: (values[kept], component_type, normalized)
+               for name, (values, component_type, normalized) in attributes.items()}
+    return deduped, remap[indices]
+
+
+def _mesh_position_transform(gltf, bin_chunk, mesh):
+    """計算網格所有 primitive 共用的位置量化中心與縮放比例"""
+    mins, maxs = [], []
+    for primitive in mesh['primitives']:
+        position_index = primitive['attributes'].get('POSITION')
+        if position_index is None:
+            continue
+        accessor = gltf['accessors'][position_index]
+        if accessor['componentType'] != FLOAT:
+            return None
+        values = read_accessor_float(gltf, bin_chunk, position_index)
+        if values.size:
+            mins.append(values.min(axis=0))
+            maxs.append(values.max(axis=0))
+    if not mins:
+        return None
+    low = np.min(mins, axis=0)
+    high = np.max(maxs, axis=0)
+    center = (low + high) / 2.0
+    # 使用等比例縮放，避免非等比縮放影響法向量
+    half_extent = float(np.max(high - low)) / 2.0
+    scale = half_extent / 32767.0 if half_extent > 0 else 1.0
+    return center, scale
+
+
+def _count_vertices(gltf):
+    """計算所有 primitive 的頂點總數"""
+    total = 0
+    for mesh in gltf.get('meshes', []):
+        for primitive in mesh['primitives']:
+            position_index = primitive['attributes'].get('POSITION')
+            if position_index is not None:
+                total += gltf['accessors'][position_index]['count']
+    return total
+
+
+def _check_supported(gltf):
+    """確認模型沒有使用無法重建緩衝區的擴充功能"""
+    unsupported = set(gltf.get('extensionsUsed', [])).intersection(UNSUPPORTED_EXTENSIONS)
+    if unsupported:
+        raise GLBError(f'不支援已使用下列擴充功能的模型: {", ".join(sorted(unsupported))}')
+
+
+def _rebuild_buffers(gltf, bin_chunk, process_primitive):
+    """以 process_primitive 重新產生每個 primitive 的幾何資料，並重建所有 accessor 與 bufferView
+
+    process_primitive(mesh_index, primitive) 返回 (屬性字典, 索引陣列)，屬性字典的值為
+    (資料, 元件型別, 是否正規化)；返回 None 表示原樣保留該 primitive。
+    未被引用的 accessor 與 bufferView 不會寫入新的緩衝區。返回新的 BIN 內容。
+    """
+    builder = BufferBuilder()
+    copied_accessors = {}
+
+    def copy_accessor(index, target=None):
+        """原樣複製未經處理的 accessor（動畫、蒙皮、變形目標等）"""
+        if index not in copied_accessors:
+            accessor = gltf['accessors'][index]
+            extra = {key: accessor[key] for key in ('min', 'max', 'name') if key in accessor}
+            copied_accessors[index] = builder.add_accessor(
+                read_accessor(gltf, bin_chunk, index), accessor['componentType'],
+                normalized=accessor.get('normalized', False), target=target,
+                accessor_type=accessor['type'], extra=extra)
+        return copied_accessors[index]
+
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        # 同一網格中共用相同 accessor 的 primitive 只處理一次
+        processed = {}
+        for primitive in mesh['primitives']:
+            cache_key = (tuple(sorted(primitive['attributes'].items())), primitive.get('indices'))
+            if cache_key not in processed:
+                result = process_primitive(mesh_index, primitive)
+                if result is None:
+                    attributes_map = {name: copy_accessor(index, ARRAY_BUFFER)
+                                      for name, index in primitive['attributes'].items()}
+                    indices_index = (copy_accessor(primitive['indices'], ELEMENT_ARRAY_BUFFER)
+                                     if 'indices' in primitive else None)
+                else:
+                    attributes, indices = result
+                    attributes_map = {}
+                    for name, (values, component_type, normalized) in attributes.items():
+                        attributes_map[name] = builder.add_accessor(
+                            values, component_type, normalized=normalized, target=ARRAY_BUFFER,
+                            with_bounds=(name == 'POSITION'))
+                    vertex_count = next(iter(attributes.values()))[0].shape[0] if attributes else 0
+                    index_type = UNSIGNED_SHORT if vertex_count <= 65535 else UNSIGNED_INT
+                    indices_index = builder.add_accessor(indices, index_type, target=ELEMENT_ARRAY_BUFFER)
+                processed[cache_key] = (attributes_map, indices_index)
+
+            attributes_map, indices_index = processed[cache_key]
+            primitive['attributes'] = dict(attributes_map)
+            if indices_index is None:
+                primitive.pop('indices', None)
+            else:
+                primitive['indices'] = indices_index
+            if 'targets' in primitive:
+                primitive['targets'] = [
+                    {name: copy_accessor(index, ARRAY_BUFFER) for name, index in target.items()}
+                    for target in primitive['targets']
+                ]
+
+    for skin in gltf.get('skins', []):
+        if 'inverseBindMatrices' in skin:
+            skin['inverseBindMatrices'] = copy_accessor(skin['inverseBindMatrices'])
+    for animation in gltf.get('animations', []):
+        for sampler in animation.get('samplers', []):
+            sampler['input'] = copy_accessor(sampler['input'])
+            sampler['output'] = copy_accessor(sampler['output'])
+
+    for image in gltf.get('images', []):
+        if 'bufferView' in image:
+            view = gltf['bufferViews'][image['bufferView']]
+            start = view.get('byteOffset', 0)
+            image['bufferView'] = builder.add_view(bin_chunk[start:start + view['byteLength']])
+
+    new_bin = builder.finish()
+    gltf['accessors'] = builder.accessors
+    gltf['bufferViews'] = builder.buffer_views
+    gltf['buffers'] = [{'byteLength': len(new_bin)}] if new_bin else []
+    if not new_bin:
+        gltf.pop('bufferViews')
+    return new_bin
+
+
+def _read_primitive_indices(gltf, bin_chunk, primitive, vertex_count):
+    """讀取 primitive 的索引，沒有索引時依頂點順序產生"""
+    if 'indices' in primitive:
+        return read_accessor(gltf, bin_chunk, primitive['indices']).ravel().astype(np.int64)
+    return np.arange(vertex_count, dtype=np.int64)
+
+
+def optimize_glb(data, quantize=True, dedupe=True):
+    """最佳化 GLB 位元組內容，返回 (新的 GLB 位元組, 統計報告)"""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('GLB 最佳化需要安裝 numpy')
+
+    gltf, bin_chunk = parse_glb(data)
+    _check_supported(gltf)
+    if QUANTIZATION_EXTENSION in gltf.get('extensionsUsed', []):
+        # 已量化的模型再次量化會重複套用節點轉換
+        quantize = False
+
+    report = {
+        'size_before': len(data),
+        'vertices_before': _count_vertices(gltf),
+        'accessors_before': len(gltf.get('accessors', [])),
+        'buffer_views_before': len(gltf.get('bufferViews', [])),
+    }
+
+    nodes = gltf.get('nodes', [])
+    skinned_meshes = {node['mesh'] for node in nodes if 'mesh' in node and 'skin' in node}
+
+    quantized_meshes = {}
+    if quantize:
+        for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+            has_targets = any('targets' in primitive for primitive in mesh['primitives'])
+            if not has_targets and mesh_index not in skinned_meshes:
+                position_transform = _mesh_position_transform(gltf, bin_chunk, mesh)
+                if position_transform is not None:
+                    quantized_meshes[mesh_index] = position_transform
+
+    def process_primitive(mesh_index, primitive):
+        position_transform = quantized_meshes.get(mesh_index)
+        attributes = {
+            name: _encode_attribute(name, gltf, bin_chunk, accessor_index, quantize, position_transform)
+            for name, accessor_index in primitive['attributes'].items()
+        }
+        vertex_count = next(iter(attributes.values()))[0].shape[0] if attributes else 0
+        indices = _read_primitive_indices(gltf, bin_chunk, primitive, vertex_count)
+        if dedupe and attributes and 'targets' not in primitive:
+            attributes, indices = _dedupe_vertices(attributes, indices)
+        return attributes, indices
+
+    new_bin = _rebuild_buffers(gltf, bin_chunk, process_primitive)
+
+    # 以子節點的平移與縮放還原量化後的位置座標
+    for node in list(nodes):
+        mesh_index = node.get('mesh')
+        if mesh_index in quantized_meshes:
+            center, scale = quantized_meshes[mesh_index]
+            child = {'mesh': mesh_index, 'translation': [float(v) for v in center], 'scale': [scale] * 3}
+            if 'name' in node:
+                child['name'] = node['name']
+            nodes.append(child)
+            node.setdefault('children', []).append(len(nodes) - 1)
+            del node['mesh']
+
+    if quantize:
+        for key in ('extensionsUsed', 'extensionsRequired'):
+            extensions = gltf.setdefault(key, [])
+            if QUANTIZATION_EXTENSION not in extensions:
+                extensions.append(QUANTIZATION_EXTENSION)
+
+    output = build_glb(gltf, new_bin)
+    report.update({
+        'size_after': len(output),
+        'vertices_after': _count_vertices(gltf),
+        'accessors_after': len(gltf['accessors']),
+        'buffer_views_after': len(gltf.get('bufferViews', [])),
+    })
+    return output, report
+
+
+# 細節層級（LOD）：數值為頂點叢集化的網格解析度（模型最大邊長切分的格數），None 表示不簡化
+LOD_LEVELS = {
+    'low': 48,
+    'medium': 200,
+    'high': None,
+}
+
+# 每個網格至少保留的格數，避免小型零件被簡化成單點
+MIN_CELLS_PER_MESH = 8
+
+# 法向量分組的精細度，方向差異大的頂點不會被合併以保留銳利邊緣
+NORMAL_BUCKETS = 1
+
+# 可安全取平均的頂點屬性
+_AVERAGEABLE_ATTRIBUTES = ('POSITION', 'NORMAL', 'TANGENT', 'TEXCOORD_', 'COLOR_')
+
+
+def _position_bounds(gltf, bin_chunk, accessor_index):
+    """取得位置 accessor 的邊界，優先使用 JSON 中的 min/max"""
+    accessor = gltf['accessors'][accessor_index]
+    if 'min' in accessor and 'max' in accessor and accessor['componentType'] == FLOAT:
+        return np.array(accessor['min'], dtype=np.float64), np.array(accessor['max'], dtype=np.float64)
+    values = read_accessor_float(gltf, bin_chunk, accessor_index)
+    return values.min(axis=0), values.max(axis=0)
+
+
+def _cluster_mean(values, cluster, cluster_count):
+    """以 bincount 計算每個叢集的屬性平均值"""
+    counts = np.bincount(cluster, minlength=cluster_count).astype(np.float64)
+    counts[counts == 0] = 1
+    columns = [np.bincount(cluster, weights=values[:, i], minlength=cluster_count) / counts
+               for i in range(values.shape[1])]
+    return np.stack(columns, axis=1)
+
+
+def _decimate_primitive(gltf, bin_chunk, primitive, origin, cell_size):
+    """以頂點叢集化簡化三角形 primitive，無法簡化時返回 None"""
+    attributes = primitive['attributes']
+    if (primitive.get('mode', 4) != 4 or 'targets' in primitive or 'POSITION' not in attributes
+            or not all(name.startswith(_AVERAGEABLE_ATTRIBUTES) for name in attributes)):
+        return None
+
+    values = {name: read_accessor_float(gltf, bin_chunk, index) for name, index in attributes.items()}
+    positions = values['POSITION']
+    if not len(positions):
+        return None
+    indices = _read_primitive_indices(gltf, bin_chunk, primitive, len(positions))
+    if len(indices) < 3:
+        return None
+
+    key_columns = [np.floor((positions - origin) / cell_size).astype(np.int64)]
+    if 'NORMAL' in values:
+        key_columns.append(np.round(_normalize_vectors(values['NORMAL']) * NORMAL_BUCKETS).astype(np.int64))
+    _, cluster = np.unique(np.concatenate(key_columns, axis=1), axis=0, return_inverse=True)
+    cluster = cluster.ravel()
+    cluster_count = int(cluster.max()) + 1
+
+    triangles = cluster[indices[:len(indices) - len(indices) % 3]].reshape(-1, 3)
+    valid = ((triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+             & (triangles[:, 0] != triangles[:, 2]))
+    triangles = triangles[valid]
+    if not len(triangles):
+        return None
+    # 移除合併後重複的三角形，保留第一次出現時的頂點順序（面向）
+    _, first_index = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    triangles = triangles[np.sort(first_index)]
+
+    used = np.unique(triangles)
+    remap = np.full(cluster_count, -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+
+    decimated = {}
+    for name, attribute_values in values.items():
+        averaged = _cluster_mean(attribute_values, cluster, cluster_count)[used]
+        if name == 'NORMAL':
+            averaged = _normalize_vectors(averaged)
+        elif name == 'TANGENT':
+            averaged[:, :3] = _normalize_vectors(averaged[:, :3])
+            averaged[:, 3] = np.where(averaged[:, 3] >= 0, 1.0, -1.0)
+        decimated[name] = (averaged.astype(np.float32), FLOAT, False)
+    return decimated, remap[triangles].ravel()
+
+
+def _count_triangles(gltf):
+    """計算所有三角形 primitive 的三角形總數"""
+    total = 0
+    for mesh in gltf.get('meshes', []):
+        for primitive in mesh['primitives']:
+            if primitive.get('mode', 4) != 4:
+                continue
+            if 'indices' in primitive:
+                total += gltf['accessors'][primitive['indices']]['count'] // 3
+            elif 'POSITION' in primitive['attributes']:
+                total += gltf['accessors'][primitive['attributes']['POSITION']]['count'] // 3
+    return total
+
+
+def decimate_glb(data, resolution):
+    """以頂點叢集化簡化 GLB 的網格，返回 (新的 GLB 位元組, 統計報告)"""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('GLB 簡化需要安裝 numpy')
+
+    gltf, bin_chunk = parse_glb(data)
+    _check_supported(gltf)
+    report = {
+        'size_before': len(data),
+        'vertices_before': _count_vertices(gltf),
+        'triangles_before': _count_triangles(gltf),
+    }
+
+    skinned_meshes = {node['mesh'] for node in gltf.get('nodes', []) if 'mesh' in node and 'skin' in node}
+    mesh_bounds = {}
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        bounds = [_position_bounds(gltf, bin_chunk, primitive['attributes']['POSITION'])
+                  for primitive in mesh['primitives'] if 'POSITION' in primitive['attributes']]
+        if bounds:
+            mesh_bounds[mesh_index] = (np.min([low for low, _ in bounds], axis=0),
+                                       np.max([high for _, high in bounds], axis=0))
+
+    largest_extent = max((float(np.max(high - low)) for low, high in mesh_bounds.values()), default=0.0)
+    model_cell_size = largest_extent / resolution if resolution else 0.0
+
+    def process_primitive(mesh_index, primitive):
+        if mesh_index in skinned_meshes or mesh_index not in mesh_bounds or model_cell_size <= 0:
+            return None
+        low, high = mesh_bounds[mesh_index]
+        mesh_extent = float(np.max(high - low))
+        cell_size = min(model_cell_size, mesh_extent / MIN_CELLS_PER_MESH) if mesh_extent > 0 else model_cell_size
+        return _decimate_primitive(gltf, bin_chunk, primitive, low, cell_size)
+
+    new_bin = _rebuild_buffers(gltf, bin_chunk, process_primitive)
+    output = build_glb(gltf, new_bin)
+    report.update({
+        'size_after': len(output),
+        'vertices_after': _count_vertices(gltf),
+        'triangles_after': _count_triangles(gltf),
+    })
+    return output, report
+
+
+def generate_lod(data, level):
+    """產生指定細節層級的模型：先簡化網格再量化，返回 (GLB 位元組, 統計報告)"""
+    if level not in LOD_LEVELS:
+        raise ValueError(f'未知的細節層級: {level}')
+    resolution = LOD_LEVELS[level]
+    report = {'size_before': len(data)}
+    if resolution:
+        data, decimate_report = decimate_glb(data, resolution)
+        report.update({key: value for key, value in decimate_report.items() if key != 'size_before'})
+    output, optimize_report = optimize_glb(data)
+    report.setdefault('vertices_before', optimize_report['vertices_before'])
+    report.update({'size_after': optimize_report['size_after'],
+                   'vertices_after': optimize_report['vertices_after']})
+    return output, report
+
+
+def get_lod_path(source_path, level, cache_dir):
+    """取得模型細節層級版本在快取目錄中的路徑（檔名包含解析度，調整設定後自動失效）"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    resolution = LOD_LEVELS[level] or 'full'
+    return os.path.join(cache_dir, f'{stem}.lod-{level}-{resolution}.glb')
+
+
+def is_lod_fresh(source_path, lod_path):
+    """檢查細節層級版本是否由目前的原始檔案產生（修改時間一致）"""
+    try:
+        return os.stat(lod_path).st_mtime_ns == os.stat(source_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+_lod_locks = {}
+_lod_locks_lock = threading.Lock()
+
+
+def ensure_lod_file(source_path, level, cache_dir):
+    """確保細節層級版本存在且為最新，必要時產生並寫入快取目錄，返回其路徑"""
+    lod_path = get_lod_path(source_path, level, cache_dir)
+    if is_lod_fresh(source_path, lod_path):
+        return lod_path
+    with _lod_locks_lock:
+        lock = _lod_locks.setdefault(lod_path, threading.Lock())
+    with lock:
+        if not is_lod_fresh(source_path, lod_path):
+            source_stat = os.stat(source_path)
+            with open(source_path, 'rb') as f:
+                output, _ = generate_lod(f.read(), level)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f'{lod_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(output)
+                # 以原始檔案的修改時間標記版本，原始檔案更新後即視為過期
+                os.utime(tmp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+                os.replace(tmp_path, lod_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    return lod_path
+
+
+def ensure_lod_files(models_dir, cache_dir, levels=None):
+    """為目錄中所有 GLB 模型產生各細節層級版本（已是最新者略過），返回無法產生者的 {(原始路徑, 層級): 錯誤}"""
+    # 快取目錄無法寫入（例如唯讀的部署環境）時直接失敗，不先花時間簡化網格
+    os.makedirs(cache_dir, exist_ok=True)
+    if not os.access(cache_dir, os.W_OK):
+        raise PermissionError(f'無法寫入細節層級快取目錄: {cache_dir}')
+    failures = {}
+    for filename in sorted(os.listdir(models_dir)):
+        if not filename.lower().endswith('.glb'):
+            continue
+        source_path = os.path.join(models_dir, filename)
+        for level in levels or list(LOD_LEVELS):
+            try:
+                ensure_lod_file(source_path, level, cache_dir)
+            except (OSError, ValueError) as e:
+                failures[(source_path, level)] = e
+    return failures
+
+
+def optimize_file(input_path, output_path, quantize=True, dedupe=True):
+    """最佳化 GLB 檔案並寫入輸出路徑，返回統計報告"""
+    with open(input_path, 'rb') as f:
+        data = f.read()
+    output, report = optimize_glb(data, quantize=quantize, dedupe=dedupe)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(output)
+    os.replace(tmp_path, output_path)
+    return report
+
+
+def format_report(path, report):
+    """將最佳化統計轉為可讀的文字"""
+    ratio = report['size_after'] / report['size_before'] if report['size_before'] else 0
+    return '\n'.join([
+        f'{path}',
+        f'  檔案大小:    {report["size_before"]:,} -> {report["size_after"]:,} bytes ({ratio:.0%})',
+        f'  頂點數:      {report["vertices_before"]:,} -> {report["vertices_after"]:,}',
+        f'  accessor:    {report["accessors_before"]} -> {report["accessors_after"]}',
+        f'  bufferView:  {report["buffer_views_before"]} -> {report["buffer_views_after"]}',
+    ])
+
+
+def main(argv=None):
+    """命令列進入點"""
+    parser = argparse.ArgumentParser(description='GLB 模型工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    optimize_parser = subparsers.add_parser('optimize', help='量化頂點屬性、去除未使用資料並合併重複頂點')
+    optimize_parser.add_argument('inputs', nargs='+', help='輸入的 GLB 檔案')
+    optimize_parser.add_argument('-o', '--output', help='輸出檔案（只有一個輸入時可指定），預設為 <名稱>.optimized.glb')
+    optimize_parser.add_argument('--in-place', action='store_true', help='直接覆寫輸入檔案')
+    optimize_parser.add_argument('--no-quantize', action='store_true', help='不量化頂點屬性')
+    optimize_parser.add_argument('--no-dedupe', action='store_true', help='不合併重複頂點')
+
+    lod_parser = subparsers.add_parser('lod', help='產生各細節層級（LOD）的模型版本')
+    lod_parser.add_argument('inputs', nargs='+', help='輸入的 GLB 檔案')
+    lod_parser.add_argument('--cache-dir', default=DEFAULT_LOD_CACHE_DIR, help='輸出目錄，預設為 models/lod')
+    lod_parser.add_argument('--level', action='append', choices=list(LOD_LEVELS), help='只產生指定的層級（可重複指定）')
+    lod_parser.add_argument('--force', action='store_true', help='即使已是最新也重新產生')
+
+    args = parser.parse_args(argv)
+    if not NUMPY_AVAILABLE:
+        parser.error('此指令需要安裝 numpy')
+
+    if args.command == 'optimize':
+        if args.output and len(args.inputs) > 1:
+            parser.error('多個輸入檔案時不可指定 --output')
+        for input_path in args.inputs:
+            if args.in_place:
+                output_path = input_path
+            else:
+                output_path = args.output or os.path.splitext(input_path)[0] + '.optimized.glb'
+            try:
+                report = optimize_file(input_path, output_path,
+                                       quantize=not args.no_quantize, dedupe=not args.no_dedupe)
+            except (OSError, GLBError) as e:
+                print(f'{input_path}: 最佳化失敗: {e}', file=sys.stderr)
+                return 1
+            print(format_report(f'{input_path} -> {output_path}', report))
+    elif args.command == 'lod':
+        for input_path in args.inputs:
+            for level in args.level or list(LOD_LEVELS):
+                lod_path = get_lod_path(input_path, level, args.cache_dir)
+                if args.force and os.path.exists(lod_path):
+                    os.remove(lod_path)
+                try:
+                    ensure_lod_file(input_path, level, args.cache_dir)
+                except (OSError, GLBError) as e:
+                    print(f'{input_path} ({level}): 產生失敗: {e}', file=sys.stderr)
+                    return 1
+                gltf, _ = read_glb(lod_path)
+                print(f'{input_path} [{level}] -> {lod_path}: '
+                      f'{os.path.getsize(input_path):,} -> {os.path.getsize(lod_path):,} bytes, '
+                      f'{_count_triangles(gltf):,} 三角形')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""
+gunicorn 設定
+變更串流（/api/phones/stream）的連線會保持開啟等待變更，以 gevent worker 執行時每個連線只占用一個 greenlet，
+不會像同步 worker 一樣讓每個訂閱者占用一個 worker 執行緒
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+# 每個 worker 同時處理的連線數上限（包含保持中的變更串流連線）
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+
+def on_starting(server):
+    """在主行程預先產生模型的細節層級版本，各 worker 啟動時只需確認檔案已是最新，不會重複簡化網格"""
+    import glb_tools
+
+    if os.environ.get('MODEL_LOD_PREGENERATE', '1') != '1' or not glb_tools.NUMPY_AVAILABLE:
+        return
+    models_dir = os.path.join(os.path.dirname(os.path.abspath(glb_tools.__file__)), 'models')
+    cache_dir = os.environ.get('MODEL_LOD_CACHE_PATH', glb_tools.DEFAULT_LOD_CACHE_DIR)
+    try:
+        failures = glb_tools.ensure_lod_files(models_dir, cache_dir)
+    except OSError as e:
+        server.log.warning(f'無法預先產生模型細節層級版本: {e}')
+        return
+    for (path, level), error in failures.items():
+        server.log.warning(f'無法產生模型 {path} 的 {level} 細節層級版本: {error}')
@@ -1,36 +1,73 @@
-from flask import Flask, jsonify, send_from_directory, render_template, request, abort
+from flask import Flask, jsonify, render_template, request
+from werkzeug.http import http_date
+from markupsafe import Markup
+import app_logging
+import asset_compression
+import glb_tools
+import metrics
+import request_profiler
+import phone_importer
 import os
 import json
+import base64
+import hashlib
+import hmac
 import sqlite3
+import queue
+import random
+import atexit
+import mimetypes
+import mmap
+import posixpath
+from collections import OrderedDict
+import re
+from urllib.parse import urlencode
+import signal
+
+# 跨行程檔案鎖：Unix 使用 fcntl，Windows 使用 msvcrt
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+from pathlib import Path
 from werkzeug.utils import secure_filename
 import logging
-import sys
+import threading
+import time
 
 # 判斷是否為開發環境
 is_development = __name__ == '__main__' or os.environ.get('FLASK_ENV') == 'development'
 
-# 設定日誌記錄
-if is_development:
-    # 開發環境：輸出到檔案和控制台
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("app.log"),
-            logging.StreamHandler()
-        ]
-    )
+# 日誌設定：日誌經由佇列交給背景執行緒寫出，請求執行緒不會因寫檔或輸出而阻塞
+# 開發環境預設輸出到 app.log 與控制台；生產環境預設不輸出，設定 LOG_LEVEL 或 LOG_ACCESS 後以 JSON 輸出到標準錯誤
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO' if is_development else '').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text' if is_development else 'json')
+LOG_FILE = os.environ.get('LOG_FILE', 'app.log' if is_development else '')
+# LOG_ACCESS=1 時每個請求輸出一筆存取日誌，LOG_ACCESS_SAMPLE_RATE 為 0 到 1 的取樣率
+LOG_ACCESS = os.environ.get('LOG_ACCESS', '0') == '1'
+LOG_ACCESS_SAMPLE_RATE = float(os.environ.get('LOG_ACCESS_SAMPLE_RATE', '1.0'))
+# 同一個呼叫位置在 LOG_WARNING_INTERVAL 秒內最多輸出 LOG_WARNING_BURST 筆警告，0 表示不限制
+LOG_WARNING_BURST = int(os.environ.get('LOG_WARNING_BURST', '5'))
+LOG_WARNING_INTERVAL = float(os.environ.get('LOG_WARNING_INTERVAL', '60'))
+
+if LOG_LEVEL or LOG_ACCESS:
+    log_handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        log_handlers.append(logging.FileHandler(LOG_FILE, encoding='utf-8'))
+    app_logging.configure_logging(LOG_LEVEL or 'WARNING', log_handlers, LOG_FORMAT,
+                                  LOG_WARNING_BURST, LOG_WARNING_INTERVAL)
 else:
     # 生產環境：完全不輸出日誌
-    logging.basicConfig(
-        level=logging.CRITICAL,
-        format='%(asctime)s - %(name)s - %(levellevel)s - %(message)s',
-        handlers=[
-            logging.NullHandler()
-        ]
-    )
+    logging.basicConfig(level=logging.CRITICAL, handlers=[logging.NullHandler()])
 
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger('access')
+if LOG_ACCESS:
+    access_logger.setLevel(logging.INFO)
 
 app = Flask(__name__)
 
@@ -48,12 +85,220 @@ if not os.path.exists(DATA_PATH):
     except Exception as e:
         logger.error(f"無法建立資料目錄: {e}")
 
+# 資料庫連線池設定
+DB_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.environ.get('SQLITE_POOL_TIMEOUT', '5'))
+DB_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+DB_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
+DB_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', '-8000'))
+# 唯讀連線是否以 immutable 開啟（資料庫於執行期間不會變更時才可啟用）
+DB_IMMUTABLE = os.environ.get('SQLITE_IMMUTABLE', '0') == '1'
+
+# 請求量測：資料庫相關的量測項目需在連線池之前建立
+metrics_registry = metrics.Registry()
+DB_CONNECTION_WAIT = metrics_registry.histogram(
+    'db_connection_wait_seconds', '從連線池取得資料庫連線的時間', ('mode',))
+DB_CONNECTION_HOLD = metrics_registry.histogram(
+    'db_connection_hold_seconds', '資料庫連線借出到歸還的時間（含 SQL 執行與讀取結果）', ('mode',))
+
+# 目前請求中使用資料庫連線的累計時間，由請求結束時的量測讀取
+_request_db_time = threading.local()
+
+class PooledConnection:
+    """連線池借出的連線，close() 時歸還連線池而非真正關閉"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._acquired_at = time.perf_counter()
+
+    def close(self):
+        """歸還連線至連線池"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+            held = time.perf_counter() - self._acquired_at
+            DB_CONNECTION_HOLD.observe(held, ('ro' if self._pool.read_only else 'rw',))
+            _request_db_time.seconds = getattr(_request_db_time, 'seconds', 0.0) + held
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('連線已歸還連線池')
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+class SQLiteConnectionPool:
+    """有上限的 SQLite 連線池，連線建立時套用效能相關的 PRAGMA 設定"""
+
+    def __init__(self, path, read_only=False, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path = path
+        self.read_only = read_only
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._all = []
+        self.created = 0
+        self.reused = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.in_use = 0
+
+    def _connect(self):
+        """建立新的資料庫連線並套用 PRAGMA"""
+        if self.read_only:
+            uri = Path(self.path).resolve().as_uri() + '?mode=ro'
+            if DB_IMMUTABLE:
+                uri += '&immutable=1'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            if DB_JOURNAL_MODE:
+                try:
+                    conn.execute(f'PRAGMA journal_mode={DB_JOURNAL_MODE}')
+                except sqlite3.Error as e:
+                    logger.warning(f"無法設定資料庫日誌模式 {DB_JOURNAL_MODE}: {e}")
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size={DB_CACHE_SIZE}')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def acquire(self):
+        """借出一個連線，連線池已滿時等待其他連線歸還"""
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.reused += 1
+                self.in_use += 1
+            return PooledConnection(self, conn)
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = len(self._all) < self.max_size
+            if can_create:
+                # 先保留名額，避免多個執行緒同時超出上限
+                self._all.append(None)
+        if can_create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._all.remove(None)
+                raise
+            with self._lock:
+                self._all[self._all.index(None)] = conn
+                self.created += 1
+                self.in_use += 1
+            return PooledConnection(self, conn)
+
+        with self._lock:
+            self.waits += 1
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise sqlite3.OperationalError('等待資料庫連線逾時')
+        with self._lock:
+            self.reused += 1
+            self.in_use += 1
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """歸還連線，未提交的交易會先回滾"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"歸還資料庫連線時回滾失敗: {e}")
+        with self._lock:
+            self.in_use -= 1
+        self._idle.put(conn)
+
+    def close_all(self):
+        """關閉所有閒置連線"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._all.remove(conn)
+
+    def stats(self):
+        """返回連線池使用統計"""
+        with self._lock:
+            return {
+                'path': self.path,
+                'read_only': self.read_only,
+                'max_size': self.max_size,
+                'open': len(self._all),
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+                'created': self.created,
+                'reused': self.reused,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+            }
+
+_db_pools = {}
+_db_pools_lock = threading.Lock()
+
+def get_db_pool(read_only=False):
+    """取得目前資料庫路徑對應的連線池"""
+    key = (DB_PATH, read_only)
+    pool = _db_pools.get(key)
+    if pool is None:
+        with _db_pools_lock:
+            pool = _db_pools.get(key)
+            if pool is None:
+                pool = SQLiteConnectionPool(DB_PATH, read_only=read_only)
+                _db_pools[key] = pool
+    return pool
+
+def get_db_pool_stats():
+    """取得所有連線池的使用統計"""
+    return [pool.stats() for pool in list(_db_pools.values())]
+
+def close_db_pools():
+    """關閉所有連線池中的閒置連線"""
+    with _db_pools_lock:
+        pools = list(_db_pools.values())
+        _db_pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+atexit.register(close_db_pools)
+
+# fork 前開啟的連線（例如 gunicorn --preload 時啟動初始化所用的連線）不可在子行程中使用或關閉，
+# 關閉也可能影響父行程的鎖與 WAL 檔案，因此只保留參照避免被回收，子行程改用新的連線池
+_inherited_db_pools = []
+
+def reset_db_pools_after_fork():
+    """在 fork 出的子行程中捨棄繼承的連線池，之後的請求會重新開啟連線"""
+    global _db_pools_lock
+    _inherited_db_pools.extend(_db_pools.values())
+    _db_pools.clear()
+    _db_pools_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_db_pools_after_fork)
+
 # 資料庫連線函式
-def get_db_connection():
-    """建立並返回資料庫連線"""
+def get_db_connection(read_only=False):
+    """從連線池取得資料庫連線，使用完畢後呼叫 close() 歸還"""
+    started = time.perf_counter()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_pool(read_only).acquire()
+        DB_CONNECTION_WAIT.observe(time.perf_counter() - started, ('ro' if read_only else 'rw',))
         return conn
     except Exception as e:
         logger.error(f"資料庫連線錯誤: {e}")
@@ -69,90 +314,632 @@ def get_default_phones():
         logger.error(f"讀取預設手機資料檔案錯誤: {e}")
     return []
 
+# 資料庫結構版本，變更 phones 表格結構時需遞增以觸發重建
+SCHEMA_VERSION = 5
+DB_LOCK_PATH = DB_PATH + '.lock'
+
+def read_catalog_version(conn):
+    """讀取目前的全域資料版本（phone_changes 中最大的 version，每次寫入、匯入或重建各占一列）"""
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM phone_changes').fetchone()[0]
+
+class InterProcessLock:
+    """以檔案鎖實作的跨行程互斥鎖，避免多個 worker 同時重建資料庫"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+b')
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 重試約 10 秒後仍失敗時繼續等待
+                    continue
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+def compute_source_hash():
+    """計算資料庫初始化來源（SQL、JSON 檔案與結構版本）的內容雜湊"""
+    digest = hashlib.sha256(f'schema:{SCHEMA_VERSION}'.encode('utf-8'))
+    for path in (SQL_INIT_PATH, JSON_PATH):
+        digest.update(b'\0' + os.path.basename(path).encode('utf-8') + b'\0')
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b'<missing>')
+    return digest.hexdigest()
+
+def read_db_source_hash():
+    """讀取資料庫中記錄的來源雜湊與結構版本，無法讀取時返回 None"""
+    if not os.path.exists(DB_PATH):
+        return None
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+    try:
+        rows = conn.execute(
+            "SELECT key, value FROM app_meta WHERE key IN ('source_hash', 'schema_version')").fetchall()
+        meta = {row['key']: row['value'] for row in rows}
+        if meta.get('schema_version') != str(SCHEMA_VERSION):
+            return None
+        return meta.get('source_hash')
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
 # 初始化資料庫
-def init_database():
-    """從 SQL 檔案初始化資料庫結構和資料"""
+def init_database(force=False):
+    """從 SQL 檔案初始化資料庫結構和資料，來源未變更時略過；返回是否重建"""
     try:
         if not os.path.exists(SQL_INIT_PATH):
             logger.error("找不到資料庫初始化檔案")
-            return
-            
-        conn = get_db_connection()
-        if conn:
-            with open(SQL_INIT_PATH, 'r', encoding='utf-8') as sql_file:
-                conn.executescript(sql_file.read())
-            conn.commit()
-            conn.close()
-            logger.info("資料庫初始化完成")
+            return False
+
+        source_hash = compute_source_hash()
+        if not force and read_db_source_hash() == source_hash:
+            logger.info("資料庫內容與初始化檔案一致，略過初始化")
+            return False
+
+        with InterProcessLock(DB_LOCK_PATH):
+            # 取得鎖後再確認一次，其他 worker 可能已完成重建
+            if not force and read_db_source_hash() == source_hash:
+                return False
+
+            conn = get_db_connection()
+            if not conn:
+                return False
+            try:
+                with open(SQL_INIT_PATH, 'r', encoding='utf-8') as sql_file:
+                    init_sql = sql_file.read()
+                # 整個重建在單一交易中完成，其他連線在提交前只會看到舊資料
+                conn.executescript(f"""
+                    BEGIN IMMEDIATE;
+                    DROP TABLE IF EXISTS phones;
+                    DROP TABLE IF EXISTS phone_storage;
+                    {init_sql}
+                    ;
+                    {phone_importer.search_schema_script()}
+                    CREATE TABLE IF NOT EXISTS app_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    );
+                """)
+                # 變更記錄在重建時保留，舊版本建立的表格需補上欄位
+                phone_importer.ensure_change_log(conn)
+                # SQL 腳本只寫入文字規格，在同一交易中解析出數值欄位
+                phone_importer.refresh_specs(conn)
+                # 重建會取代全部資料，以一筆不指定手機的變更記錄通知用戶端重新讀取
+                catalog_version = phone_importer.record_phone_change(conn, None, 'reset', ())
+                conn.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('schema_version', ?), ('source_hash', ?)",
+                             (str(SCHEMA_VERSION), source_hash))
+                conn.commit()
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        invalidate_phone_cache()
+        phone_change_feed.notify(catalog_version)
+        logger.info("資料庫初始化完成")
+        return True
     except Exception as e:
         logger.error(f"資料庫初始化錯誤: {e}")
+        return False
 
 # 從預設資料建立資料庫
 def create_db_from_default_data():
     """當 SQL 檔案不可用時，從 JSON 檔案建立資料庫"""
     try:
+        if not os.path.exists(JSON_PATH):
+            logger.error("無法讀取預設資料")
+            return
         conn = get_db_connection()
         if conn:
-            # 建立表格
-            conn.execute('''
-            CREATE TABLE IF NOT EXISTS phones (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                screen TEXT NOT NULL,
-                processor TEXT NOT NULL,
-                camera TEXT NOT NULL,
-                battery TEXT NOT NULL,
-                storage TEXT NOT NULL,
-                model_path TEXT NOT NULL,
-                special_features TEXT NOT NULL
-            )
-            ''')
-            
-            # 清除現有資料
-            conn.execute('DELETE FROM phones')
-            
-            # 從 JSON 檔案讀取並插入預設資料
-            default_phones = get_default_phones()
-            if default_phones:
-                for phone in default_phones:
-                    conn.execute('''
-                    INSERT INTO phones (id, name, screen, processor, camera, battery, storage, model_path, special_features)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        phone['id'], phone['name'], phone['screen'], phone['processor'], 
-                        phone['camera'], phone['battery'], phone['storage'], 
-                        phone['model_path'], phone['special_features']
-                    ))
-                
-                conn.commit()
-                logger.info("從 JSON 檔案建立資料庫完成")
-            else:
-                logger.error("無法讀取預設資料")
-            
-            conn.close()
+            try:
+                # 串流讀取 JSON 並以批次寫入，取代既有資料
+                report = phone_importer.import_phones(conn, phone_importer.iter_records(JSON_PATH, 'json'), replace=True)
+            finally:
+                conn.close()
+            invalidate_phone_cache()
+            phone_change_feed.notify(report['catalog_version'])
+            logger.info(f"從 JSON 檔案建立資料庫完成，共 {report['rows']} 筆")
     except Exception as e:
         logger.error(f"直接建立資料庫錯誤: {e}")
 
+# 手機資料快取設定（秒）：快取在此時間內直接使用，逾時後才檢查資料庫版本
+PHONE_CACHE_TTL = float(os.environ.get('PHONE_CACHE_TTL', '5'))
+
+class PhoneCatalogCache:
+    """手機資料的行程內快取，以資料庫檔案版本判斷是否失效"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._phones = None
+        self._by_id = None
+        self._serialized = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.partial_updates = 0
+
+    def current_version(self):
+        """取得資料庫目前的版本標記（資料庫與 WAL 檔案的 mtime、大小及手動遞增的世代）"""
+        db_version = []
+        # WAL 模式下的寫入先進入 -wal 檔案，因此一併納入版本標記
+        for path in (DB_PATH, DB_PATH + '-wal'):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                db_version.append(None)
+                continue
+            # 連線第一次開始交易時才建立的空 WAL 檔案不含資料，與不存在視為相同
+            db_version.append((stat.st_mtime_ns, stat.st_size) if stat.st_size or path == DB_PATH else None)
+        return (tuple(db_version), self._generation)
+
+    def _is_valid_locked(self):
+        """檢查快取是否仍有效，需在持有鎖的情況下呼叫"""
+        if self._phones is None:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < self.ttl:
+            return True
+        if self.current_version() == self._version:
+            self._checked_at = now
+            return True
+        self._phones = None
+        self._by_id = None
+        self._serialized = {}
+        self.invalidations += 1
+        return False
+
+    def get(self):
+        """取得快取中的手機資料，快取失效或不存在時返回 None"""
+        with self._lock:
+            if self._is_valid_locked():
+                self.hits += 1
+                return self._phones
+            self.misses += 1
+            return None
+
+    def get_index(self):
+        """取得以 id 為鍵的手機資料索引，快取失效或不存在時返回 None"""
+        with self._lock:
+            if self._is_valid_locked():
+                self.hits += 1
+                return self._by_id
+            self.misses += 1
+            return None
+
+    def store(self, phones, version):
+        """以讀取前取得的版本標記保存手機資料"""
+        by_id = {phone['id']: phone for phone in phones}
+        with self._lock:
+            if version[1] != self._generation:
+                # 讀取期間快取已被明確失效，保留的版本標記不可信
+                return
+            self._phones = phones
+            self._by_id = by_id
+            self._serialized = {}
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """明確使快取失效，下一次讀取會重新查詢資料庫"""
+        with self._lock:
+            self._generation += 1
+            if self._phones is not None:
+                self.invalidations += 1
+            self._phones = None
+            self._by_id = None
+            self._serialized = {}
+
+    def apply_write(self, before, after, phone_id, phone):
+        """套用本行程寫入的單筆變更
+
+        before、after 為寫入前後的版本標記。寫入前快取與資料庫一致時只替換受影響的手機，
+        其他手機的資料物件與序列化結果保持不變；否則使整個快取失效。phone 為 None 表示已刪除。
+        """
+        with self._lock:
+            if self._phones is None:
+                return
+            if self._version != before:
+                self._phones = None
+                self._by_id = None
+                self._serialized = {}
+                self.invalidations += 1
+                return
+            old = self._by_id.get(phone_id)
+            # 保持與 SELECT * 相同的順序：更新保留原位置，新增排在最後
+            if phone is None:
+                phones = [item for item in self._phones if item is not old]
+            elif old is None:
+                phones = self._phones + [phone]
+            else:
+                phones = [phone if item is old else item for item in self._phones]
+            by_id = dict(self._by_id)
+            if phone is None:
+                by_id.pop(phone_id, None)
+            else:
+                by_id[phone_id] = phone
+            # 移除以舊清單或舊資料序列化的結果，其他手機的序列化結果繼續使用
+            self._serialized = {key: entry for key, entry in self._serialized.items()
+                                if entry[0] is not self._phones and (old is None or entry[0] is not old)}
+            self._phones = phones
+            self._by_id = by_id
+            self._version = after
+            self._checked_at = time.monotonic()
+            self.partial_updates += 1
+
+    def get_serialized(self, key, payload, serializer):
+        """取得 payload 的序列化結果，同一份快取資料只序列化一次"""
+        with self._lock:
+            entry = self._serialized.get(key)
+        # 以物件身分比對，確保序列化結果與目前快取的資料版本一致
+        if entry is not None and entry[0] is payload:
+            return entry[1]
+        serialized = serializer(payload)
+        with self._lock:
+            self._serialized[key] = (payload, serialized)
+        return serialized
+
+    def stats(self):
+        """返回快取命中統計"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'partial_updates': self.partial_updates,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'cached_rows': len(self._phones) if self._phones is not None else 0,
+                'ttl': self.ttl,
+            }
+
+phone_cache = PhoneCatalogCache(PHONE_CACHE_TTL)
+
+def invalidate_phone_cache():
+    """使手機資料快取失效（資料庫內容變更後呼叫）"""
+    phone_cache.invalidate()
+
+def get_phone_cache_stats():
+    """取得手機資料快取的命中統計"""
+    return phone_cache.stats()
+
+def query_phones():
+    """直接從資料庫查詢所有手機資料，連線失敗時返回 None"""
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+    try:
+        cursor = conn.execute('SELECT * FROM phones')
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def query_phone(phone_id):
+    """以主鍵從資料庫查詢單一手機資料，找不到時返回 None"""
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return next((p for p in get_default_phones() if p['id'] == phone_id), None)
+    try:
+        row = conn.execute('SELECT * FROM phones WHERE id = ?', (phone_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def query_phones_by_id(phone_ids):
+    """以單一 IN 查詢從資料庫讀取多支手機，返回 id 對應資料的字典"""
+    if not phone_ids:
+        return {}
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        wanted = set(phone_ids)
+        return {p['id']: p for p in get_default_phones() if p['id'] in wanted}
+    try:
+        placeholders = ', '.join('?' for _ in phone_ids)
+        rows = conn.execute(f'SELECT * FROM phones WHERE id IN ({placeholders})', list(phone_ids)).fetchall()
+        return {row['id']: dict(row) for row in rows}
+    finally:
+        conn.close()
+
+# 分頁查詢設定：單次請求最多返回的筆數
+API_PHONES_MAX_LIMIT = int(os.environ.get('API_PHONES_MAX_LIMIT', '500'))
+
+def encode_phone_cursor(phone_id):
+    """將頁面最後一筆的 id 編碼為不透明的分頁游標"""
+    return base64.urlsafe_b64encode(phone_id.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_phone_cursor(cursor):
+    """解碼分頁游標，格式錯誤時引發 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        phone_id = base64.b64decode(padded.encode('ascii'), altchars=b'-_', validate=True).decode('utf-8')
+        if phone_id:
+            return phone_id
+    except (ValueError, UnicodeError):
+        pass
+    raise ValueError('無效的分頁游標')
+
+# 可查詢的欄位：原始文字規格與匯入時解析出的數值規格
+PHONE_FIELDS = phone_importer.PHONE_COLUMNS + phone_importer.SPEC_COLUMN_NAMES + (phone_importer.VERSION_COLUMN,)
+
+# 數值規格範圍篩選參數與對應的欄位、比較運算子
+SPEC_RANGE_FILTERS = {
+    'min_battery': ('battery_mah', '>='),
+    'max_battery': ('battery_mah', '<='),
+    'min_screen': ('screen_inches', '>='),
+    'max_screen': ('screen_inches', '<='),
+    'min_camera': ('main_camera_mp', '>='),
+    'max_camera': ('main_camera_mp', '<='),
+}
+
+def parse_spec_filters(args):
+    """解析數值規格篩選參數，返回 (範圍條件清單, 儲存容量清單)，參數錯誤時引發 ValueError"""
+    ranges = []
+    for name, (column, operator) in SPEC_RANGE_FILTERS.items():
+        if name in args:
+            try:
+                ranges.append((column, operator, float(args[name])))
+            except ValueError:
+                raise ValueError(f'{name} 必須是數字')
+    storage_gb = []
+    if 'storage_gb' in args:
+        try:
+            storage_gb = [int(value) for value in args['storage_gb'].split(',') if value.strip()]
+        except ValueError:
+            raise ValueError('storage_gb 必須是以逗號分隔的整數')
+        if not storage_gb:
+            raise ValueError('storage_gb 必須是以逗號分隔的整數')
+    return ranges, storage_gb
+
+def parse_phone_page_args(args):
+    """解析 fields、limit、cursor 與規格篩選參數，皆未指定時返回 None，參數錯誤時引發 ValueError"""
+    page_params = ('fields', 'limit', 'cursor', 'storage_gb', *SPEC_RANGE_FILTERS)
+    if not any(name in args for name in page_params):
+        return None
+
+    fields = list(PHONE_FIELDS)
+    if 'fields' in args:
+        requested = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in requested if field not in PHONE_FIELDS]
+        if not requested or unknown:
+            raise ValueError(f"無效的欄位: {', '.join(unknown) or args['fields']}")
+        # id 為分頁游標的依據，一律包含
+        fields = ['id'] + [field for field in dict.fromkeys(requested) if field != 'id']
+
+    limit = None
+    if 'limit' in args:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError('limit 必須是整數')
+        if not 1 <= limit <= API_PHONES_MAX_LIMIT:
+            raise ValueError(f'limit 必須介於 1 到 {API_PHONES_MAX_LIMIT} 之間')
+
+    after_id = decode_phone_cursor(args['cursor']) if 'cursor' in args else None
+    return fields, limit, after_id, parse_spec_filters(args)
+
+def query_phone_page(fields, limit=None, after_id=None, filters=((), ())):
+    """以 id 鍵集分頁查詢指定欄位，多取一筆以判斷是否還有下一頁；連線失敗時返回 None"""
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+    ranges, storage_gb = filters
+    # 欄位名稱已對照 PHONE_FIELDS 與 SPEC_RANGE_FILTERS 驗證，可安全組入 SQL
+    sql = f"SELECT {', '.join(fields)} FROM phones"
+    conditions = []
+    params = []
+    if after_id is not None:
+        conditions.append('id > ?')
+        params.append(after_id)
+    for column, operator, value in ranges:
+        conditions.append(f'{column} {operator} ?')
+        params.append(value)
+    if storage_gb:
+        placeholders = ', '.join('?' for _ in storage_gb)
+        conditions.append(f'id IN (SELECT phone_id FROM phone_storage WHERE storage_gb IN ({placeholders}))')
+        params.extend(storage_gb)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY id'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+    try:
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+    except sqlite3.OperationalError as e:
+        # 例如唯讀部署中的舊資料庫尚未建立數值規格欄位
+        logger.warning(f"分頁查詢失敗，改用記憶體資料: {e}")
+        return None
+    finally:
+        conn.close()
+
+def phone_matches_filters(phone, filters):
+    """在記憶體中以與 SQL 相同的規則檢查手機是否符合規格篩選"""
+    ranges, storage_gb = filters
+    specs = phone_importer.parse_specs(phone)
+    for column, operator, value in ranges:
+        if specs[column] is None:
+            return False
+        if operator == '>=' and specs[column] < value or operator == '<=' and specs[column] > value:
+            return False
+    return not storage_gb or any(option in specs['storage_gb'] for option in storage_gb)
+
+def page_phones_in_memory(phones, fields, limit=None, after_id=None, filters=((), ())):
+    """資料庫無法使用時，以相同的排序、游標與篩選規則對記憶體中的資料分頁"""
+    rows = sorted((phone for phone in phones
+                   if (after_id is None or phone['id'] > after_id) and phone_matches_filters(phone, filters)),
+                  key=lambda phone: phone['id'])
+    if limit is not None:
+        rows = rows[:limit + 1]
+    results = []
+    for phone in rows:
+        # 記憶體中的資料可能來自 JSON 檔案而沒有數值規格欄位
+        if any(field in phone_importer.SPEC_COLUMN_NAMES and field not in phone for field in fields):
+            phone = {**phone, **phone_importer.parse_specs(phone)}
+        results.append({field: phone.get(field) for field in fields})
+    return results
+
+# 全文檢索設定：預設返回筆數、摘要長度（trigram 詞元數）與符合片段的標示
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_SNIPPET_TOKENS = 24
+SEARCH_HIGHLIGHT = ('<mark>', '</mark>')
+# trigram 斷詞無法比對少於三個字元的詞，這些詞改以 LIKE 篩選
+SEARCH_MIN_TERM_LENGTH = 3
+# bm25 欄位權重，順序與 SEARCH_COLUMNS 相同，名稱符合時排序較前
+SEARCH_WEIGHTS = (10.0, 2.0, 2.0, 2.0, 1.0)
+
+def _fts_phrase(term):
+    """將搜尋詞轉為 FTS5 片語，避免詞中的運算子被解讀為查詢語法"""
+    return '"' + term.replace('"', '""') + '"'
+
+def _like_pattern(term):
+    """將搜尋詞轉為不分大小寫的 LIKE 樣式"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def make_search_snippet(phone, terms, width=SEARCH_SNIPPET_TOKENS):
+    """在符合最多搜尋詞的欄位中擷取摘要並標示符合的片段"""
+    start_mark, end_mark = SEARCH_HIGHLIGHT
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True)),
+                         re.IGNORECASE)
+    # 選擇符合最多不同搜尋詞的欄位，相同時依 SEARCH_COLUMNS 的順序
+    best_text, best_count = None, 0
+    for column in phone_importer.SEARCH_COLUMNS:
+        text = str(phone.get(column) or '')
+        count = len({match.group(0).casefold() for match in pattern.finditer(text)})
+        if count > best_count:
+            best_text, best_count = text, count
+    if best_text is None:
+        return ''
+    begin = max(0, pattern.search(best_text).start() - width // 2)
+    end = min(len(best_text), begin + width)
+    window = pattern.sub(lambda m: f'{start_mark}{m.group(0)}{end_mark}', best_text[begin:end])
+    return ('…' if begin > 0 else '') + window + ('…' if end < len(best_text) else '')
+
+def search_phones(query, limit=SEARCH_DEFAULT_LIMIT):
+    """以 FTS5 全文檢索手機資料，依 bm25 排序並附上摘要；連線失敗或尚無索引時返回 None"""
+    terms = query.split()
+    long_terms = [term for term in terms if len(term) >= SEARCH_MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < SEARCH_MIN_TERM_LENGTH]
+
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+    try:
+        if long_terms:
+            weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+            sql = (f"SELECT p.*, snippet(phones_fts, -1, ?, ?, '…', {SEARCH_SNIPPET_TOKENS}) AS snippet, "
+                   f"bm25(phones_fts, {weights}) AS rank "
+                   "FROM phones_fts JOIN phones p ON p.rowid = phones_fts.rowid WHERE phones_fts MATCH ?")
+            params = [*SEARCH_HIGHLIGHT, ' '.join(_fts_phrase(term) for term in long_terms)]
+            order = 'rank'
+        else:
+            sql = 'SELECT p.*, NULL AS snippet, 0.0 AS rank FROM phones p WHERE 1'
+            params = []
+            order = 'p.id'
+        for term in short_terms:
+            conditions = ' OR '.join(f"p.{column} LIKE ? ESCAPE '\\'" for column in phone_importer.SEARCH_COLUMNS)
+            sql += f' AND ({conditions})'
+            params.extend([_like_pattern(term)] * len(phone_importer.SEARCH_COLUMNS))
+        sql += f' ORDER BY {order} LIMIT ?'
+        params.append(limit)
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+    except sqlite3.OperationalError as e:
+        # 例如唯讀部署中的舊資料庫尚未建立 phones_fts
+        logger.warning(f"全文檢索查詢失敗，改用記憶體搜尋: {e}")
+        return None
+    finally:
+        conn.close()
+
+    for row in rows:
+        # bm25 分數越小越相關，轉為越大越相關
+        row['score'] = -row.pop('rank') or 0.0
+        if not row['snippet'] or short_terms:
+            row['snippet'] = make_search_snippet(row, terms)
+    return rows
+
+def search_phones_in_memory(phones, query, limit=SEARCH_DEFAULT_LIMIT):
+    """資料庫全文檢索無法使用時，以不分大小寫的子字串比對搜尋記憶體中的資料"""
+    terms = query.split()
+    results = []
+    for phone in phones:
+        texts = [str(phone.get(column) or '').casefold() for column in phone_importer.SEARCH_COLUMNS]
+        if not all(any(term.casefold() in text for text in texts) for term in terms):
+            continue
+        score = sum(weight * text.count(term.casefold())
+                    for term in terms for weight, text in zip(SEARCH_WEIGHTS, texts))
+        results.append({**phone, 'snippet': make_search_snippet(phone, terms), 'score': float(score)})
+    results.sort(key=lambda phone: (-phone['score'], phone['id']))
+    return results[:limit]
+
+# 以 ID 查詢單一手機資料
+def find_phone(phone_id):
+    """優先使用快取的 id 索引查詢手機，快取未命中時改以主鍵查詢資料庫"""
+    phones_by_id = phone_cache.get_index()
+    if phones_by_id is not None:
+        return phones_by_id.get(phone_id)
+    return query_phone(phone_id)
+
+def find_phones(phone_ids):
+    """一次查詢多支手機，優先使用快取的 id 索引，快取未命中時以單一 IN 查詢讀取資料庫"""
+    phones_by_id = phone_cache.get_index()
+    if phones_by_id is not None:
+        return {phone_id: phones_by_id[phone_id] for phone_id in phone_ids if phone_id in phones_by_id}
+    return query_phones_by_id(phone_ids)
+
 # 從資料庫讀取手機資料
 def load_phones_data():
-    """從 SQLite 資料庫讀取手機資料"""
+    """從快取或 SQLite 資料庫讀取手機資料（返回的清單為共用快取，呼叫端不應修改）"""
     try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.execute('SELECT * FROM phones')
-            phones = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            if phones:
-                return phones
-        
-        # 如果資料庫讀取失敗或沒有資料，重新初始化資料庫並再次讀取
-        init_database()
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.execute('SELECT * FROM phones')
-            phones = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            return phones if phones else get_default_phones()
+        phones = phone_cache.get()
+        if phones is not None:
+            return phones
+
+        version = phone_cache.current_version()
+        try:
+            phones = query_phones()
+        except sqlite3.Error as e:
+            logger.warning(f"無法讀取 phones 表格: {e}")
+            phones = None
+        # 空的資料表格是有效的內容（例如透過寫入 API 刪除全部手機），不重建資料庫
+        if phones is not None:
+            phone_cache.store(phones, version)
+            return phones
+
+        # 只有在無法連線或表格不存在、無法讀取時，重新初始化資料庫並再次讀取
+        init_database(force=True)
+        version = phone_cache.current_version()
+        phones = query_phones()
+        if phones is not None:
+            phone_cache.store(phones, version)
+            return phones
         
         # 若仍然失敗，返回從 JSON 讀取的預設資料
         return get_default_phones()
@@ -172,10 +959,259 @@ def save_default_data():
     except Exception as e:
         logger.error(f"保存預設資料時發生錯誤: {e}")
 
+# 靜態資源清單設定
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+STATIC_EXTENSIONS = ('.css', '.js', '.html', '.png', '.jpg', '.jpeg', '.gif', '.glb')
+# 靜態資源清單在此秒數後重新掃描檔案系統（0 表示只在收到變更訊號時重新掃描）
+STATIC_MANIFEST_TTL = float(os.environ.get('STATIC_MANIFEST_TTL', '60'))
+# 靜態資源清單只收錄專案根目錄中的網頁資源，以及下列目錄（含子目錄）中的檔案（相對於專案根目錄）；
+# 虛擬環境、版本控制與測試等其他目錄不會被掃描或提供
+STATIC_ASSET_DIRS = ('models', 'static')
+# 上述目錄中不列入清單的子目錄
+STATIC_EXCLUDED_DIRS = {'models/lod'}
+# 內容雜湊網址使用的雜湊長度，以及雜湊網址的快取時間（內容變更時網址也會改變，可永久快取）
+FINGERPRINT_LENGTH = 12
+FINGERPRINT_CACHE_MAX_AGE = 31536000
+
+def fingerprint_path(relative_path, digest):
+    """在副檔名前加入內容雜湊，例如 main.js 轉為 main.<雜湊>.js"""
+    stem, ext = posixpath.splitext(relative_path)
+    return f'{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}'
+
+class StaticAssetManifest:
+    """啟動時建立的可提供檔案清單，將請求路徑解析為記憶體中的字典查詢"""
+
+    def __init__(self, root, ttl):
+        self.root = root
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # 同一時間只有一個執行緒重新掃描，逾時後的掃描在背景執行緒進行
+        self._refresh_lock = threading.Lock()
+        self._entries = {}
+        self._by_path = {}
+        self._fingerprinted = {}
+        self._urls = {}
+        self._built_at = None
+        self.version = 0
+
+    @staticmethod
+    def _is_servable(relative_path):
+        """檢查檔案是否可透過靜態資源路由提供（只提供靜態資源類型的檔案）"""
+        name = posixpath.basename(relative_path)
+        return not name.startswith('.') and name.endswith(STATIC_EXTENSIONS)
+
+    def _iter_directories(self):
+        """列出清單涵蓋的目錄：專案根目錄只取其中的檔案，STATIC_ASSET_DIRS 包含子目錄，略過隱藏目錄"""
+        try:
+            root_files = [entry.name for entry in os.scandir(self.root) if entry.is_file()]
+        except OSError as e:
+            logger.warning(f"無法掃描靜態資源目錄 {self.root}: {e}")
+            root_files = []
+        yield self.root, '', root_files
+        for asset_dir in STATIC_ASSET_DIRS:
+            for directory, dirnames, filenames in os.walk(os.path.join(self.root, asset_dir)):
+                relative_dir = os.path.relpath(directory, self.root).replace(os.sep, '/')
+                dirnames[:] = [
+                    name for name in dirnames
+                    if not name.startswith('.') and posixpath.join(relative_dir, name) not in STATIC_EXCLUDED_DIRS
+                ]
+                yield directory, relative_dir, filenames
+
+    def _hash_file(self, path):
+        """計算檔案內容的 SHA-256 雜湊"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _variant_sizes(path, mtime_ns, filenames):
+        """返回不早於原始檔案的預先壓縮版本大小（編碼對應位元組數）"""
+        sizes = {}
+        for encoding in asset_compression.ENCODING_EXTENSIONS:
+            variant_path = asset_compression.get_variant_path(path, encoding)
+            if os.path.basename(variant_path) not in filenames:
+                continue
+            try:
+                variant_stat = os.stat(variant_path)
+            except OSError:
+                continue
+            if variant_stat.st_mtime_ns >= mtime_ns:
+                sizes[encoding] = variant_stat.st_size
+        return sizes
+
+    def refresh(self):
+        """重新掃描靜態資源目錄，內容未變更的檔案沿用先前計算的雜湊"""
+        with self._refresh_lock:
+            return self._rebuild()
+
+    def _refresh_in_background(self):
+        """在背景執行緒重新掃描（呼叫端已取得 _refresh_lock）"""
+        try:
+            self._rebuild()
+        except Exception as e:
+            logger.error(f"重新掃描靜態資源清單時發生錯誤: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _rebuild(self):
+        entries = {}
+        for directory, relative_dir, filenames in self._iter_directories():
+            filename_set = set(filenames)
+            for filename in filenames:
+                relative_path = posixpath.join(relative_dir, filename)
+                if not self._is_servable(relative_path):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                    # 預先壓縮版本的大小在掃描時一併記錄，傳送時不需逐次檢查檔案
+                    variants = (self._variant_sizes(path, stat.st_mtime_ns, filename_set)
+                                if asset_compression.is_compressible(path) else {})
+                    previous = self._entries.get(relative_path)
+                    if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                        entries[relative_path] = {**previous, 'variants': variants}
+                        continue
+                    entries[relative_path] = {
+                        'path': path,
+                        'size': stat.st_size,
+                        'mtime_ns': stat.st_mtime_ns,
+                        'hash': self._hash_file(path),
+                        'variants': variants,
+                    }
+                except OSError as e:
+                    logger.warning(f"無法加入靜態資源清單: {relative_path}: {e}")
+        urls = {relative_path: fingerprint_path(relative_path, entry['hash']) for relative_path, entry in entries.items()}
+        fingerprinted = {url: relative_path for relative_path, url in urls.items()}
+        by_path = {entry['path']: entry for entry in entries.values()}
+        with self._lock:
+            # 只有檔案內容或中繼資料變更時才遞增版本，壓縮版本的變化不影響內容雜湊網址
+            if {key: (entry['size'], entry['mtime_ns'], entry['hash']) for key, entry in entries.items()} != \
+                    {key: (entry['size'], entry['mtime_ns'], entry['hash']) for key, entry in self._entries.items()}:
+                self.version += 1
+            self._entries = entries
+            self._by_path = by_path
+            self._urls = urls
+            self._fingerprinted = fingerprinted
+            self._built_at = time.monotonic()
+        return entries
+
+    def entries(self):
+        """取得目前的清單；第一次使用時同步建立，逾時後由單一背景執行緒重新掃描並暫時沿用目前的清單"""
+        built_at = self._built_at
+        if built_at is None:
+            with self._refresh_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif self.ttl > 0 and time.monotonic() - built_at >= self.ttl and self._refresh_lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name='static-manifest-refresh', daemon=True).start()
+        return self._entries
+
+    def get_by_path(self, path):
+        """以檔案的絕對路徑查詢清單項目，不在清單中時返回 None"""
+        self.entries()
+        return self._by_path.get(path)
+
+    def get(self, relative_path):
+        """以相對於專案根目錄的路徑查詢清單項目"""
+        return self.entries().get(relative_path)
+
+    def fingerprinted(self, relative_path):
+        """取得檔案的內容雜湊路徑，清單中沒有的檔案返回原路徑"""
+        self.entries()
+        return self._urls.get(relative_path, relative_path)
+
+    def resolve_fingerprinted(self, relative_path):
+        """將內容雜湊路徑解析為清單項目，雜湊與目前內容不符時返回 None"""
+        self.entries()
+        original = self._fingerprinted.get(relative_path)
+        return self._entries.get(original) if original else None
+
+    def original_path(self, relative_path):
+        """將內容雜湊路徑轉回原始路徑，不是目前清單中的雜湊路徑時返回原值"""
+        self.entries()
+        return self._fingerprinted.get(relative_path, relative_path)
+
+    def manifest(self):
+        """返回原始路徑與內容雜湊路徑的對照表"""
+        self.entries()
+        return dict(self._urls)
+
+    def resolve(self, base, path):
+        """依 safe_path_join 的規則將請求路徑解析為清單項目，不存在時返回 None"""
+        entries = self.entries()
+        base_prefix = os.path.relpath(os.path.abspath(base), self.root).replace(os.sep, '/')
+        base_prefix = '' if base_prefix == '.' else base_prefix
+
+        normalized = posixpath.normpath(path.replace('\\', '/'))
+        if not normalized.startswith(('../', '/')) and normalized != '..':
+            # 常見靜態資源以專案根目錄為準，模型檔案再以檔名於 models 目錄中查詢
+            if normalized.endswith(STATIC_EXTENSIONS):
+                entry = entries.get(normalized)
+                if entry:
+                    return entry
+                if normalized.endswith('.glb'):
+                    entry = entries.get(posixpath.join('models', posixpath.basename(normalized)))
+                    if entry:
+                        return entry
+
+        flattened = secure_filename(path)
+        if not flattened:
+            return None
+        return entries.get(posixpath.join(base_prefix, flattened) if base_prefix else flattened)
+
+    def handles(self, base):
+        """檢查基礎目錄是否為清單涵蓋的絕對路徑（其他目錄仍以檔案系統檢查）"""
+        if not os.path.isabs(base):
+            return False
+        base = os.path.normpath(base)
+        return base == self.root or base.startswith(self.root + os.sep)
+
+static_manifest = StaticAssetManifest(PROJECT_ROOT, STATIC_MANIFEST_TTL)
+
+def asset_url(relative_path):
+    """取得靜態資源的內容雜湊網址（供模板使用）"""
+    return '/' + static_manifest.fingerprinted(relative_path)
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+def fingerprint_model_path(phone):
+    """返回 model_path 改為內容雜湊路徑的手機資料副本，沒有對應檔案時返回原資料"""
+    model_path = phone.get('model_path')
+    if not model_path:
+        return phone
+    relative_path = model_path.lstrip('/')
+    fingerprinted = static_manifest.fingerprinted(relative_path)
+    if fingerprinted == relative_path:
+        return phone
+    return {**phone, 'model_path': model_path[:len(model_path) - len(relative_path)] + fingerprinted}
+
+def original_model_path(model_path):
+    """將 API 回應中的內容雜湊 model_path 轉回資料庫儲存的原始路徑"""
+    relative_path = model_path.lstrip('/')
+    original = static_manifest.original_path(relative_path)
+    if original == relative_path:
+        return model_path
+    return model_path[:len(model_path) - len(relative_path)] + original
+
+def refresh_static_manifest(*_):
+    """重新建立靜態資源清單（可作為 SIGHUP 訊號處理函式）"""
+    try:
+        static_manifest.refresh()
+        logger.info("靜態資源清單已更新")
+    except Exception as e:
+        logger.error(f"更新靜態資源清單時發生錯誤: {e}")
+
 # 處理路徑遍歷嘗試
 def safe_path_join(base, path):
+    # 清單涵蓋的目錄直接以記憶體查詢解析，不存在的路徑不會存取檔案系統
+    if static_manifest.handles(base):
+        entry = static_manifest.resolve(base, path)
+        return entry['path'] if entry else None
+
     # 處理常見靜態資源的特殊情況
-    if path.endswith(('.css', '.js', '.html', '.png', '.jpg', '.jpeg', '.gif', '.glb')):
+    if path.endswith(STATIC_EXTENSIONS):
         # 對靜態資源使用專案根目錄
         project_root = os.path.dirname(__file__)
         full_path = os.path.normpath(os.path.join(project_root, path))
@@ -194,15 +1230,249 @@ def safe_path_join(base, path):
     
     # 確保路徑在基礎目錄內
     if not full_path.startswith(os.path.abspath(base)):
-        logger.warning(f"嘗試存取基礎目錄外的路徑: {path}")
+        logger.warning("嘗試存取基礎目錄外的路徑: %s", path)
         return None
     return full_path
 
+def resolve_asset(base, filename):
+    """解析資源請求路徑，返回 (檔案路徑, 是否為內容雜湊網址)，找不到時檔案路徑為 None"""
+    prefix = os.path.relpath(os.path.abspath(base), PROJECT_ROOT).replace(os.sep, '/')
+    entry = static_manifest.resolve_fingerprinted(filename if prefix == '.' else posixpath.join(prefix, filename))
+    if entry:
+        return entry['path'], True
+    return safe_path_join(base, filename), False
+
+# API 回應快取設定（秒）：瀏覽器可直接使用回應的時間，逾時後以 ETag 重新驗證
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', '0'))
+
+def serialize_json(payload):
+    """將資料序列化為 JSON 位元組並計算內容雜湊 ETag"""
+    body = (app.json.dumps(payload) + '\n').encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return body, etag
+
+def serialize_phones(payload):
+    """將手機資料（單筆或清單）的模型路徑改為內容雜湊路徑後序列化"""
+    if isinstance(payload, list):
+        return serialize_json([fingerprint_model_path(phone) for phone in payload])
+    return serialize_json(fingerprint_model_path(payload))
+
+def cached_json_response(key, payload, serializer=serialize_json):
+    """以預先序列化的內容建立 JSON 回應，並處理 If-None-Match 條件請求"""
+    body, etag = phone_cache.get_serialized(key, payload, serializer)
+    return json_response(body, etag)
+
+def cached_phones_response(key, payload):
+    """建立手機資料的快取 JSON 回應，靜態資源清單變更時重新序列化"""
+    return cached_json_response((key, static_manifest.version), payload, serialize_phones)
+
+def json_response(body, etag):
+    """以已序列化的 JSON 內容建立回應，並處理 If-None-Match 條件請求"""
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype=app.json.mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={API_CACHE_MAX_AGE}'
+    return response
+
+# 模型中繼資料索引設定（秒）：在此時間內不重新掃描模型目錄
+MODEL_INDEX_TTL = float(os.environ.get('MODEL_INDEX_TTL', '5'))
+
+class ModelMetadataIndex:
+    """由各 GLB 檔案 JSON 區塊建立的模型中繼資料索引，只重新解析有變更的檔案"""
+
+    def __init__(self, models_path, ttl):
+        self.models_path = models_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._listing = []
+        self._by_file = {}
+        self._checked_at = None
+        self.version = 0
+
+    def _build_entry(self, filename, path):
+        """解析單一模型檔案並加上存取路徑"""
+        metadata = glb_tools.summarize_glb(path)
+        url = f'models/{filename}'
+        return {
+            'file': filename,
+            'url': url,
+            'lods': {level: f'{url}?lod={level}' for level in glb_tools.LOD_LEVELS},
+            **metadata,
+        }
+
+    def refresh(self, force=False):
+        """掃描模型目錄並更新有變更的項目"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.ttl:
+                return
+            self._checked_at = now
+
+            entries = {}
+            try:
+                scanned = [entry for entry in os.scandir(self.models_path)
+                           if entry.is_file() and entry.name.lower().endswith('.glb')]
+            except OSError as e:
+                logger.error(f"無法掃描模型目錄: {e}")
+                scanned = []
+            for entry in scanned:
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                cached = self._entries.get(entry.name)
+                if cached and cached[0] == signature:
+                    entries[entry.name] = cached
+                    continue
+                try:
+                    entries[entry.name] = (signature, self._build_entry(entry.name, entry.path))
+                except Exception as e:
+                    logger.warning(f"無法解析模型 {entry.name} 的中繼資料: {e}")
+
+            if entries != self._entries:
+                self._entries = entries
+                self._listing = [metadata for _, metadata in
+                                 (entries[name] for name in sorted(entries))]
+                self._by_file = {metadata['file']: metadata for metadata in self._listing}
+                self.version += 1
+
+    def list(self):
+        """返回所有模型的中繼資料（內容未變更時為同一個清單物件）"""
+        self.refresh()
+        return self._listing
+
+    def get(self, filename):
+        """依檔名取得單一模型的中繼資料"""
+        self.refresh()
+        return self._by_file.get(filename)
+
+model_index = ModelMetadataIndex(MODELS_PATH, MODEL_INDEX_TTL)
+
+_phones_with_models = (None, None, None)
+
+def join_model_metadata(phones):
+    """在手機資料中加入對應模型的中繼資料，相同的輸入版本重複使用同一份結果"""
+    global _phones_with_models
+    models = model_index.list()
+    cached_phones, cached_models, joined = _phones_with_models
+    if cached_phones is phones and cached_models is models:
+        return joined
+    joined = [attach_model_metadata(phone) for phone in phones]
+    _phones_with_models = (phones, models, joined)
+    return joined
+
+def attach_model_metadata(phone):
+    """返回加入對應模型中繼資料的手機資料副本"""
+    return {**phone, 'model': model_index.get(os.path.basename(phone.get('model_path') or ''))}
+
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    try:
+        return cached_json_response('models', model_index.list())
+    except Exception as e:
+        logger.error(f"API 處理錯誤: {e}")
+        return jsonify({'error': '讀取模型資料時發生錯誤'}), 500
+
+@app.route('/api/models/<filename>', methods=['GET'])
+def get_model_metadata(filename):
+    try:
+        metadata = model_index.get(filename)
+        if metadata:
+            return cached_json_response(('model', filename), metadata)
+        return jsonify({'error': '找不到指定的模型'}), 404
+    except Exception as e:
+        logger.error(f"API 處理錯誤: {e}")
+        return jsonify({'error': '讀取模型資料時發生錯誤'}), 500
+
 @app.route('/api/phones', methods=['GET'])
 def get_phones():
     try:
+        try:
+            page_args = parse_phone_page_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if page_args is not None:
+            return get_phone_page(*page_args)
+
         phones = load_phones_data()
-        return jsonify(phones)
+        if request.args.get('include') == 'model':
+            return cached_phones_response(('phones', 'model'), join_model_metadata(phones))
+        return cached_phones_response('phones', phones)
+    except Exception as e:
+        logger.error(f"API 處理錯誤: {e}")
+        return jsonify({'error': '讀取手機資料時發生錯誤'}), 500
+
+def get_phone_page(fields, limit, after_id, filters):
+    """返回符合篩選條件、指定欄位的一頁手機資料，下一頁游標放在 X-Next-Cursor 與 Link 標頭"""
+    include_model = request.args.get('include') == 'model'
+    columns = fields + ['model_path'] if include_model and 'model_path' not in fields else fields
+    rows = query_phone_page(columns, limit, after_id, filters)
+    if rows is None:
+        rows = page_phones_in_memory(load_phones_data(), columns, limit, after_id, filters)
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_phone_cursor(rows[-1]['id'])
+    if include_model:
+        rows = [attach_model_metadata(row) for row in rows]
+        if columns is not fields:
+            for row in rows:
+                del row['model_path']
+
+    response = json_response(*serialize_phones(rows))
+    if next_cursor:
+        query = [(name, value) for name, value in request.args.items(multi=True) if name != 'cursor']
+        query.append(('cursor', next_cursor))
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(query)}>; rel="next"'
+    return response
+
+@app.route('/api/phones/search', methods=['GET'])
+def search_phones_api():
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': '請提供搜尋關鍵字 q'}), 400
+        try:
+            limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'limit 必須是整數'}), 400
+        if not 1 <= limit <= API_PHONES_MAX_LIMIT:
+            return jsonify({'error': f'limit 必須介於 1 到 {API_PHONES_MAX_LIMIT} 之間'}), 400
+
+        results = search_phones(query, limit)
+        if results is None:
+            results = search_phones_in_memory(load_phones_data(), query, limit)
+        return json_response(*serialize_phones(results))
+    except Exception as e:
+        logger.error(f"API 處理錯誤: {e}")
+        return jsonify({'error': '搜尋手機資料時發生錯誤'}), 500
+
+@app.route('/api/phones/batch', methods=['GET', 'POST'])
+def get_phones_batch():
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True)
+            phone_ids = body.get('ids') if isinstance(body, dict) else None
+            if not isinstance(phone_ids, list) or not all(isinstance(phone_id, str) for phone_id in phone_ids):
+                return jsonify({'error': '請在 JSON 內容中以 ids 陣列提供手機 ID'}), 400
+        else:
+            phone_ids = [phone_id.strip() for phone_id in request.args.get('ids', '').split(',')]
+        # 保留第一次出現的順序並移除重複與空白的 ID
+        phone_ids = [phone_id for phone_id in dict.fromkeys(phone_ids) if phone_id]
+        if not phone_ids:
+            return jsonify({'error': '請提供至少一個手機 ID'}), 400
+        if len(phone_ids) > API_PHONES_MAX_LIMIT:
+            return jsonify({'error': f'一次最多查詢 {API_PHONES_MAX_LIMIT} 支手機'}), 400
+
+        found = find_phones(phone_ids)
+        payload = {
+            'phones': [fingerprint_model_path(found[phone_id]) for phone_id in phone_ids if phone_id in found],
+            'missing': [phone_id for phone_id in phone_ids if phone_id not in found],
+        }
+        return json_response(*serialize_json(payload))
     except Exception as e:
         logger.error(f"API 處理錯誤: {e}")
         return jsonify({'error': '讀取手機資料時發生錯誤'}), 500
@@ -210,35 +1480,858 @@ def get_phones():
 @app.route('/api/phones/<phone_id>', methods=['GET'])
 def get_phone(phone_id):
     try:
-        phones = load_phones_data()
-        phone = next((p for p in phones if p['id'] == phone_id), None)
+        phone = find_phone(phone_id)
         
         if phone:
-            return jsonify(phone)
+            return cached_phones_response(('phone', phone_id), phone)
         else:
             return jsonify({'error': '找不到指定的手機'}), 404
     except Exception as e:
         logger.error(f"API 處理錯誤: {e}")
         return jsonify({'error': '讀取手機資料時發生錯誤'}), 500
 
+# 手機資料寫入 API 設定：未設定權杖時停用寫入，請求需帶 Authorization: Bearer <權杖>
+PHONES_WRITE_TOKEN = os.environ.get('PHONES_WRITE_TOKEN', '')
+PHONE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+PHONE_FIELD_MAX_LENGTH = 2000
+# 與 /api/phones 下其他路徑衝突的 ID
+PHONE_RESERVED_IDS = {'search', 'batch', 'stream'}
+# 由伺服器產生的欄位，寫入時忽略，讓用戶端可以直接送回讀取到的資料
+PHONE_READ_ONLY_FIELDS = set(phone_importer.SPEC_COLUMN_NAMES) | {phone_importer.VERSION_COLUMN, 'model'}
+
+class PhoneWriteError(Exception):
+    """無法完成手機資料寫入，status 為對應的 HTTP 狀態碼"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def validate_phone_payload(data, partial=False):
+    """依 phones 表格結構檢查寫入內容，返回要寫入的欄位，不符合時引發 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('請以 JSON 物件提供手機資料')
+    unknown = sorted(set(data) - set(phone_importer.PHONE_COLUMNS) - PHONE_READ_ONLY_FIELDS)
+    if unknown:
+        raise ValueError(f'未知的欄位: {", ".join(unknown)}')
+
+    values = {}
+    for column in phone_importer.PHONE_COLUMNS:
+        if column not in data:
+            continue
+        value = data[column]
+        # phones 表格的欄位皆為 TEXT NOT NULL
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'{column} 必須是非空白的字串')
+        if len(value) > PHONE_FIELD_MAX_LENGTH:
+            raise ValueError(f'{column} 不可超過 {PHONE_FIELD_MAX_LENGTH} 個字元')
+        values[column] = value
+    if 'model_path' in values:
+        # 讀取 API 返回的是內容雜湊路徑，寫回時存入原始路徑，避免檔案更新後指向舊的雜湊
+        values['model_path'] = original_model_path(values['model_path'])
+    if not partial:
+        missing = [column for column in phone_importer.PHONE_COLUMNS if column != 'id' and column not in values]
+        if missing:
+            raise ValueError(f'缺少欄位: {", ".join(missing)}')
+    if 'id' in values and (not PHONE_ID_PATTERN.fullmatch(values['id']) or values['id'] in PHONE_RESERVED_IDS):
+        raise ValueError('id 只能包含英數字、底線與連字號（最多 64 個字元），且不可為保留字')
+    return values
+
+def write_phone_record(phone_id, op, values=None, if_match=None):
+    """在單一交易中新增、更新或刪除一支手機並記錄變更
+
+    op 為 create、replace、patch 或 delete；if_match 為請求的 If-Match 條件。
+    返回 {'phone': 寫入後的資料（刪除時為 None）, 'created': 是否新增, 'version': 全域資料版本}。
+    """
+    with InterProcessLock(DB_LOCK_PATH):
+        conn = get_db_connection()
+        if not conn:
+            raise PhoneWriteError('無法連線至資料庫', 503)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # 取得寫入鎖後才讀取版本標記，確保與快取比較時沒有其他寫入介入
+            before = phone_cache.current_version()
+            row = conn.execute('SELECT * FROM phones WHERE id = ?', (phone_id,)).fetchone()
+            current = dict(row) if row else None
+
+            # If-Match 以單筆手機 API 回應的 ETag 比對，避免覆寫其他請求的修改
+            if if_match and (not current or not (if_match.star_tag or if_match.contains(serialize_phones(current)[1]))):
+                raise PhoneWriteError('資料已被其他請求修改', 412)
+            if op == 'create' and current:
+                raise PhoneWriteError('手機 ID 已存在', 409)
+            if op in ('patch', 'delete') and not current:
+                raise PhoneWriteError('找不到指定的手機', 404)
+
+            if op == 'delete':
+                conn.execute('DELETE FROM phones WHERE id = ?', (phone_id,))
+                phone, fields = None, ()
+            else:
+                base = {column: current[column] for column in phone_importer.PHONE_COLUMNS} if op == 'patch' else {}
+                merged = {**base, **values, 'id': phone_id}
+                fields = [column for column in phone_importer.PHONE_COLUMNS
+                          if not current or merged[column] != current[column]]
+                if not fields:
+                    # 內容未變更時不遞增版本
+                    conn.rollback()
+                    return {'phone': current, 'created': False, 'version': read_catalog_version(conn)}
+                phone_importer.write_phone(conn, merged)
+                phone = dict(conn.execute('SELECT * FROM phones WHERE id = ?', (phone_id,)).fetchone())
+            version = phone_importer.record_phone_change(
+                conn, phone_id, 'delete' if op == 'delete' else ('create' if not current else 'update'), fields,
+                phone[phone_importer.VERSION_COLUMN] if phone else None)
+            # 落後超過串流可補送數量的用戶端只會收到 reset，不需保留更舊的記錄
+            phone_importer.prune_phone_changes(conn, PHONE_STREAM_BACKLOG_LIMIT)
+            conn.commit()
+            after = phone_cache.current_version()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    phone_cache.apply_write(before, after, phone_id, phone)
+    phone_change_feed.notify(version)
+    return {'phone': phone, 'created': current is None, 'version': version}
+
+def add_phone(phone, if_match=None):
+    """新增一支手機，ID 已存在時引發 PhoneWriteError"""
+    return write_phone_record(phone['id'], 'create', phone, if_match)
+
+def update_phone(phone_id, changes, partial=True, if_match=None):
+    """更新一支手機；partial 為 False 時以完整內容取代（不存在時新增）"""
+    return write_phone_record(phone_id, 'patch' if partial else 'replace', changes, if_match)
+
+def delete_phone(phone_id, if_match=None):
+    """刪除一支手機，不存在時引發 PhoneWriteError"""
+    return write_phone_record(phone_id, 'delete', if_match=if_match)
+
+def handle_phone_write(write):
+    """檢查寫入權限並執行寫入，將結果轉為回應"""
+    if not PHONES_WRITE_TOKEN:
+        return jsonify({'error': '未啟用手機資料寫入 API'}), 403
+    authorization = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(authorization, f'Bearer {PHONES_WRITE_TOKEN}'.encode('utf-8')):
+        return jsonify({'error': '未授權'}), 401
+    try:
+        result = write(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PhoneWriteError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        logger.error(f"寫入手機資料時發生錯誤: {e}")
+        return jsonify({'error': '寫入手機資料時發生錯誤'}), 500
+
+    phone = result['phone']
+    if phone is None:
+        response = app.response_class(status=204)
+    else:
+        body, etag = serialize_phones(phone)
+        response = app.response_class(body, status=201 if result['created'] else 200, mimetype=app.json.mimetype)
+        response.set_etag(etag)
+        if result['created']:
+            response.headers['Location'] = f'/api/phones/{phone["id"]}'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Catalog-Version'] = str(result['version'])
+    return response
+
+def _matching_id(data, phone_id):
+    """檢查內容中的 id 與路徑一致，返回原內容"""
+    if isinstance(data, dict) and data.get('id', phone_id) != phone_id:
+        raise ValueError('內容中的 id 與路徑不一致')
+    return data
+
+@app.route('/api/phones', methods=['POST'])
+def create_phone():
+    def write(data):
+        values = validate_phone_payload(data)
+        if 'id' not in values:
+            raise ValueError('缺少欄位: id')
+        return add_phone(values, request.if_match)
+    return handle_phone_write(write)
+
+@app.route('/api/phones/<phone_id>', methods=['PUT', 'PATCH'])
+def modify_phone(phone_id):
+    partial = request.method == 'PATCH'
+    return handle_phone_write(lambda data: update_phone(
+        phone_id, validate_phone_payload(_matching_id(data, phone_id), partial), partial, request.if_match))
+
+@app.route('/api/phones/<phone_id>', methods=['DELETE'])
+def remove_phone(phone_id):
+    return handle_phone_write(lambda data: delete_phone(phone_id, request.if_match))
+
+# 資料變更串流（SSE）設定
+# 背景執行緒輪詢全域資料版本的間隔秒數（本行程的寫入會立即通知）
+PHONE_STREAM_POLL_INTERVAL = float(os.environ.get('PHONE_STREAM_POLL_INTERVAL', '2'))
+# 單一連線保持的秒數，逾時後用戶端以 Last-Event-ID 重新連線（0 表示送出累積的變更後立即結束）。
+# 等待中的連線需以 gevent worker 執行（見 gunicorn.conf.py），每個連線只占用一個 greenlet；
+# 同步 worker 中每個連線會占用一個 worker 執行緒
+PHONE_STREAM_MAX_SECONDS = float(os.environ.get('PHONE_STREAM_MAX_SECONDS', '300'))
+PHONE_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('PHONE_STREAM_HEARTBEAT_SECONDS', '15'))
+PHONE_STREAM_RETRY_MS = int(os.environ.get('PHONE_STREAM_RETRY_MS', '3000'))
+# 累積的變更超過此數量時改送一筆 reset 事件，由用戶端重新讀取完整資料
+PHONE_STREAM_BACKLOG_LIMIT = int(os.environ.get('PHONE_STREAM_BACKLOG_LIMIT', '500'))
+
+class PhoneChangeFeed:
+    """保持連線的串流共用的變更通知：單一背景執行緒輪詢全域資料版本，版本變動時喚醒等待中的連線"""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._version = None
+        self._polled_at = None
+        self._thread = None
+        self.subscribers = 0
+
+    def _set_version(self, version):
+        with self._condition:
+            self._polled_at = time.monotonic()
+            if version != self._version:
+                self._version = version
+                self._condition.notify_all()
+
+    def notify(self, version):
+        """本行程寫入後通知新的全域資料版本（不會讓已知版本倒退）"""
+        with self._condition:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._condition.notify_all()
+
+    def poll(self):
+        """從資料庫讀取目前的全域資料版本，無法讀取時返回 None
+
+        資料庫被還原或取代時版本可能比先前小，以資料庫的值為準。
+        """
+        conn = get_db_connection(read_only=True)
+        if not conn:
+            return None
+        try:
+            version = read_catalog_version(conn)
+        except sqlite3.Error:
+            return None
+        finally:
+            conn.close()
+        self._set_version(version)
+        return version
+
+    def current_version(self):
+        """取得目前的全域資料版本：輪詢執行緒在一個輪詢間隔內讀取過時直接使用，否則查詢資料庫"""
+        polled_at = self._polled_at
+        if (self._thread is not None and self.subscribers and polled_at is not None
+                and time.monotonic() - polled_at <= self.poll_interval * 2):
+            return self._version
+        return self.poll()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if self.subscribers:
+                self.poll()
+
+    def subscribe(self):
+        """登記一個連線，第一次使用時啟動輪詢執行緒"""
+        with self._condition:
+            self.subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='phone-change-feed', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._condition:
+            self.subscribers -= 1
+
+    def wait(self, seen_version, timeout):
+        """等待全域資料版本與連線最後讀取的 seen_version 不同，返回目前版本，逾時返回 None"""
+        with self._condition:
+            changed = self._condition.wait_for(
+                lambda: self._version is not None and self._version != seen_version, timeout)
+            return self._version if changed else None
+
+phone_change_feed = PhoneChangeFeed(PHONE_STREAM_POLL_INTERVAL)
+
+def read_phone_changes(after_version, limit):
+    """讀取全域資料版本大於 after_version 的變更記錄，資料庫不支援時返回 None"""
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+    try:
+        rows = conn.execute('SELECT version, phone_id, op, fields, phone_version FROM phone_changes '
+                            'WHERE version > ? ORDER BY version LIMIT ?', (after_version, limit)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+def format_sse(event, event_id, data):
+    """將事件格式化為 text/event-stream 的一個區塊"""
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+def format_phone_change(change):
+    """將變更記錄轉為 SSE 事件"""
+    if change['op'] == 'reset':
+        return format_sse('reset', change['version'], {'catalog_version': change['version']})
+    return format_sse('change', change['version'], {
+        'catalog_version': change['version'],
+        'id': change['phone_id'],
+        'op': change['op'],
+        'version': change['phone_version'],
+        'fields': json.loads(change['fields']),
+    })
+
+def iter_phone_change_events(last_version, current_version):
+    """產生 last_version 之後到 current_version 的事件，返回最後送出的版本
+
+    last_version 為 None（新連線）時只送出 ready 事件；比資料庫版本新（資料庫被還原或取代）、
+    累積的變更過多或無法讀取變更記錄時送出 reset 事件，讓用戶端重新讀取完整資料。
+    """
+    if last_version is None:
+        yield format_sse('ready', current_version, {'catalog_version': current_version})
+        return current_version
+    if last_version > current_version:
+        yield format_sse('reset', current_version, {'catalog_version': current_version})
+        return current_version
+    if last_version == current_version:
+        return last_version
+    changes = read_phone_changes(last_version, PHONE_STREAM_BACKLOG_LIMIT + 1)
+    # 無法讀取變更記錄、累積過多，或所需的記錄已被清除（版本不連續）時，都無法補送完整的變更
+    if (changes is None or len(changes) > PHONE_STREAM_BACKLOG_LIMIT
+            or (changes and changes[0]['version'] != last_version + 1)):
+        yield format_sse('reset', current_version, {'catalog_version': current_version})
+        return current_version
+    for change in changes:
+        last_version = change['version']
+        yield format_phone_change(change)
+    return last_version
+
+def stream_phone_changes(last_version, current_version):
+    """產生變更事件；PHONE_STREAM_MAX_SECONDS 大於 0 時在連線保持時間內繼續等待新的變更"""
+    yield f'retry: {PHONE_STREAM_RETRY_MS}\n\n'
+    last_version = yield from iter_phone_change_events(last_version, current_version)
+    if PHONE_STREAM_MAX_SECONDS <= 0:
+        return
+
+    deadline = time.monotonic() + PHONE_STREAM_MAX_SECONDS
+    phone_change_feed.subscribe()
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            version = phone_change_feed.wait(last_version, min(remaining, PHONE_STREAM_HEARTBEAT_SECONDS))
+            if version is None:
+                # 註解行讓代理伺服器與用戶端知道連線仍然有效
+                yield ': keep-alive\n\n'
+                continue
+            last_version = yield from iter_phone_change_events(last_version, version)
+    finally:
+        phone_change_feed.unsubscribe()
+
+def parse_last_event_id(value):
+    """解析 Last-Event-ID，未提供時返回 None，格式錯誤時引發 ValueError"""
+    if value is None:
+        return None
+    version = int(value)
+    if version < 0:
+        raise ValueError(value)
+    return version
+
+@app.route('/api/phones/stream', methods=['GET'])
+def get_phone_stream():
+    try:
+        last_version = parse_last_event_id(request.headers.get('Last-Event-ID', request.args.get('last_event_id')))
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID 必須是非負整數'}), 400
+    current_version = phone_change_feed.current_version()
+    if current_version is None:
+        return jsonify({'error': '資料庫不支援變更串流'}), 503
+
+    response = app.response_class(stream_phone_changes(last_version, current_version), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 避免 nginx 等反向代理緩衝事件
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# 模型串流設定
+MODEL_STREAM_CHUNK_SIZE = int(os.environ.get('MODEL_STREAM_CHUNK_SIZE', str(256 * 1024)))
+MODEL_CACHE_MAX_AGE = int(os.environ.get('MODEL_CACHE_MAX_AGE', '0'))
+
+mimetypes.add_type('model/gltf-binary', '.glb')
+
+def iter_file_range(path, start, length, chunk_size=MODEL_STREAM_CHUNK_SIZE):
+    """以固定大小的區塊逐段讀取檔案中指定的位元組範圍"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+# 模型傳送設定：伺服器提供 wsgi.file_wrapper 時交由伺服器傳送（可使用 sendfile 零複製），
+# 否則以 mmap 快取熱門模型，MODEL_MEMORY_CACHE_BYTES 為快取對應的總位元組上限（0 表示停用）
+MODEL_SENDFILE = os.environ.get('MODEL_SENDFILE', '1') == '1'
+MODEL_MEMORY_CACHE_BYTES = int(os.environ.get('MODEL_MEMORY_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+class HotFileCache:
+    """以 mmap 對應熱門檔案內容的 LRU 快取，總對應大小不超過記憶體預算"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, stat):
+        """返回檔案內容的 mmap，檔案超過預算或無法對應時返回 None"""
+        if stat.st_size == 0 or stat.st_size > self.budget:
+            return None
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.warning(f"無法對應檔案 {path}: {e}")
+            return None
+        if len(mapped) != stat.st_size:
+            # 檔案在 stat 之後被修改，本次改用一般串流
+            return None
+
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._bytes -= previous[0][0]
+            # 移出快取的 mmap 不主動關閉，仍在傳送中的回應結束後由垃圾回收釋放
+            while self._entries and self._bytes + stat.st_size > self.budget:
+                (evicted_size, _), _ = self._entries.popitem(last=False)[1]
+                self._bytes -= evicted_size
+                self.evictions += 1
+            self._entries[path] = (version, mapped)
+            self._bytes += stat.st_size
+        return mapped
+
+    def clear(self):
+        """清除所有快取項目"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回快取統計資料"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'cached_bytes': self._bytes,
+                'budget_bytes': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+hot_file_cache = HotFileCache(MODEL_MEMORY_CACHE_BYTES)
+
+# 各傳送方式的回應數與位元組數
+_delivery_stats = {method: {'responses': 0, 'bytes': 0} for method in ('sendfile', 'mmap', 'stream')}
+_delivery_stats_lock = threading.Lock()
+
+def record_delivery(method, length):
+    """記錄一次檔案回應的傳送方式與內容長度"""
+    with _delivery_stats_lock:
+        _delivery_stats[method]['responses'] += 1
+        _delivery_stats[method]['bytes'] += length
+
+def get_file_delivery_stats():
+    """返回檔案傳送統計與熱門檔案快取統計"""
+    with _delivery_stats_lock:
+        methods = {method: dict(counters) for method, counters in _delivery_stats.items()}
+    return {
+        'methods': methods,
+        'bytes_served': sum(counters['bytes'] for counters in methods.values()),
+        'hot_cache': hot_file_cache.stats(),
+    }
+
+def iter_mapped_range(mapped, start, length, chunk_size=MODEL_STREAM_CHUNK_SIZE):
+    """以固定大小的區塊傳送 mmap 中指定的位元組範圍"""
+    end = start + length
+    for offset in range(start, end, chunk_size):
+        yield mapped[offset:min(offset + chunk_size, end)]
+
+def file_body(path, stat, start, length, hot_cache=False):
+    """選擇檔案內容的傳送方式：完整檔案優先交由 wsgi.file_wrapper，其次為 mmap 快取，最後為區塊串流"""
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if MODEL_SENDFILE and file_wrapper is not None and start == 0 and length == stat.st_size:
+        record_delivery('sendfile', length)
+        return file_wrapper(open(path, 'rb'), MODEL_STREAM_CHUNK_SIZE)
+    if hot_cache and MODEL_MEMORY_CACHE_BYTES > 0:
+        mapped = hot_file_cache.get(path, stat)
+        if mapped is not None:
+            record_delivery('mmap', length)
+            return iter_mapped_range(mapped, start, length)
+    record_delivery('stream', length)
+    return iter_file_range(path, start, length)
+
+def file_etag(stat):
+    """以檔案大小與修改時間產生強驗證 ETag"""
+    return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+def is_if_range_satisfied(etag, last_modified):
+    """檢查 If-Range 條件是否成立，不成立時應回傳完整內容"""
+    if 'If-Range' not in request.headers:
+        return True
+    if_range = request.if_range
+    if if_range.etag is not None:
+        # If-Range 只接受強比對
+        return not request.headers['If-Range'].startswith('W/') and if_range.etag == etag
+    if if_range.date is not None:
+        return int(if_range.date.timestamp()) == int(last_modified)
+    return False
+
+def send_file_ranged(path, max_age=MODEL_CACHE_MAX_AGE, mimetype=None, content_encoding=None, vary=None,
+                     hot_cache=False, immutable=False):
+    """傳送檔案，支援 Range、If-Range 與條件式請求；hot_cache 為 True 時可使用 mmap 快取，
+    immutable 為 True 時（內容雜湊網址）告知瀏覽器在快取期間內不需重新驗證"""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def base_response(body=None, status=200):
+        response = app.response_class(body, status=status, mimetype=mimetype,
+                                      direct_passthrough=True)
+        response.set_etag(etag)
+        response.headers['Last-Modified'] = http_date(stat.st_mtime)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Cache-Control'] = (f'public, max-age={max_age}, immutable' if immutable
+                                             else f'public, max-age={max_age}')
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+        if vary:
+            response.headers['Vary'] = vary
+        return response
+
+    if request.if_none_match:
+        if request.if_none_match.contains_weak(etag):
+            return base_response(status=304)
+    elif request.if_modified_since and int(stat.st_mtime) <= request.if_modified_since.timestamp():
+        return base_response(status=304)
+
+    byte_range = request.range
+    if byte_range is not None and len(byte_range.ranges) == 1 and is_if_range_satisfied(etag, stat.st_mtime):
+        span = byte_range.range_for_length(size)
+        if span is None:
+            response = base_response(status=416)
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+        start, stop = span
+        response = base_response(file_body(path, stat, start, stop - start, hot_cache), status=206)
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response.headers['Content-Length'] = str(stop - start)
+        return response
+
+    response = base_response(file_body(path, stat, 0, size, hot_cache))
+    response.headers['Content-Length'] = str(size)
+    return response
+
+# 靜態資源快取設定（秒）
+STATIC_CACHE_MAX_AGE = int(os.environ.get('STATIC_CACHE_MAX_AGE', '0'))
+# 是否在第一次請求時即時產生缺少的壓縮版本
+PRECOMPRESS_ON_DEMAND = os.environ.get('PRECOMPRESS_ON_DEMAND', '1') == '1'
+
+# 無法寫入壓縮版本的檔案（例如唯讀檔案系統），避免每次請求重試
+_precompress_failures = set()
+
+def select_precompressed_variant(path, entry=None):
+    """依 Accept-Encoding 選擇最佳的預先壓縮版本，返回 (檔案路徑, 編碼)
+
+    entry 為靜態資源清單項目時使用掃描時記錄的檔案大小，不逐次檢查檔案系統。
+    """
+    if not asset_compression.is_compressible(path) or request.range is not None:
+        # 範圍請求以原始內容的位元組位置為準，不使用壓縮版本
+        return path, None
+
+    accept_encodings = request.accept_encodings
+    source_size = entry['size'] if entry else None
+    for encoding in asset_compression.available_encodings():
+        if accept_encodings.quality(encoding) <= 0:
+            continue
+        variant_path = asset_compression.get_variant_path(path, encoding)
+        if entry is not None:
+            variant_size = entry['variants'].get(encoding)
+        else:
+            variant_size = (os.path.getsize(variant_path)
+                            if asset_compression.is_variant_fresh(path, variant_path) else None)
+        if source_size is None:
+            source_size = os.path.getsize(path)
+        if variant_size is None:
+            if (not PRECOMPRESS_ON_DEMAND or variant_path in _precompress_failures
+                    or source_size < asset_compression.MIN_COMPRESS_SIZE):
+                continue
+            try:
+                asset_compression.ensure_variant(path, encoding, asset_compression.FAST_LEVELS[encoding])
+                variant_size = os.path.getsize(variant_path)
+            except Exception as e:
+                _precompress_failures.add(variant_path)
+                logger.warning(f"無法產生壓縮版本 {variant_path}: {e}")
+                continue
+            if entry is not None:
+                entry['variants'][encoding] = variant_size
+        # 壓縮後沒有變小就直接傳送原始檔案
+        if variant_size < source_size:
+            return variant_path, encoding
+    return path, None
+
+def send_asset(path, max_age, hot_cache=False, immutable=False):
+    """傳送靜態資源，可壓縮的檔案會依 Accept-Encoding 改送預先壓縮的版本"""
+    entry = static_manifest.get_by_path(path)
+    variant_path, encoding = select_precompressed_variant(path, entry)
+    vary = 'Accept-Encoding' if asset_compression.is_compressible(path) else None
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    try:
+        return send_file_ranged(variant_path, max_age=max_age, mimetype=mimetype,
+                                content_encoding=encoding, vary=vary, hot_cache=hot_cache, immutable=immutable)
+    except FileNotFoundError:
+        # 清單記錄的壓縮版本在下次掃描前被刪除時，改送原始檔案
+        if encoding is None or entry is None:
+            raise
+        entry['variants'].pop(encoding, None)
+        return send_file_ranged(path, max_age=max_age, mimetype=mimetype,
+                                vary=vary, hot_cache=hot_cache, immutable=immutable)
+
+# 模型細節層級（LOD）設定
+MODEL_LOD_CACHE_PATH = os.environ.get('MODEL_LOD_CACHE_PATH', os.path.join(MODELS_PATH, 'lod'))
+# 未指定 lod 參數時是否依 Client Hints 自動選擇細節層級
+MODEL_LOD_CLIENT_HINTS = os.environ.get('MODEL_LOD_CLIENT_HINTS', '1') == '1'
+LOD_CLIENT_HINT_HEADERS = ('Save-Data', 'ECT', 'Device-Memory')
+
+# 啟動時預先產生所有模型的細節層級版本，請求時不需即時簡化網格（唯讀的部署環境可設為 0，改於建置時執行 glb_tools.py lod）
+MODEL_LOD_PREGENERATE = os.environ.get('MODEL_LOD_PREGENERATE', '1') == '1'
+
+# 無法產生細節層級版本的模型，避免每次請求重試
+_lod_failures = set()
+
+def select_model_lod():
+    """依 lod 查詢參數或 Client Hints 選擇模型細節層級，返回 (層級, 是否依 Client Hints 決定)"""
+    lod = request.args.get('lod')
+    if lod is not None:
+        if lod not in glb_tools.LOD_LEVELS:
+            raise ValueError(f'未知的細節層級: {lod}')
+        return lod, False
+    if not MODEL_LOD_CLIENT_HINTS:
+        return None, False
+
+    headers = request.headers
+    if headers.get('Save-Data', '').lower() == 'on':
+        return 'low', True
+    effective_type = headers.get('ECT', '').lower()
+    if effective_type in ('slow-2g', '2g'):
+        return 'low', True
+    if effective_type == '3g':
+        return 'medium', True
+    try:
+        device_memory = float(headers.get('Device-Memory', ''))
+    except ValueError:
+        device_memory = None
+    if device_memory is not None:
+        if device_memory < 2:
+            return 'low', True
+        if device_memory < 4:
+            return 'medium', True
+    return None, True
+
+def pregenerate_model_lods():
+    """預先產生模型目錄中所有模型的各細節層級版本，無法產生者記錄後改送原始模型"""
+    if not MODEL_LOD_PREGENERATE or not glb_tools.NUMPY_AVAILABLE:
+        return
+    try:
+        failures = glb_tools.ensure_lod_files(MODELS_PATH, MODEL_LOD_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"無法預先產生模型細節層級版本: {e}")
+        return
+    for (path, level), error in failures.items():
+        _lod_failures.add((os.path.abspath(path), level))
+        logger.warning(f"無法產生模型 {path} 的 {level} 細節層級版本: {error}")
+
+def get_model_lod_path(path, level):
+    """取得模型指定細節層級版本的路徑，無法產生時返回原始模型路徑"""
+    if not level or not path.lower().endswith('.glb') or not glb_tools.NUMPY_AVAILABLE:
+        return path
+    if (path, level) in _lod_failures:
+        return path
+    try:
+        # 各版本已於啟動時預先產生；只有啟動後新增或更新的模型才在請求中產生，
+        # ensure_lod_file 以每個路徑各自的鎖確保並行的請求只產生一次
+        return glb_tools.ensure_lod_file(path, level, MODEL_LOD_CACHE_PATH)
+    except Exception as e:
+        _lod_failures.add((path, level))
+        logger.warning(f"無法產生模型 {path} 的 {level} 細節層級版本: {e}")
+        return path
+
+# /metrics 存取權杖，設定後需以 Authorization: Bearer <權杖> 存取
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+REQUEST_DURATION = metrics_registry.histogram(
+    'http_request_duration_seconds', '各端點的請求處理時間', ('endpoint',))
+REQUEST_COUNT = metrics_registry.counter(
+    'http_requests_total', '各端點依方法與狀態碼的請求數', ('endpoint', 'method', 'status'))
+RESPONSE_BYTES = metrics_registry.counter(
+    'http_response_bytes_total', '各端點回應內容的位元組數（依 Content-Length）', ('endpoint',))
+REQUEST_DB_SECONDS = metrics_registry.counter(
+    'http_request_db_seconds_total', '各端點請求中使用資料庫連線的累計時間', ('endpoint',))
+
+def _cache_samples(field):
+    """返回各快取統計中指定欄位的量測值"""
+    phone_stats = phone_cache.stats()
+    hot_stats = hot_file_cache.stats()
+    return [(('phones',), phone_stats[field]), (('hot_files',), hot_stats[field])]
+
+def _pool_samples():
+    for stats in get_db_pool_stats():
+        mode = 'ro' if stats['read_only'] else 'rw'
+        yield (mode, 'in_use'), stats['in_use']
+        yield (mode, 'idle'), stats['idle']
+
+metrics_registry.callback('cache_hits_total', '快取命中次數', 'counter', ('cache',),
+                          lambda: _cache_samples('hits'))
+metrics_registry.callback('cache_misses_total', '快取未命中次數', 'counter', ('cache',),
+                          lambda: _cache_samples('misses'))
+metrics_registry.callback('cache_hit_ratio', '快取命中率', 'gauge', ('cache',),
+                          lambda: _cache_samples('hit_ratio'))
+metrics_registry.callback('file_delivery_bytes_total', '檔案回應依傳送方式的位元組數', 'counter', ('method',),
+                          lambda: [((method,), counters['bytes'])
+                                   for method, counters in get_file_delivery_stats()['methods'].items()])
+metrics_registry.callback('db_pool_connections', '連線池中的連線數', 'gauge', ('mode', 'state'), _pool_samples)
+metrics_registry.callback('db_pool_timeouts_total', '等待資料庫連線逾時次數', 'counter', ('mode',),
+                          lambda: [(('ro' if stats['read_only'] else 'rw',), stats['timeouts'])
+                                   for stats in get_db_pool_stats()])
+metrics_registry.callback('phone_stream_subscribers', '目前的資料變更串流連線數', 'gauge', (),
+                          lambda: [((), phone_change_feed.subscribers)])
+
+@app.before_request
+def start_request_timer():
+    request.environ['app.request_started'] = time.perf_counter()
+    _request_db_time.seconds = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get('app.request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - started, (endpoint,))
+        REQUEST_COUNT.inc((endpoint, request.method, str(response.status_code)))
+        if response.content_length:
+            RESPONSE_BYTES.inc((endpoint,), response.content_length)
+        db_seconds = getattr(_request_db_time, 'seconds', 0.0)
+        if db_seconds:
+            REQUEST_DB_SECONDS.inc((endpoint,), db_seconds)
+    return response
+
+@app.after_request
+def write_access_log(response):
+    if not LOG_ACCESS or (LOG_ACCESS_SAMPLE_RATE < 1.0 and random.random() >= LOG_ACCESS_SAMPLE_RATE):
+        return response
+    started = request.environ.get('app.request_started')
+    duration_ms = round((time.perf_counter() - started) * 1000, 3) if started is not None else None
+    # 欄位放在 extra 中，由 app_logging.BackgroundQueueHandler 原樣放入佇列，格式化在背景執行緒進行
+    access_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+        'method': request.method,
+        'path': request.path,
+        'query': request.query_string.decode('latin-1'),
+        'status': response.status_code,
+        'duration_ms': duration_ms,
+        'bytes': response.content_length,
+        'remote_addr': request.remote_addr,
+        'user_agent': request.user_agent.string,
+    })
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    authorization = request.headers.get('Authorization', '').encode('utf-8')
+    if METRICS_TOKEN and not hmac.compare_digest(authorization, f'Bearer {METRICS_TOKEN}'.encode('utf-8')):
+        return jsonify({'error': '未授權'}), 401
+    return app.response_class(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/models/<path:filename>', methods=['GET'])
 def get_model(filename):
     try:
-        safe_path = safe_path_join(MODELS_PATH, filename)
-        if safe_path and os.path.exists(safe_path):
-            directory, file = os.path.split(safe_path)
-            return send_from_directory(directory, file)
+        safe_path, immutable = resolve_asset(MODELS_PATH, filename)
+        if safe_path:
+            try:
+                lod, uses_client_hints = select_model_lod()
+            except ValueError:
+                return jsonify({'error': '不支援的細節層級', 'levels': list(glb_tools.LOD_LEVELS)}), 400
+            max_age = FINGERPRINT_CACHE_MAX_AGE if immutable else MODEL_CACHE_MAX_AGE
+            response = send_asset(get_model_lod_path(safe_path, lod), max_age, hot_cache=True, immutable=immutable)
+            if uses_client_hints:
+                response.vary.update(LOD_CLIENT_HINT_HEADERS)
+            return response
         else:
-            logger.warning(f"嘗試存取不存在的模型檔案: {filename}")
+            logger.warning("嘗試存取不存在的模型檔案: %s", filename)
             return jsonify({'error': '找不到模型檔案'}), 404
+    except FileNotFoundError:
+        # 檔案在清單建立後被移除
+        refresh_static_manifest()
+        return jsonify({'error': '找不到模型檔案'}), 404
     except Exception as e:
         logger.error(f"提供模型時發生錯誤: {e}")
         return jsonify({'error': '讀取模型檔案時發生錯誤'}), 500
 
+# 首頁以 Link 標頭預先載入的資源（支援的 CDN 可轉為 103 Early Hints）
+INDEX_PRELOAD_ASSETS = (('style.css', 'rel=preload; as=style'), ('main.js', 'rel=modulepreload'))
+
+def index_preload_links(phones):
+    """產生首頁的 Link 預先載入標頭，包含第一支手機的模型"""
+    links = [f'<{asset_url(path)}>; {params}' for path, params in INDEX_PRELOAD_ASSETS]
+    model_path = fingerprint_model_path(phones[0]).get('model_path') if phones else None
+    if model_path:
+        # GLTFLoader 以 fetch 讀取模型，預先載入需使用相同的 CORS 模式才能被重複使用
+        links.append(f'</{model_path.lstrip("/")}>; rel=preload; as=fetch; crossorigin')
+    return ', '.join(links)
+
+def render_index_page(phones):
+    """以手機資料渲染內嵌資料的首頁，返回 (HTML 位元組, ETag, Link 標頭)"""
+    catalog_body, _ = phone_cache.get_serialized(('phones', static_manifest.version), phones, serialize_phones)
+    # 跳脫 HTML 特殊字元，避免資料內容結束 <script> 區塊
+    catalog_json = (catalog_body.decode('utf-8').strip()
+                    .replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+    html = render_template('index.html', catalog_json=Markup(catalog_json)).encode('utf-8')
+    return html, hashlib.sha256(html).hexdigest()[:32], index_preload_links(phones)
+
 @app.route('/')
 def index():
     try:
-        return render_template('index.html')
+        # 渲染結果與手機資料快取綁定，資料版本未變更時直接使用
+        phones = load_phones_data()
+        html, etag, links = phone_cache.get_serialized(('index_page', static_manifest.version), phones,
+                                                       render_index_page)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(html, mimetype='text/html')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Link'] = links
+        if MODEL_LOD_CLIENT_HINTS:
+            # 要求瀏覽器在後續請求中提供選擇模型細節層級所需的 Client Hints
+            response.headers['Accept-CH'] = ', '.join(LOD_CLIENT_HINT_HEADERS)
+        return response
     except Exception as e:
         logger.error(f"渲染首頁時發生錯誤: {e}")
         return "無法載入頁面，請稍後再試", 500
@@ -247,16 +2340,21 @@ def index():
 def get_resource(filename):
     try:
         # 防止存取敏感檔案
-        if filename in ['app.log', 'index.py'] or filename.startswith('data/'):
+        if filename in ['app.log', 'index.py'] or filename.endswith('.py') or filename.startswith('data/'):
             return jsonify({'error': '無法存取此資源'}), 403
             
-        safe_path = safe_path_join(os.path.dirname(__file__), filename)
-        if safe_path and os.path.exists(safe_path):
-            directory, file = os.path.split(safe_path)
-            return send_from_directory(directory, file)
+        safe_path, immutable = resolve_asset(PROJECT_ROOT, filename)
+        if safe_path:
+            if immutable:
+                return send_asset(safe_path, FINGERPRINT_CACHE_MAX_AGE, immutable=True)
+            return send_asset(safe_path, STATIC_CACHE_MAX_AGE)
         else:
-            logger.warning(f"嘗試存取不存在的資源: {filename}")
+            logger.warning("嘗試存取不存在的資源: %s", filename)
             return jsonify({'error': '找不到資源'}), 404
+    except FileNotFoundError:
+        # 檔案在清單建立後被移除
+        refresh_static_manifest()
+        return jsonify({'error': '找不到資源'}), 404
     except Exception as e:
         logger.error(f"提供資源時發生錯誤: {e}")
         return jsonify({'error': '讀取資源時發生錯誤'}), 500
@@ -270,6 +2368,23 @@ def internal_server_error(error):
     logger.error(f"內部伺服器錯誤: {error}")
     return jsonify({'error': '內部伺服器錯誤'}), 500
 
+# 請求剖析設定：PROFILE_ENABLED 啟用後，帶有有效 X-Profile-Token 標頭（以 PROFILE_SECRET 簽章）
+# 或依 PROFILE_SAMPLE_RATE 取樣且路徑符合 PROFILE_PATHS 前綴的請求會以 cProfile 剖析
+PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', '0') == '1'
+PROFILE_SECRET = os.environ.get('PROFILE_SECRET', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_PATHS = tuple(prefix for prefix in os.environ.get('PROFILE_PATHS', '/api/').split(',') if prefix)
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(DATA_PATH, 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', str(request_profiler.DEFAULT_MAX_FILES)))
+
+if PROFILE_ENABLED:
+    app.wsgi_app = request_profiler.ProfilingMiddleware(
+        app.wsgi_app,
+        profile_dir=PROFILE_DIR,
+        should_profile=request_profiler.ProfileTrigger(PROFILE_SECRET, PROFILE_SAMPLE_RATE, PROFILE_PATHS),
+        max_files=PROFILE_MAX_FILES,
+    )
+
 # 初始化應用程式
 try:
     # 確保資料目錄存在
@@ -278,6 +2393,15 @@ try:
     
     # 初始化資料庫
     init_database()
+
+    # 建立模型中繼資料索引，並預先產生各細節層級版本
+    model_index.refresh(force=True)
+    pregenerate_model_lods()
+
+    # 建立靜態資源清單，並在收到 SIGHUP 時重新掃描
+    static_manifest.refresh()
+    if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, refresh_static_manifest)
     
     # 為向後相容性保留 JSON 檔案
     save_default_data()
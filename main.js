@@ -270,18 +270,37 @@ class PhoneViewer {
     }
     
     /**
-     * 從 API 讀取手機資訊
+     * 讀取首頁內嵌的手機資訊，不存在或無法解析時返回 null
+     * @returns {Array|null} 手機資訊陣列
+     */
+    readInlinePhoneData() {
+        const element = document.getElementById('phone-catalog');
+        if (!element || !element.textContent.trim()) return null;
+        
+        try {
+            const data = JSON.parse(element.textContent);
+            return Array.isArray(data) && data.length > 0 ? data : null;
+        } catch (error) {
+            console.warn('無法解析內嵌的手機資料:', error);
+            return null;
+        }
+    }
+    
+    /**
+     * 讀取手機資訊，優先使用首頁內嵌的資料，沒有時才呼叫 API
      */
     async fetchPhoneData() {
         try {
             this.showLoader('讀取手機資料中...');
             
-            const response = await fetch('/api/phones');
-            if (!response.ok) {
-                throw new Error(`HTTP 錯誤！狀態: ${response.status}`);
+            let data = this.readInlinePhoneData();
+            if (!data) {
+                const response = await fetch('/api/phones');
+                if (!response.ok) {
+                    throw new Error(`HTTP 錯誤！狀態: ${response.status}`);
+                }
+                data = await response.json();
             }
-            
-            const data = await response.json();
             console.log('手機資料:', data);
             
             // 建立手機導航選單
@@ -0,0 +1,498 @@
+"""
+手機資料批次匯入工具
+以固定記憶體串流解析 JSON / JSONL / CSV，並以批次 executemany 寫入 SQLite 資料庫
+"""
+import os
+import re
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, 'data', 'phones.db')
+
+# phones 表格欄位（順序與 INSERT 的參數一致）
+PHONE_COLUMNS = (
+    'id', 'name', 'screen', 'processor', 'camera',
+    'battery', 'storage', 'model_path', 'special_features',
+)
+
+CREATE_PHONES_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS phones (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    screen TEXT NOT NULL,
+    processor TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    battery TEXT NOT NULL,
+    storage TEXT NOT NULL,
+    model_path TEXT NOT NULL,
+    special_features TEXT NOT NULL
+)
+'''
+
+# 全文檢索欄位，以 trigram 斷詞讓中英文混合內容都能比對任意三個字元以上的片段
+SEARCH_COLUMNS = ('name', 'processor', 'camera', 'screen', 'special_features')
+
+CREATE_SEARCH_TABLE_SQL = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS phones_fts USING fts5(
+    {', '.join(SEARCH_COLUMNS)},
+    content='phones', content_rowid='rowid', tokenize='trigram'
+)
+'''
+
+_search_columns = ', '.join(SEARCH_COLUMNS)
+_new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+_old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+
+# 讓 phones_fts 與 phones 保持同步的觸發程序
+SEARCH_TRIGGERS = (
+    ('phones_fts_insert', f'''
+CREATE TRIGGER IF NOT EXISTS phones_fts_insert AFTER INSERT ON phones BEGIN
+    INSERT INTO phones_fts (rowid, {_search_columns}) VALUES (new.rowid, {_new_values});
+END'''),
+    ('phones_fts_delete', f'''
+CREATE TRIGGER IF NOT EXISTS phones_fts_delete AFTER DELETE ON phones BEGIN
+    INSERT INTO phones_fts (phones_fts, rowid, {_search_columns}) VALUES ('delete', old.rowid, {_old_values});
+END'''),
+    ('phones_fts_update', f'''
+CREATE TRIGGER IF NOT EXISTS phones_fts_update AFTER UPDATE OF {_search_columns} ON phones BEGIN
+    INSERT INTO phones_fts (phones_fts, rowid, {_search_columns}) VALUES ('delete', old.rowid, {_old_values});
+    INSERT INTO phones_fts (rowid, {_search_columns}) VALUES (new.rowid, {_new_values});
+END'''),
+)
+
+REBUILD_SEARCH_SQL = "INSERT INTO phones_fts (phones_fts) VALUES ('rebuild')"
+
+
+def search_schema_script():
+    """返回重新建立全文檢索表格、同步觸發程序並重建索引內容的 SQL 腳本"""
+    statements = ['DROP TABLE IF EXISTS phones_fts', CREATE_SEARCH_TABLE_SQL]
+    statements.extend(sql for _, sql in SEARCH_TRIGGERS)
+    statements.append(REBUILD_SEARCH_SQL)
+    return ';\n'.join(statement.strip() for statement in statements) + ';\n'
+
+
+def create_search_index(conn):
+    """建立全文檢索表格與同步觸發程序，並由 phones 重建索引內容"""
+    conn.execute(CREATE_SEARCH_TABLE_SQL)
+    for _, trigger_sql in SEARCH_TRIGGERS:
+        conn.execute(trigger_sql)
+    conn.execute(REBUILD_SEARCH_SQL)
+
+
+def has_search_index(conn):
+    """檢查資料庫是否已有全文檢索表格"""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'phones_fts'").fetchone()
+    return row is not None
+
+
+# 匯入時由文字規格解析出的數值欄位，供有索引的範圍篩選使用
+SPEC_COLUMNS = (
+    ('battery_mah', 'INTEGER'),
+    ('screen_inches', 'REAL'),
+    ('main_camera_mp', 'REAL'),
+)
+SPEC_COLUMN_NAMES = tuple(name for name, _ in SPEC_COLUMNS)
+
+# 每次以 UPSERT 更新既有資料時遞增的資料版本欄位
+VERSION_COLUMN = 'version'
+
+# 每支手機可選的儲存容量（GB），一個容量一列以便以索引查詢
+CREATE_STORAGE_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS phone_storage (
+    storage_gb INTEGER NOT NULL,
+    phone_id TEXT NOT NULL,
+    PRIMARY KEY (storage_gb, phone_id)
+) WITHOUT ROWID
+'''
+
+STORAGE_DELETE_TRIGGER_SQL = '''
+CREATE TRIGGER IF NOT EXISTS phone_storage_delete AFTER DELETE ON phones BEGIN
+    DELETE FROM phone_storage WHERE phone_id = old.id;
+END'''
+
+# 資料變更記錄，version 為全域資料版本；op 為 reset 的記錄表示全部資料被取代
+CREATE_PHONE_CHANGES_SQL = '''
+CREATE TABLE IF NOT EXISTS phone_changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_id TEXT,
+    op TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    changed_at REAL NOT NULL,
+    phone_version INTEGER
+)
+'''
+
+_BATTERY_PATTERN = re.compile(r'(\d[\d,]*)\s*mAh', re.IGNORECASE)
+_SCREEN_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(?:inch|in\b|吋|英吋|")', re.IGNORECASE)
+_CAMERA_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*MP', re.IGNORECASE)
+_STORAGE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(GB|TB)', re.IGNORECASE)
+
+
+def parse_specs(phone):
+    """由文字規格解析電池容量、主螢幕尺寸、主鏡頭畫素與儲存容量選項，無法解析的值為 None"""
+    battery = _BATTERY_PATTERN.search(str(phone.get('battery') or ''))
+    screen = _SCREEN_PATTERN.search(str(phone.get('screen') or ''))
+
+    # 主鏡頭優先取標示「主」或 main 的鏡頭，否則取第一個
+    main_camera_mp = None
+    for segment in str(phone.get('camera') or '').split('+'):
+        camera = _CAMERA_PATTERN.search(segment)
+        if not camera:
+            continue
+        if main_camera_mp is None:
+            main_camera_mp = float(camera.group(1))
+        if '主' in segment or 'main' in segment.lower():
+            main_camera_mp = float(camera.group(1))
+            break
+
+    storage_gb = sorted({
+        int(float(amount) * (1024 if unit.upper() == 'TB' else 1))
+        for amount, unit in _STORAGE_PATTERN.findall(str(phone.get('storage') or ''))
+    })
+    return {
+        'battery_mah': int(battery.group(1).replace(',', '')) if battery else None,
+        'screen_inches': float(screen.group(1)) if screen else None,
+        'main_camera_mp': main_camera_mp,
+        'storage_gb': storage_gb,
+    }
+
+
+def ensure_spec_schema(conn):
+    """為 phones 表格補上數值規格與資料版本欄位，並建立儲存容量表格與刪除同步觸發程序"""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(phones)')}
+    for name, column_type in SPEC_COLUMNS:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE phones ADD COLUMN {name} {column_type}')
+    if VERSION_COLUMN not in existing:
+        conn.execute(f'ALTER TABLE phones ADD COLUMN {VERSION_COLUMN} INTEGER NOT NULL DEFAULT 1')
+    conn.execute(CREATE_STORAGE_TABLE_SQL)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_phone_storage_phone ON phone_storage(phone_id)')
+    conn.execute(STORAGE_DELETE_TRIGGER_SQL)
+
+
+def ensure_change_log(conn):
+    """建立資料變更記錄表格，舊版本建立的表格補上欄位"""
+    conn.execute(CREATE_PHONE_CHANGES_SQL)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(phone_changes)')}
+    if 'phone_version' not in columns:
+        conn.execute('ALTER TABLE phone_changes ADD COLUMN phone_version INTEGER')
+
+
+def record_phone_change(conn, phone_id, op, fields, phone_version=None):
+    """在呼叫端的交易中記錄一筆資料變更，返回新的全域資料版本
+
+    reset 記錄表示全部資料被取代，之前的記錄不再需要補送，一併刪除。
+    """
+    cursor = conn.execute(
+        'INSERT INTO phone_changes (phone_id, op, fields, changed_at, phone_version) VALUES (?, ?, ?, ?, ?)',
+        (phone_id, op, json.dumps(list(fields)), time.time(), phone_version))
+    if op == 'reset':
+        conn.execute('DELETE FROM phone_changes WHERE version < ?', (cursor.lastrowid,))
+    return cursor.lastrowid
+
+
+def prune_phone_changes(conn, keep):
+    """在呼叫端的交易中只保留全域資料版本最新的 keep 筆變更記錄"""
+    conn.execute('DELETE FROM phone_changes WHERE version <= (SELECT MAX(version) FROM phone_changes) - ?', (keep,))
+
+
+def _spec_values(specs):
+    return tuple(specs[name] for name in SPEC_COLUMN_NAMES)
+
+
+def _replace_storage(conn, storage_rows, phone_ids):
+    """以新的儲存容量選項取代指定手機原有的選項"""
+    conn.executemany('DELETE FROM phone_storage WHERE phone_id = ?', [(phone_id,) for phone_id in phone_ids])
+    conn.executemany('INSERT OR IGNORE INTO phone_storage (storage_gb, phone_id) VALUES (?, ?)', storage_rows)
+
+
+# 匯入前移除、匯入後重建的次要索引，避免逐筆維護索引
+PHONE_INDEXES = (
+    ('idx_phones_name', 'CREATE INDEX IF NOT EXISTS idx_phones_name ON phones(name)'),
+    ('idx_phones_battery', 'CREATE INDEX IF NOT EXISTS idx_phones_battery ON phones(battery_mah)'),
+    ('idx_phones_screen', 'CREATE INDEX IF NOT EXISTS idx_phones_screen ON phones(screen_inches)'),
+    ('idx_phones_camera', 'CREATE INDEX IF NOT EXISTS idx_phones_camera ON phones(main_camera_mp)'),
+)
+
+DEFAULT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 64 * 1024
+
+# 錯誤報告中最多保留的訊息數
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportFormatError(ValueError):
+    """匯入檔案格式錯誤"""
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """逐一解析 JSON 陣列中的物件，記憶體用量只與單一物件大小相關"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                break
+            fill()
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != '[':
+                raise ImportFormatError('JSON 檔案必須是物件陣列')
+            started = True
+            position += 1
+            continue
+        if char == ']':
+            return
+        if char == ',':
+            position += 1
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ImportFormatError('JSON 內容不完整或格式錯誤')
+            # 物件跨越讀取區塊的邊界，讀入更多內容後重試
+            fill()
+            continue
+        position = end
+        yield value
+
+    if started:
+        raise ImportFormatError('JSON 陣列缺少結尾的 ]')
+    return
+
+
+def iter_jsonl(f):
+    """逐行解析 JSON Lines"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ImportFormatError(f'第 {line_number} 行不是有效的 JSON: {e}')
+
+
+def iter_csv(f):
+    """逐列解析具標題列的 CSV"""
+    yield from csv.DictReader(f)
+
+
+def detect_format(path):
+    """依副檔名判斷匯入格式"""
+    extension = os.path.splitext(path)[1].lower()
+    formats = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+    if extension not in formats:
+        raise ImportFormatError(f'無法由副檔名判斷格式: {path}')
+    return formats[extension]
+
+
+def iter_records(path, fmt=None):
+    """依格式串流讀取檔案中的手機資料"""
+    fmt = fmt or detect_format(path)
+    readers = {'json': iter_json_array, 'jsonl': iter_jsonl, 'csv': iter_csv}
+    if fmt not in readers:
+        raise ImportFormatError(f'不支援的格式: {fmt}')
+    newline = '' if fmt == 'csv' else None
+    with open(path, 'r', encoding='utf-8-sig', newline=newline) as f:
+        yield from readers[fmt](f)
+
+
+def phone_to_row(phone):
+    """將手機資料轉為 INSERT 參數與儲存容量選項，缺少必要欄位時引發 ValueError"""
+    if not isinstance(phone, dict):
+        raise ValueError('資料必須是物件')
+    missing = [column for column in PHONE_COLUMNS if phone.get(column) in (None, '')]
+    if missing:
+        raise ValueError(f'缺少欄位: {", ".join(missing)}')
+    specs = parse_specs(phone)
+    row = tuple(str(phone[column]) for column in PHONE_COLUMNS) + _spec_values(specs)
+    return row, specs['storage_gb']
+
+
+def _insert_sql():
+    insert_columns = PHONE_COLUMNS + SPEC_COLUMN_NAMES
+    columns = ', '.join(insert_columns)
+    placeholders = ', '.join('?' for _ in insert_columns)
+    updates = ', '.join(f'{column} = excluded.{column}' for column in insert_columns if column != 'id')
+    updates += f', {VERSION_COLUMN} = phones.{VERSION_COLUMN} + 1'
+    # 以 UPSERT 更新既有資料而非 REPLACE，保留 rowid 並觸發 UPDATE 觸發程序以同步全文檢索索引
+    return f'INSERT INTO phones ({columns}) VALUES ({placeholders}) ON CONFLICT(id) DO UPDATE SET {updates}'
+
+
+def _write_batch(conn, insert_sql, batch):
+    """寫入一個批次的手機資料與其儲存容量選項"""
+    conn.executemany(insert_sql, [row for row, _ in batch])
+    _replace_storage(conn, [(storage_gb, row[0]) for row, options in batch for storage_gb in options],
+                     [row[0] for row, _ in batch])
+
+
+def write_phone(conn, phone):
+    """在呼叫端的交易中新增或更新單筆手機資料與其儲存容量選項（不提交），資料不完整時引發 ValueError"""
+    _write_batch(conn, _insert_sql(), [phone_to_row(phone)])
+
+
+def refresh_specs(conn, batch_size=DEFAULT_BATCH_SIZE):
+    """重新解析 phones 中所有資料的數值規格，供以 SQL 腳本寫入的資料使用（需在交易中呼叫）"""
+    ensure_spec_schema(conn)
+    conn.execute('DELETE FROM phone_storage')
+    update_sql = f"UPDATE phones SET {', '.join(f'{name} = ?' for name in SPEC_COLUMN_NAMES)} WHERE id = ?"
+    cursor = conn.execute('SELECT id, screen, camera, battery, storage FROM phones')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        updates, storage_rows = [], []
+        for phone_id, screen, camera, battery, storage in rows:
+            specs = parse_specs({'screen': screen, 'camera': camera, 'battery': battery, 'storage': storage})
+            updates.append(_spec_values(specs) + (phone_id,))
+            storage_rows.extend((storage_gb, phone_id) for storage_gb in specs['storage_gb'])
+        conn.executemany(update_sql, updates)
+        conn.executemany('INSERT OR IGNORE INTO phone_storage (storage_gb, phone_id) VALUES (?, ?)', storage_rows)
+    for _, index_sql in PHONE_INDEXES:
+        conn.execute(index_sql)
+
+
+def import_phones(conn, records, batch_size=DEFAULT_BATCH_SIZE, replace=False, atomic=True, progress=None):
+    """以批次 executemany 將手機資料寫入資料庫，返回匯入統計
+
+    atomic 為 True 時整個匯入在單一交易中完成，其他連線不會看到匯入到一半的資料；
+    否則每個批次各自提交。progress(已匯入筆數, 經過秒數) 會在每個批次後呼叫。
+    完成時在 phone_changes 寫入一筆 reset 記錄，統計中的 catalog_version 為其全域資料版本。
+    """
+    started_at = time.perf_counter()
+    insert_sql = _insert_sql()
+    report = {'rows': 0, 'skipped': 0, 'batches': 0, 'errors': []}
+
+    conn.execute(CREATE_PHONES_TABLE_SQL)
+    conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ensure_spec_schema(conn)
+        for index_name, _ in PHONE_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {index_name}')
+        # 取代全部資料或尚無全文檢索表格時，載入期間停用同步觸發程序，完成後一次重建索引
+        rebuild_search = replace or not has_search_index(conn)
+        if rebuild_search:
+            for trigger_name, _ in SEARCH_TRIGGERS:
+                conn.execute(f'DROP TRIGGER IF EXISTS {trigger_name}')
+        if replace:
+            conn.execute('DELETE FROM phone_storage')
+            conn.execute('DELETE FROM phones')
+
+        batch = []
+        for record_number, phone in enumerate(records, 1):
+            try:
+                batch.append(phone_to_row(phone))
+            except ValueError as e:
+                report['skipped'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append(f'第 {record_number} 筆: {e}')
+                continue
+            if len(batch) >= batch_size:
+                _write_batch(conn, insert_sql, batch)
+                report['rows'] += len(batch)
+                report['batches'] += 1
+                batch = []
+                if not atomic:
+                    conn.commit()
+                    conn.execute('BEGIN IMMEDIATE')
+                if progress:
+                    progress(report['rows'], time.perf_counter() - started_at)
+        if batch:
+            _write_batch(conn, insert_sql, batch)
+            report['rows'] += len(batch)
+            report['batches'] += 1
+
+        # 資料載入完成後才建立次要索引
+        for _, index_sql in PHONE_INDEXES:
+            conn.execute(index_sql)
+        if rebuild_search:
+            create_search_index(conn)
+        # 匯入可能改變任意筆資料，以一筆 reset 變更記錄通知用戶端重新讀取
+        ensure_change_log(conn)
+        report['catalog_version'] = record_phone_change(conn, None, 'reset', ())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started_at
+    report['seconds'] = elapsed
+    report['rows_per_second'] = report['rows'] / elapsed if elapsed > 0 else float(report['rows'])
+    if progress:
+        progress(report['rows'], elapsed)
+    return report
+
+
+def connect_for_import(db_path):
+    """建立適合大量寫入的資料庫連線"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')
+    return conn
+
+
+def main(argv=None):
+    """命令列進入點"""
+    parser = argparse.ArgumentParser(description='以串流方式批次匯入手機資料（JSON / JSONL / CSV）')
+    parser.add_argument('input', help='匯入檔案')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='資料庫路徑，預設為 data/phones.db')
+    parser.add_argument('--format', choices=['json', 'jsonl', 'csv'], help='檔案格式，預設依副檔名判斷')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批次寫入的筆數')
+    parser.add_argument('--replace', action='store_true', help='匯入前清除現有資料')
+    parser.add_argument('--no-atomic', action='store_true', help='每個批次各自提交，不在單一交易中完成')
+    args = parser.parse_args(argv)
+
+    def progress(rows, seconds):
+        rate = rows / seconds if seconds > 0 else 0
+        print(f'\r已匯入 {rows:,} 筆（{rate:,.0f} 筆/秒）', end='', file=sys.stderr, flush=True)
+
+    conn = connect_for_import(args.db)
+    try:
+        report = import_phones(conn, iter_records(args.input, args.format), batch_size=args.batch_size,
+                               replace=args.replace, atomic=not args.no_atomic, progress=progress)
+    except (OSError, ImportFormatError, sqlite3.Error) as e:
+        print(f'\n匯入失敗: {e}', file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    print(file=sys.stderr)
+    print(f'匯入 {report["rows"]:,} 筆，略過 {report["skipped"]:,} 筆，'
+          f'耗時 {report["seconds"]:.2f} 秒（{report["rows_per_second"]:,.0f} 筆/秒）')
+    for error in report['errors']:
+        print(f'  {error}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+請求效能剖析工具
+以 cProfile 剖析經簽章標頭指定或依取樣率選中的請求，將結果寫入 .pstats 檔案並提供彙整命令列工具
+"""
+import os
+import re
+import sys
+import hmac
+import glob
+import time
+import random
+import pstats
+import hashlib
+import cProfile
+import itertools
+import argparse
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROFILE_DIR = os.path.join(PROJECT_ROOT, 'data', 'profiles')
+DEFAULT_MAX_FILES = 50
+
+# 要求剖析的請求標頭（WSGI environ 鍵名）與回應中標示剖析檔案的標頭
+TOKEN_ENVIRON_KEY = 'HTTP_X_PROFILE_TOKEN'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_EXTENSION = '.pstats'
+# 串流回應只剖析到送出標頭為止，之後的內容直接交給伺服器，不在中介層緩衝
+STREAMING_CONTENT_TYPES = ('text/event-stream',)
+
+
+def sign_token(secret, path, expires):
+    """產生指定路徑在 expires（Unix 時間）之前有效的剖析權杖"""
+    message = f'{int(expires)}:{path}'.encode('utf-8')
+    signature = hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+    return f'{int(expires)}.{signature}'
+
+
+def verify_token(secret, path, token, now=None):
+    """驗證剖析權杖的簽章與有效期限"""
+    expires, _, signature = token.partition('.')
+    if not secret or not expires.isdigit() or not signature:
+        return False
+    if int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(sign_token(secret, path, int(expires)), token)
+
+
+class ProfileTrigger:
+    """決定請求是否需要剖析：帶有有效簽章標頭的請求一律剖析，符合路徑前綴的請求依取樣率剖析"""
+
+    def __init__(self, secret='', sample_rate=0.0, path_prefixes=('/api/',)):
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.path_prefixes = tuple(path_prefixes)
+
+    def __call__(self, environ):
+        path = environ.get('PATH_INFO', '')
+        token = environ.get(TOKEN_ENVIRON_KEY)
+        if token and self.secret and verify_token(self.secret, path, token):
+            return True
+        return (self.sample_rate > 0 and path.startswith(self.path_prefixes)
+                and random.random() < self.sample_rate)
+
+
+def _slug(path):
+    return re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')[:60] or 'root'
+
+
+class ProfilingMiddleware:
+    """以 cProfile 剖析選中請求的 WSGI 中介層，剖析檔案數超過上限時刪除最舊的檔案"""
+
+    def __init__(self, app, profile_dir=DEFAULT_PROFILE_DIR, should_profile=None, max_files=DEFAULT_MAX_FILES):
+        self.app = app
+        self.profile_dir = profile_dir
+        self.should_profile = should_profile or ProfileTrigger()
+        self.max_files = max_files
+        self._retention_lock = threading.Lock()
+        # 同一時間只能有一個 cProfile 剖析器啟用（Python 3.12 起重複啟用會引發 ValueError）
+        self._profile_lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def __call__(self, environ, start_response):
+        if not self.should_profile(environ):
+            return self.app(environ, start_response)
+        # 其他請求正在剖析時不等待，直接以未剖析的方式處理
+        if not self._profile_lock.acquire(blocking=False):
+            return self.app(environ, start_response)
+        try:
+            return self._profile(environ, start_response)
+        finally:
+            self._profile_lock.release()
+
+    def _profile(self, environ, start_response):
+        profile_id = (f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}"
+                      f"-{environ.get('REQUEST_METHOD', 'GET')}-{_slug(environ.get('PATH_INFO', ''))}")
+        streaming = []
+
+        def profiled_start_response(status, headers, exc_info=None):
+            content_type = next((value for name, value in headers if name.lower() == 'content-type'), '')
+            if content_type.split(';')[0].strip().lower() in STREAMING_CONTENT_TYPES:
+                streaming.append(True)
+            return start_response(status, list(headers) + [(PROFILE_ID_HEADER, profile_id)], exc_info)
+
+        # 一般回應在剖析期間完整讀取內容，讓產生內容的時間也納入剖析結果
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            app_iter = self.app(environ, profiled_start_response)
+            if streaming:
+                return app_iter
+            try:
+                body = list(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        finally:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._save(profiler, f'{profile_id}-{elapsed_ms:.0f}ms')
+        return body
+
+    def _save(self, profiler, name):
+        """寫入剖析檔案並套用保留上限"""
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, name + PROFILE_EXTENSION))
+            with self._retention_lock:
+                enforce_retention(self.profile_dir, self.max_files)
+        except OSError as e:
+            logger.warning(f"無法寫入剖析檔案 {name}: {e}")
+
+
+def list_profiles(profile_dir):
+    """依修改時間由舊到新列出剖析檔案"""
+    paths = glob.glob(os.path.join(profile_dir, '*' + PROFILE_EXTENSION))
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def enforce_retention(profile_dir, max_files):
+    """刪除超過保留數量的最舊剖析檔案，返回刪除的檔案數"""
+    paths = list_profiles(profile_dir)
+    removed = 0
+    for path in paths[:max(0, len(paths) - max_files)]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def summarize_profiles(paths, sort='cumulative', limit=20, stream=None):
+    """合併多個剖析檔案並輸出耗時最多的函式"""
+    stats = pstats.Stats(*paths, stream=stream or sys.stdout)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stats
+
+
+def main(argv=None):
+    """命令列進入點"""
+    parser = argparse.ArgumentParser(description='請求剖析檔案工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summary = subparsers.add_parser('summary', help='彙整剖析檔案中耗時最多的函式')
+    summary.add_argument('--dir', default=os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR), help='剖析檔案目錄')
+    summary.add_argument('--match', default='', help='只彙整檔名包含此字串的檔案，例如 api_phones')
+    summary.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'], help='排序方式')
+    summary.add_argument('--limit', type=int, default=20, help='顯示的函式數')
+
+    sign = subparsers.add_parser('sign', help='產生 X-Profile-Token 標頭的值（使用 PROFILE_SECRET 環境變數）')
+    sign.add_argument('path', help='要剖析的請求路徑，例如 /api/phones')
+    sign.add_argument('--ttl', type=int, default=300, help='權杖有效秒數')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'sign':
+        secret = os.environ.get('PROFILE_SECRET', '')
+        if not secret:
+            parser.error('未設定 PROFILE_SECRET 環境變數')
+        print(sign_token(secret, args.path, time.time() + args.ttl))
+        return 0
+
+    paths = [path for path in list_profiles(args.dir) if args.match in os.path.basename(path)]
+    if not paths:
+        print(f'{args.dir} 中沒有符合的剖析檔案')
+        return 1
+    print(f'彙整 {len(paths)} 個剖析檔案')
+    summarize_profiles(paths, sort=args.sort, limit=args.limit)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
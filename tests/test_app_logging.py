@@ -0,0 +1,101 @@
+"""
+日誌設定測試模組
+測試 JSON 格式、重複警告的頻率限制與佇列日誌的背景輸出
+"""
+import io
+import json
+import logging
+import threading
+
+import app_logging
+
+
+def make_record(msg, level=logging.WARNING, lineno=10, args=(), **extra):
+    """建立測試用的日誌記錄"""
+    record = logging.LogRecord('test', level, '/app/index.py', lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    """測試 JSON 格式輸出訊息與透過 extra 傳入的欄位"""
+    record = make_record('%s %s', level=logging.INFO, args=('GET', '/api/phones'), status=200, duration_ms=1.5)
+    entry = json.loads(app_logging.JsonFormatter().format(record))
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'test'
+    assert entry['message'] == 'GET /api/phones'
+    assert entry['status'] == 200
+    assert entry['duration_ms'] == 1.5
+    assert 'args' not in entry and 'lineno' not in entry
+
+
+def test_rate_limit_filter_suppresses_repeated_warnings(monkeypatch):
+    """測試同一呼叫位置超過上限的警告被略過，下個區間的第一筆註明略過筆數"""
+    now = [100.0]
+    monkeypatch.setattr(app_logging.time, 'monotonic', lambda: now[0])
+    rate_filter = app_logging.RateLimitFilter(burst=2, interval=60)
+
+    assert [rate_filter.filter(make_record('找不到 %s', args=(i,))) for i in range(5)] == [True, True, False, False, False]
+    # 其他呼叫位置與錯誤等級不受影響
+    assert rate_filter.filter(make_record('其他', lineno=20))
+    assert rate_filter.filter(make_record('錯誤', level=logging.ERROR))
+    assert rate_filter.suppressed == 3
+
+    now[0] += 61
+    record = make_record('找不到 %s', args=('x',))
+    assert rate_filter.filter(record)
+    assert record.suppressed == 3
+    assert '略過 3 筆' in record.getMessage()
+
+
+def test_configure_logging_writes_through_background_listener():
+    """測試根日誌寫入佇列後由背景執行緒輸出到實際的 handler"""
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    stream = io.StringIO()
+    try:
+        listener = app_logging.configure_logging('INFO', [logging.StreamHandler(stream)], 'json', warning_burst=1)
+        assert all(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers)
+        log = logging.getLogger('test.queue')
+        for i in range(3):
+            log.warning('重複警告 %d', i)
+        log.info('存取', extra={'status': 404})
+        listener.stop()
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(saved_level)
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [entry['message'] for entry in entries] == ['重複警告 0', '存取']
+    assert entries[1]['status'] == 404
+
+
+def test_queue_handler_defers_formatting_to_listener_thread():
+    """測試記錄在背景執行緒才格式化，請求執行緒只負責放入佇列"""
+    formatted_on = []
+
+    class RecordingFormatter(logging.Formatter):
+        def format(self, record):
+            formatted_on.append(threading.current_thread())
+            return super().format(record)
+
+    handler = logging.StreamHandler(io.StringIO())
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    try:
+        listener = app_logging.configure_logging('INFO', [handler])
+        handler.setFormatter(RecordingFormatter())
+        logging.getLogger('test.deferred').info('存取 %s', '/api/phones')
+        listener.stop()
+    finally:
+        for queue_handler in list(root.handlers):
+            root.removeHandler(queue_handler)
+        for saved in saved_handlers:
+            root.addHandler(saved)
+        root.setLevel(saved_level)
+
+    assert formatted_on and threading.current_thread() not in formatted_on
+    assert handler.stream.getvalue() == '存取 /api/phones\n'
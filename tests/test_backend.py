@@ -5,6 +5,8 @@
 import pytest
 import json
 import os
+import time
+import sqlite3
 from unittest.mock import patch, MagicMock
 
 
@@ -43,7 +45,7 @@ def test_get_phone_by_id(client, mock_phone_data):
         'model_path': '/models/phone_a.glb'
     }
     
-    with patch('index.load_phones_data', return_value=[test_phone]):
+    with patch('index.find_phone', return_value=test_phone):
         response = client.get('/api/phones/test_phone_1')  # 使用匹配的 ID
         assert response.status_code == 200
         data = json.loads(response.data)
@@ -53,7 +55,7 @@ def test_get_phone_by_id(client, mock_phone_data):
 
 def test_get_phone_not_found(client):
     """測試取得不存在手機資料的錯誤處理"""
-    with patch('index.load_phones_data', return_value=[]):
+    with patch('index.find_phone', return_value=None):
         response = client.get('/api/phones/999')
         assert response.status_code == 404
 
@@ -99,3 +101,1024 @@ def test_error_handling(client):
         assert response.status_code == 500
         data = json.loads(response.data)
         assert 'error' in data
+
+
+@pytest.fixture
+def temp_phone_db(tmp_path, monkeypatch):
+    """建立暫存的手機資料庫並重設快取"""
+    import index
+    import sqlite3
+
+    db_path = str(tmp_path / 'phones.db')
+    conn = sqlite3.connect(db_path)
+    with open(index.SQL_INIT_PATH, 'r', encoding='utf-8') as sql_file:
+        conn.executescript(sql_file.read())
+    conn.executescript(index.phone_importer.search_schema_script())
+    index.phone_importer.ensure_change_log(conn)
+    index.phone_importer.refresh_specs(conn)
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(index, 'DB_PATH', db_path)
+    monkeypatch.setattr(index, 'DB_LOCK_PATH', db_path + '.lock')
+    monkeypatch.setattr(index, 'phone_cache', index.PhoneCatalogCache(ttl=60))
+    yield db_path
+    index.close_db_pools()
+
+
+def test_phone_cache_hit_and_miss(temp_phone_db):
+    """測試手機資料快取命中與未命中統計"""
+    import index
+
+    first = index.load_phones_data()
+    second = index.load_phones_data()
+    assert first is second
+    assert len(first) == 3
+
+    stats = index.get_phone_cache_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+    assert stats['cached_rows'] == 3
+
+
+def test_phone_cache_explicit_invalidation(temp_phone_db):
+    """測試明確失效後會重新讀取資料庫"""
+    import index
+    import sqlite3
+
+    index.load_phones_data()
+    conn = sqlite3.connect(temp_phone_db)
+    conn.execute("UPDATE phones SET name = '已更新' WHERE id = 'iphone_16_pro_max'")
+    conn.commit()
+    conn.close()
+
+    index.invalidate_phone_cache()
+    phones = index.load_phones_data()
+    assert any(p['name'] == '已更新' for p in phones)
+    assert index.get_phone_cache_stats()['invalidations'] == 1
+
+
+def test_phone_cache_detects_db_change_after_ttl(temp_phone_db):
+    """測試 TTL 逾時後以資料庫檔案版本偵測變更"""
+    import index
+    import sqlite3
+
+    index.phone_cache.ttl = 0
+    index.load_phones_data()
+    conn = sqlite3.connect(temp_phone_db)
+    conn.execute("DELETE FROM phones WHERE id = 'samsung_galaxy_z_flip_3'")
+    conn.commit()
+    conn.close()
+    # 確保檔案 mtime 與快取時的版本不同
+    os.utime(temp_phone_db, ns=(0, 0))
+
+    assert len(index.load_phones_data()) == 2
+
+
+def test_find_phone_uses_primary_key_when_cache_cold(temp_phone_db):
+    """測試快取未建立時以主鍵查詢單一手機，不載入整份資料"""
+    import index
+
+    with patch('index.query_phones') as mock_query_phones:
+        phone = index.find_phone('samsung_galaxy_s22_ultra')
+        mock_query_phones.assert_not_called()
+    assert phone['name'] == 'Samsung Galaxy S22 Ultra'
+    assert index.find_phone('not_exists') is None
+
+
+def test_find_phone_uses_cached_index(temp_phone_db):
+    """測試快取建立後以 id 索引查詢單一手機"""
+    import index
+
+    index.load_phones_data()
+    with patch('index.query_phone') as mock_query_phone:
+        phone = index.find_phone('samsung_galaxy_z_flip_3')
+        mock_query_phone.assert_not_called()
+    assert phone['id'] == 'samsung_galaxy_z_flip_3'
+
+
+def test_db_pool_reuses_connections(temp_phone_db):
+    """測試連線池重複使用已建立的連線"""
+    import index
+
+    for _ in range(3):
+        conn = index.get_db_connection(read_only=True)
+        conn.execute('SELECT 1').fetchone()
+        conn.close()
+
+    stats = index.get_db_pool(read_only=True).stats()
+    assert stats['created'] == 1
+    assert stats['reused'] == 2
+    assert stats['in_use'] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 os.fork')
+def test_db_pool_is_not_shared_with_forked_children(temp_phone_db):
+    """測試 fork 出的子行程不沿用父行程開啟的連線，而是建立新的連線池"""
+    import index
+
+    conn = index.get_db_connection(read_only=True)
+    conn.close()
+    parent_pool = index.get_db_pool(read_only=True)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            inherited = index.get_db_pool_stats()
+            child_conn = index.get_db_connection(read_only=True)
+            count = child_conn.execute('SELECT COUNT(*) FROM phones').fetchone()[0]
+            child_conn.close()
+            result = {'inherited': inherited, 'new_pool': index.get_db_pool(read_only=True) is not parent_pool,
+                      'created': index.get_db_pool(read_only=True).stats()['created'], 'count': count}
+            os.write(write_fd, json.dumps(result).encode('utf-8'))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+
+    assert result == {'inherited': [], 'new_pool': True, 'created': 1, 'count': 3}
+    # 父行程的連線池不受影響
+    assert index.get_db_pool(read_only=True) is parent_pool
+    assert parent_pool.stats()['idle'] == 1
+
+
+def test_db_pool_read_only_connection_rejects_writes(temp_phone_db):
+    """測試唯讀連線無法寫入資料庫"""
+    import index
+    import sqlite3
+
+    conn = index.get_db_connection(read_only=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM phones")
+    finally:
+        conn.close()
+
+
+def test_db_pool_is_bounded(temp_phone_db):
+    """測試連線池達上限時逾時而非無限建立連線"""
+    import index
+
+    pool = index.SQLiteConnectionPool(temp_phone_db, read_only=True, max_size=1, timeout=0.01)
+    conn = pool.acquire()
+    try:
+        with pytest.raises(Exception):
+            pool.acquire()
+        assert pool.stats()['timeouts'] == 1
+    finally:
+        conn.close()
+        pool.close_all()
+
+
+def test_phones_response_has_etag_and_returns_304(client, temp_phone_db):
+    """測試手機清單回應帶有 ETag，並對 If-None-Match 回傳 304"""
+    response = client.get('/api/phones')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert 'max-age' in response.headers['Cache-Control']
+
+    response = client.get('/api/phones', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_phone_response_serialized_once_per_version(client, temp_phone_db):
+    """測試同一版本的單一手機回應只序列化一次"""
+    import index
+
+    index.load_phones_data()
+    with patch('index.serialize_json', wraps=index.serialize_json) as mock_serialize:
+        first = client.get('/api/phones/iphone_16_pro_max')
+        second = client.get('/api/phones/iphone_16_pro_max')
+        assert first.data == second.data
+        assert first.headers['ETag'] == second.headers['ETag']
+        assert mock_serialize.call_count == 1
+
+        index.invalidate_phone_cache()
+        index.load_phones_data()
+        client.get('/api/phones/iphone_16_pro_max')
+        assert mock_serialize.call_count == 2
+
+
+def test_send_asset_negotiates_precompressed_variant(app, tmp_path):
+    """測試依 Accept-Encoding 傳送即時產生的 gzip 版本"""
+    import gzip
+    import index
+
+    asset = tmp_path / 'bundle.js'
+    content = b'console.log("phone");\n' * 200
+    asset.write_bytes(content)
+
+    with app.test_request_context('/bundle.js', headers={'Accept-Encoding': 'gzip'}):
+        response = index.send_asset(str(asset), 0)
+        response.direct_passthrough = False
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.mimetype in ('application/javascript', 'text/javascript')
+        assert gzip.decompress(response.get_data()) == content
+    assert (tmp_path / 'bundle.js.gz').exists()
+
+    with app.test_request_context('/bundle.js', headers={'Accept-Encoding': 'identity'}):
+        response = index.send_asset(str(asset), 0)
+        response.direct_passthrough = False
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data() == content
+
+    with app.test_request_context('/bundle.js', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-9'}):
+        response = index.send_asset(str(asset), 0)
+        response.direct_passthrough = False
+        assert response.status_code == 206
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data() == content[:10]
+
+
+def test_python_sources_are_not_served(client):
+    """測試無法透過靜態資源路由讀取 Python 原始碼"""
+    response = client.get('/asset_compression.py')
+    assert response.status_code == 403
+
+
+def test_static_manifest_resolves_without_filesystem_access():
+    """測試靜態資源清單以記憶體查詢解析路徑，不存在的路徑不存取檔案系統"""
+    import index
+
+    index.static_manifest.refresh()
+    with patch('os.path.exists') as mock_exists, patch('os.stat') as mock_stat:
+        assert index.safe_path_join(index.PROJECT_ROOT, 'main.js').endswith('main.js')
+        assert index.safe_path_join(index.MODELS_PATH, 'iphone_16_pro_max.glb').endswith('iphone_16_pro_max.glb')
+        assert index.safe_path_join(index.PROJECT_ROOT, 'missing/unknown.js') is None
+        assert index.safe_path_join(index.PROJECT_ROOT, '../etc/passwd') is None
+        mock_exists.assert_not_called()
+        mock_stat.assert_not_called()
+
+    entry = index.static_manifest.get('main.js')
+    assert len(entry['hash']) == 64
+    assert entry['size'] == os.path.getsize(entry['path'])
+
+
+def test_static_manifest_excludes_private_files():
+    """測試靜態資源清單不包含原始碼與資料檔案"""
+    import index
+
+    entries = index.static_manifest.refresh()
+    assert 'index.py' not in entries
+    assert not any(path.startswith(('data/', 'tests/', '.git')) for path in entries)
+
+
+def test_static_manifest_only_scans_asset_directories(tmp_path):
+    """測試靜態資源清單只收錄根目錄網頁資源與 models/、static/ 目錄"""
+    import index
+
+    for relative_path in (
+        'main.js', 'README.md', 'app.py',
+        'models/phone.glb', 'models/lod/phone.low.glb', 'models/.cache/x.glb',
+        'static/img/logo.png',
+        '.venv/lib/site.js', 'venv/lib/page.html', '.git/hooks/hook.js',
+        '.pytest_cache/report.html', 'benchmarks/report.html', 'tests/fixture.js',
+    ):
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+
+    manifest = index.StaticAssetManifest(str(tmp_path), ttl=0)
+    assert set(manifest.refresh()) == {'main.js', 'models/phone.glb', 'static/img/logo.png'}
+
+
+def test_send_asset_uses_manifest_variant_sizes(app, tmp_path, monkeypatch):
+    """測試清單中的資源以掃描時記錄的壓縮版本大小選擇版本，不逐次檢查檔案"""
+    import gzip
+    import index
+
+    content = b'body { color: red; }\n' * 200
+    (tmp_path / 'site.css').write_bytes(content)
+    (tmp_path / 'site.css.gz').write_bytes(gzip.compress(content))
+    manifest = index.StaticAssetManifest(str(tmp_path), ttl=0)
+    monkeypatch.setattr(index, 'static_manifest', manifest)
+    entry = manifest.get('site.css')
+    assert entry['variants'] == {'gzip': (tmp_path / 'site.css.gz').stat().st_size}
+
+    with app.test_request_context('/site.css', headers={'Accept-Encoding': 'gzip'}):
+        with patch('index.asset_compression.is_variant_fresh') as mock_fresh, \
+                patch('index.os.path.getsize') as mock_getsize:
+            assert index.select_precompressed_variant(entry['path'], entry) == (entry['path'] + '.gz', 'gzip')
+            mock_fresh.assert_not_called()
+            mock_getsize.assert_not_called()
+
+        # 壓縮版本在下次掃描前被刪除時改送原始檔案
+        (tmp_path / 'site.css.gz').unlink()
+        response = index.send_asset(entry['path'], 0)
+        response.direct_passthrough = False
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data() == content
+
+
+def test_static_manifest_refreshes_once_in_background(tmp_path):
+    """測試清單逾時後只由一個背景執行緒重新掃描，請求沿用目前的清單"""
+    import threading
+    import index
+
+    (tmp_path / 'app.js').write_bytes(b'1')
+    manifest = index.StaticAssetManifest(str(tmp_path), ttl=60)
+    first = manifest.entries()
+    release = threading.Event()
+    rebuilds = []
+    rebuild = manifest._rebuild
+
+    def slow_rebuild():
+        rebuilds.append(threading.current_thread())
+        release.wait(5)
+        return rebuild()
+
+    manifest._rebuild = slow_rebuild
+    manifest._built_at -= 61
+    (tmp_path / 'app.js').write_bytes(b'22')
+    assert all(manifest.entries() is first for _ in range(5))
+    release.set()
+    for _ in range(100):
+        if manifest._entries is not first:
+            break
+        time.sleep(0.01)
+    assert len(rebuilds) == 1 and rebuilds[0] is not threading.current_thread()
+    assert manifest.get('app.js')['size'] == 2
+
+
+@pytest.fixture
+def temp_init_sources(tmp_path, monkeypatch):
+    """建立暫存的資料庫初始化來源與資料庫路徑"""
+    import index
+    import shutil
+
+    sql_path = tmp_path / 'database.sql'
+    json_path = tmp_path / 'phones.json'
+    shutil.copy(index.SQL_INIT_PATH, sql_path)
+    shutil.copy(index.JSON_PATH, json_path)
+    monkeypatch.setattr(index, 'DB_PATH', str(tmp_path / 'phones.db'))
+    monkeypatch.setattr(index, 'DB_LOCK_PATH', str(tmp_path / 'phones.db.lock'))
+    monkeypatch.setattr(index, 'SQL_INIT_PATH', str(sql_path))
+    monkeypatch.setattr(index, 'JSON_PATH', str(json_path))
+    monkeypatch.setattr(index, 'phone_cache', index.PhoneCatalogCache(ttl=60))
+    yield sql_path
+    index.close_db_pools()
+
+
+def test_init_database_skips_when_sources_unchanged(temp_init_sources):
+    """測試初始化來源未變更時略過資料庫重建"""
+    import index
+
+    assert index.init_database() is True
+    assert index.init_database() is False
+    assert len(index.query_phones()) == 3
+
+    with open(temp_init_sources, 'a', encoding='utf-8') as f:
+        f.write("\nUPDATE phones SET name = '新名稱' WHERE id = 'iphone_16_pro_max';\n")
+    assert index.init_database() is True
+    assert index.find_phone('iphone_16_pro_max')['name'] == '新名稱'
+
+
+def test_init_database_concurrent_workers_rebuild_once(temp_init_sources):
+    """測試多個執行緒同時初始化時只重建一次"""
+    import index
+    import threading
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.init_database())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def test_create_db_from_default_data_uses_importer(temp_phone_db):
+    """測試從 JSON 建立資料庫時以批次匯入取代既有資料並使快取失效"""
+    import index
+
+    assert len(index.load_phones_data()) == 3
+    index.create_db_from_default_data()
+    phones = index.load_phones_data()
+    assert [phone['id'] for phone in phones] == [phone['id'] for phone in index.get_default_phones()]
+    assert index.get_phone_cache_stats()['misses'] == 2
+
+
+def test_get_phones_keyset_pagination(client, temp_phone_db):
+    """測試以 fields、limit 與游標分頁讀取手機資料"""
+    import index
+
+    expected_ids = sorted(phone['id'] for phone in index.query_phones())
+    seen = []
+    url = '/api/phones?fields=name&limit=2'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert all(set(phone) == {'id', 'name'} for phone in page)
+        seen.extend(phone['id'] for phone in page)
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+    assert seen == expected_ids
+
+
+def test_get_phones_page_reads_only_requested_columns(client, temp_phone_db, monkeypatch):
+    """測試投影查詢只讀取要求的欄位"""
+    import index
+
+    calls = []
+    original = index.query_phone_page
+    monkeypatch.setattr(index, 'query_phone_page', lambda *args: calls.append(args) or original(*args))
+
+    response = client.get('/api/phones?fields=name,name,battery')
+    assert response.status_code == 200
+    assert calls == [(['id', 'name', 'battery'], None, None, ([], []))]
+    assert 'X-Next-Cursor' not in response.headers
+
+
+@pytest.mark.parametrize('query', ['fields=price', 'limit=0', 'limit=abc', 'cursor=%%%'])
+def test_get_phones_page_rejects_invalid_arguments(client, temp_phone_db, query):
+    """測試無效的分頁參數返回 400"""
+    response = client.get(f'/api/phones?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_search_phones_ranks_and_highlights(client, temp_phone_db):
+    """測試全文檢索支援中英文混合詞並返回標示符合片段的摘要"""
+    response = client.get('/api/phones/search', query_string={'q': '動態島'})
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [phone['id'] for phone in results] == ['iphone_16_pro_max']
+    assert '<mark>動態島</mark>' in results[0]['snippet']
+
+    results = client.get('/api/phones/search', query_string={'q': 'S Pen 支援'}).get_json()
+    assert [phone['id'] for phone in results] == ['samsung_galaxy_s22_ultra']
+    assert '<mark>Pen</mark>' in results[0]['snippet']
+
+    assert client.get('/api/phones/search').status_code == 400
+    assert client.get('/api/phones/search?q="AND').get_json() == []
+
+
+def test_search_index_follows_phone_changes(temp_phone_db):
+    """測試觸發程序讓全文檢索索引與 phones 表格同步"""
+    import index
+
+    conn = index.get_db_connection()
+    conn.execute("UPDATE phones SET special_features = '衛星通訊' WHERE id = 'iphone_16_pro_max'")
+    conn.commit()
+    index.phone_importer.import_phones(conn, [{**index.find_phone('iphone_16_pro_max'),
+                                               'id': 'new_phone', 'name': 'New Phone 衛星通訊'}])
+    conn.execute("DELETE FROM phones WHERE id = 'samsung_galaxy_s22_ultra'")
+    conn.commit()
+    conn.close()
+
+    assert [phone['id'] for phone in index.search_phones('衛星通訊')] == ['new_phone', 'iphone_16_pro_max']
+    assert index.search_phones('動態島') == []
+    assert index.search_phones('S Pen') == []
+
+
+def test_search_falls_back_without_index(client, temp_phone_db):
+    """測試資料庫尚無全文檢索表格時改用記憶體搜尋"""
+    import index
+    import sqlite3
+
+    with sqlite3.connect(temp_phone_db) as conn:
+        conn.execute('DROP TABLE phones_fts')
+    results = client.get('/api/phones/search', query_string={'q': '動態島'}).get_json()
+    assert [phone['id'] for phone in results] == ['iphone_16_pro_max']
+    assert index.search_phones('動態島') is None
+
+
+def test_parse_specs_from_text():
+    """測試由文字規格解析數值欄位"""
+    import phone_importer
+
+    specs = phone_importer.parse_specs({
+        'battery': '4,685 mAh',
+        'screen': '6.7 inch 主螢幕 + 1.9 inch 外螢幕',
+        'camera': '12MP 超廣角 + 50MP 主鏡頭',
+        'storage': '256 GB / 512 GB / 1 TB',
+    })
+    assert specs == {'battery_mah': 4685, 'screen_inches': 6.7, 'main_camera_mp': 50.0,
+                     'storage_gb': [256, 512, 1024]}
+    assert phone_importer.parse_specs({'battery': '未知'})['battery_mah'] is None
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('min_battery=4500', ['iphone_16_pro_max', 'samsung_galaxy_s22_ultra']),
+    ('max_screen=6.8', ['samsung_galaxy_s22_ultra', 'samsung_galaxy_z_flip_3']),
+    ('storage_gb=128', ['samsung_galaxy_s22_ultra', 'samsung_galaxy_z_flip_3']),
+    ('storage_gb=1024&min_camera=100&max_battery=4800', ['iphone_16_pro_max']),
+])
+def test_get_phones_spec_filters(client, temp_phone_db, query, expected):
+    """測試以數值規格篩選手機資料"""
+    response = client.get(f'/api/phones?fields=battery_mah&{query}')
+    assert response.status_code == 200
+    assert [phone['id'] for phone in response.get_json()] == expected
+
+
+def test_spec_filters_use_indexes(temp_phone_db):
+    """測試數值規格篩選以索引查詢而非全表掃描"""
+    import sqlite3
+
+    with sqlite3.connect(temp_phone_db) as conn:
+        plan = ' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM phones WHERE battery_mah >= 4500'))
+        assert 'idx_phones_battery' in plan
+        plan = ' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT phone_id FROM phone_storage WHERE storage_gb IN (128, 256)'))
+        assert 'PRIMARY KEY' in plan
+
+
+def test_spec_filters_fall_back_to_memory(client, temp_phone_db, monkeypatch):
+    """測試資料庫無法使用時以記憶體資料套用相同的篩選"""
+    import index
+
+    monkeypatch.setattr(index, 'get_db_connection', lambda read_only=False: None)
+    monkeypatch.setattr(index, 'load_phones_data', index.get_default_phones)
+    response = client.get('/api/phones?fields=battery_mah&min_battery=4500')
+    assert [(phone['id'], phone['battery_mah']) for phone in response.get_json()] == [
+        ('iphone_16_pro_max', 4685), ('samsung_galaxy_s22_ultra', 5000)]
+    assert client.get('/api/phones?min_battery=abc').status_code == 400
+
+
+def test_get_phones_batch_preserves_order_and_reports_missing(client, temp_phone_db):
+    """測試批次查詢依要求順序返回手機並列出找不到的 ID"""
+    response = client.get('/api/phones/batch?ids=samsung_galaxy_z_flip_3,unknown,iphone_16_pro_max,unknown')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [phone['id'] for phone in data['phones']] == ['samsung_galaxy_z_flip_3', 'iphone_16_pro_max']
+    assert data['missing'] == ['unknown']
+
+    response = client.post('/api/phones/batch', json={'ids': ['iphone_16_pro_max']})
+    assert [phone['id'] for phone in response.get_json()['phones']] == ['iphone_16_pro_max']
+    assert client.post('/api/phones/batch', json={'ids': 'iphone_16_pro_max'}).status_code == 400
+    assert client.get('/api/phones/batch?ids=,').status_code == 400
+
+
+def test_find_phones_uses_single_query_then_cache(temp_phone_db, monkeypatch):
+    """測試批次查詢在快取未命中時只執行一次資料庫查詢，之後改用快取"""
+    import index
+
+    calls = []
+    original = index.query_phones_by_id
+    monkeypatch.setattr(index, 'query_phones_by_id', lambda ids: calls.append(list(ids)) or original(ids))
+
+    ids = ['iphone_16_pro_max', 'samsung_galaxy_s22_ultra']
+    assert set(index.find_phones(ids)) == set(ids)
+    assert calls == [ids]
+
+    index.load_phones_data()
+    assert set(index.find_phones(ids)) == set(ids)
+    assert len(calls) == 1
+
+
+def test_hot_file_cache_evicts_least_recently_used(tmp_path):
+    """測試熱門檔案快取超過記憶體預算時移出最久未使用的檔案"""
+    import index
+
+    paths = []
+    for name in ('a', 'b', 'c'):
+        path = tmp_path / f'{name}.glb'
+        path.write_bytes(name.encode('ascii') * 100)
+        paths.append(str(path))
+    cache = index.HotFileCache(budget=250)
+
+    for path in paths[:2]:
+        assert cache.get(path, os.stat(path))[:1] == os.path.basename(path)[:1].encode('ascii')
+    cache.get(paths[0], os.stat(paths[0]))
+    cache.get(paths[2], os.stat(paths[2]))
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['cached_bytes'] == 200
+    assert cache.get(paths[1], os.stat(paths[1])) is not None
+    assert cache.stats()['misses'] == 4
+    assert cache.get(str(tmp_path / 'a.glb'), os.stat(paths[0])) is not None
+    oversized = tmp_path / 'big.glb'
+    oversized.write_bytes(b'x' * 300)
+    assert cache.get(str(oversized), os.stat(oversized)) is None
+
+
+def test_metrics_histogram_renders_cumulative_buckets():
+    """測試直方圖以累計區間輸出 Prometheus 文字格式"""
+    import metrics
+
+    registry = metrics.Registry()
+    histogram = registry.histogram('latency_seconds', '延遲', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, ('a"b',))
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP latency_seconds 延遲', '# TYPE latency_seconds histogram']
+    assert 'latency_seconds_bucket{endpoint="a\\"b",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{endpoint="a\\"b",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="a\\"b",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{endpoint="a\\"b"} 4' in lines
+
+
+def test_metrics_help_escapes_only_backslash_and_newline():
+    """測試 HELP 說明只跳脫反斜線與換行，雙引號保持原樣"""
+    import metrics
+
+    registry = metrics.Registry()
+    registry.counter('requests_total', '請求 "數"\n路徑 C:\\app', ('path',)).inc(('a"b',))
+    lines = registry.render().splitlines()
+    assert lines[0] == '# HELP requests_total 請求 "數"\\n路徑 C:\\\\app'
+    assert 'requests_total{path="a\\"b"} 1' in lines
+
+
+def test_metrics_endpoint_records_requests(client, temp_phone_db, monkeypatch):
+    """測試 /metrics 輸出各端點的請求數、延遲、傳送位元組與資料庫時間"""
+    import index
+
+    before = index.REQUEST_COUNT.get(('get_phones', 'GET', '200'))
+    response = client.get('/api/phones')
+    assert index.REQUEST_COUNT.get(('get_phones', 'GET', '200')) == before + 1
+    assert index.REQUEST_DB_SECONDS.get(('get_phones',)) > 0
+
+    metrics_response = client.get('/metrics')
+    assert metrics_response.status_code == 200
+    assert metrics_response.content_type.startswith('text/plain; version=0.0.4')
+    body = metrics_response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="get_phones"}' in body
+    assert f'http_requests_total{{endpoint="get_phones",method="GET",status="200"}} {before + 1}' in body
+    assert 'http_response_bytes_total{endpoint="get_phones"}' in body
+    assert 'cache_hit_ratio{cache="phones"}' in body
+    assert response.content_length > 0
+
+    monkeypatch.setattr(index, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_access_log_records_request_fields(client, temp_phone_db, monkeypatch, caplog):
+    """測試啟用存取日誌時每個請求輸出一筆含狀態碼與耗時的記錄，取樣率為 0 時不輸出"""
+    import logging
+    import index
+
+    monkeypatch.setattr(index, 'LOG_ACCESS', True)
+    caplog.set_level(logging.INFO, logger='access')
+    client.get('/api/phones?limit=1', headers={'User-Agent': 'pytest'})
+    client.get('/models/missing.glb')
+
+    records = [record for record in caplog.records if record.name == 'access']
+    assert [(record.path, record.status) for record in records] == [('/api/phones', 200), ('/models/missing.glb', 404)]
+    assert records[0].query == 'limit=1'
+    assert records[0].user_agent == 'pytest'
+    assert records[0].duration_ms >= 0
+
+    caplog.clear()
+    monkeypatch.setattr(index, 'LOG_ACCESS_SAMPLE_RATE', 0.0)
+    client.get('/api/phones')
+    assert not [record for record in caplog.records if record.name == 'access']
+
+
+def test_index_page_inlines_catalog_and_preload_links(client, temp_phone_db):
+    """測試首頁內嵌手機資料、輸出預先載入標頭，並在資料版本未變更時重複使用渲染結果"""
+    import re
+    import index
+
+    with patch('index.render_template', wraps=index.render_template) as render:
+        response = client.get('/')
+        again = client.get('/')
+    assert render.call_count == 1
+    assert response.status_code == 200
+    assert again.data == response.data
+
+    match = re.search(rb'<script id="phone-catalog" type="application/json">(.*?)</script>', response.data, re.S)
+    assert json.loads(match.group(1)) == json.loads(client.get('/api/phones').data)
+
+    links = response.headers['Link']
+    assert f'<{index.asset_url("style.css")}>; rel=preload; as=style' in links
+    assert f'<{index.asset_url("main.js")}>; rel=modulepreload' in links
+    first_model = index.load_phones_data()[0]['model_path']
+    assert f'<{index.asset_url(first_model)}>; rel=preload; as=fetch; crossorigin' in links
+
+    assert client.get('/', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_index_page_escapes_inline_catalog(client, temp_phone_db):
+    """測試內嵌資料中的 HTML 字元被跳脫，無法提早結束 script 區塊"""
+    phones = [{'id': 'x', 'name': '</script><b>&', 'model_path': 'models/x.glb'}]
+    with patch('index.load_phones_data', return_value=phones):
+        response = client.get('/')
+    assert b'</script><b>' not in response.data
+    assert b'\\u003c/script\\u003e\\u003cb\\u003e\\u0026' in response.data
+
+
+def test_fingerprinted_assets_are_immutable(client, temp_phone_db):
+    """測試頁面與 API 使用內容雜湊網址，雜湊網址以長效 immutable 快取提供，原始路徑維持短效快取"""
+    import index
+
+    index.static_manifest.refresh()
+    main_url = index.asset_url('main.js')
+    digest = index.static_manifest.get('main.js')['hash'][:index.FINGERPRINT_LENGTH]
+    assert main_url == f'/main.{digest}.js'
+    assert main_url.encode() in client.get('/').data
+
+    response = client.get(main_url, headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == f'public, max-age={index.FINGERPRINT_CACHE_MAX_AGE}, immutable'
+    assert response.get_data() == client.get('/main.js', headers={'Accept-Encoding': 'identity'}).get_data()
+    assert client.get('/main.js').headers['Cache-Control'] == f'public, max-age={index.STATIC_CACHE_MAX_AGE}'
+    # 與目前內容不符的雜湊不會被當成長效快取的資源
+    assert client.get('/main.000000000000.js').status_code == 404
+
+    phones = json.loads(client.get('/api/phones').data)
+    model_url = phones[0]['model_path']
+    assert model_url == index.asset_url(index.load_phones_data()[0]['model_path']).lstrip('/')
+    assert json.loads(client.get(f'/api/phones/{phones[0]["id"]}').data)['model_path'] == model_url
+    model_response = client.get('/' + model_url, headers={'Accept-Encoding': 'identity'})
+    assert model_response.status_code == 200
+    assert model_response.headers['Cache-Control'].endswith('immutable')
+
+
+WRITE_HEADERS = {'Authorization': 'Bearer write-secret'}
+
+
+def make_new_phone(**overrides):
+    """建立寫入 API 測試用的手機資料"""
+    phone = {
+        'id': 'test_phone_c',
+        'name': '測試手機 C',
+        'screen': '6.3吋 OLED',
+        'processor': '測試晶片',
+        'camera': '50MP 主鏡頭',
+        'battery': '4500mAh',
+        'storage': '256GB / 512GB',
+        'model_path': 'models/iphone_16_pro_max.glb',
+        'special_features': '衛星通訊',
+    }
+    phone.update(overrides)
+    return phone
+
+
+def test_phone_write_api_requires_token(client, temp_phone_db, monkeypatch):
+    """測試未設定權杖時停用寫入 API，權杖錯誤時返回 401"""
+    import index
+
+    assert client.post('/api/phones', json=make_new_phone()).status_code == 403
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    assert client.post('/api/phones', json=make_new_phone(),
+                       headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/api/phones/test_phone_c').status_code == 404
+
+
+def test_phone_write_api_crud(client, temp_phone_db, monkeypatch):
+    """測試新增、部分更新、取代與刪除手機，並同步版本、全文檢索與規格篩選"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+
+    response = client.post('/api/phones', json=make_new_phone(), headers=WRITE_HEADERS)
+    assert response.status_code == 201
+    assert response.headers['Location'] == '/api/phones/test_phone_c'
+    created = json.loads(response.data)
+    assert created['version'] == 1 and created['battery_mah'] == 4500
+    catalog_version = int(response.headers['X-Catalog-Version'])
+    assert client.post('/api/phones', json=make_new_phone(), headers=WRITE_HEADERS).status_code == 409
+
+    search = json.loads(client.get('/api/phones/search?q=衛星通訊').data)
+    assert [phone['id'] for phone in search] == ['test_phone_c']
+    filtered = json.loads(client.get('/api/phones?fields=id&storage_gb=512&min_battery=4500').data)
+    assert {'id': 'test_phone_c'} in filtered
+
+    etag = client.get('/api/phones/test_phone_c').headers['ETag']
+    response = client.patch('/api/phones/test_phone_c', json={'battery': '5000mAh'},
+                            headers={**WRITE_HEADERS, 'If-Match': etag})
+    assert response.status_code == 200
+    patched = json.loads(response.data)
+    assert (patched['battery_mah'], patched['version'], patched['name']) == (5000, 2, '測試手機 C')
+    assert int(response.headers['X-Catalog-Version']) == catalog_version + 1
+    # 以過期的 ETag 寫入會被拒絕
+    assert client.patch('/api/phones/test_phone_c', json={'battery': '1mAh'},
+                        headers={**WRITE_HEADERS, 'If-Match': etag}).status_code == 412
+
+    response = client.put('/api/phones/test_phone_c', json=make_new_phone(name='新名稱', special_features='快充'),
+                          headers=WRITE_HEADERS)
+    assert response.status_code == 200
+    assert json.loads(client.get('/api/phones/test_phone_c').data)['name'] == '新名稱'
+    assert json.loads(client.get('/api/phones/search?q=衛星通訊').data) == []
+
+    assert client.delete('/api/phones/test_phone_c', headers=WRITE_HEADERS).status_code == 204
+    assert client.get('/api/phones/test_phone_c').status_code == 404
+    assert client.delete('/api/phones/test_phone_c', headers=WRITE_HEADERS).status_code == 404
+    assert not json.loads(client.get('/api/phones?fields=id&storage_gb=512&min_battery=4500').data).count(
+        {'id': 'test_phone_c'})
+
+    conn = sqlite3.connect(temp_phone_db)
+    changes = conn.execute('SELECT op, fields FROM phone_changes ORDER BY version').fetchall()
+    conn.close()
+    assert [op for op, _ in changes] == ['create', 'update', 'update', 'delete']
+    assert json.loads(changes[1][1]) == ['battery']
+
+
+def test_phone_write_api_validates_payload(client, temp_phone_db, monkeypatch):
+    """測試寫入內容依 phones 表格結構驗證"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    invalid = [
+        make_new_phone(weight='195 g'),
+        make_new_phone(name=''),
+        make_new_phone(battery=5000),
+        make_new_phone(id='search'),
+        {'id': 'test_phone_d', 'name': '缺少其他欄位'},
+    ]
+    for payload in invalid:
+        assert client.post('/api/phones', json=payload, headers=WRITE_HEADERS).status_code == 400
+    assert client.put('/api/phones/other_id', json=make_new_phone(), headers=WRITE_HEADERS).status_code == 400
+    assert client.patch('/api/phones/missing', json={'name': 'x'}, headers=WRITE_HEADERS).status_code == 404
+
+
+def test_phone_write_api_stores_original_model_path(client, temp_phone_db, monkeypatch):
+    """測試將讀取 API 返回的內容雜湊 model_path 寫回時，資料庫仍存入原始路徑"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    phone = json.loads(client.get('/api/phones/iphone_16_pro_max').data)
+    assert phone['model_path'] != 'models/iphone_16_pro_max.glb'
+
+    payload = {column: phone[column] for column in index.phone_importer.PHONE_COLUMNS}
+    response = client.put('/api/phones/iphone_16_pro_max', json={**payload, 'name': '改名'}, headers=WRITE_HEADERS)
+    assert response.status_code == 200
+    assert json.loads(response.data)['model_path'] == phone['model_path']
+    conn = sqlite3.connect(temp_phone_db)
+    stored = conn.execute("SELECT model_path FROM phones WHERE id = 'iphone_16_pro_max'").fetchone()[0]
+    conn.close()
+    assert stored == 'models/iphone_16_pro_max.glb'
+
+
+def test_deleting_every_phone_keeps_catalog_empty(client, temp_phone_db, monkeypatch):
+    """測試透過寫入 API 刪除全部手機後，讀取時不會以初始化資料重建資料庫"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    for phone in json.loads(client.get('/api/phones?fields=id').data):
+        assert client.delete(f'/api/phones/{phone["id"]}', headers=WRITE_HEADERS).status_code == 204
+    index.invalidate_phone_cache()
+    with patch('index.init_database') as mock_init_database:
+        assert json.loads(client.get('/api/phones').data) == []
+        mock_init_database.assert_not_called()
+
+
+def test_phone_write_updates_cache_incrementally(client, temp_phone_db, monkeypatch):
+    """測試寫入後只替換快取中受影響的手機，其他手機的資料與序列化結果繼續使用"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    # 暫存資料庫在第一次開啟讀寫連線時才切換為 WAL 模式，先切換再建立快取
+    index.get_db_connection().close()
+    phones = index.load_phones_data()
+    first, second = phones[0], phones[1]
+    second_etag = client.get(f'/api/phones/{second["id"]}').headers['ETag']
+    invalidations = index.phone_cache.invalidations
+
+    response = client.patch(f'/api/phones/{first["id"]}', json={'name': '更新後的名稱'}, headers=WRITE_HEADERS)
+    assert response.status_code == 200
+
+    stats = index.phone_cache.stats()
+    assert stats['partial_updates'] == 1
+    assert stats['invalidations'] == invalidations
+    updated = index.load_phones_data()
+    assert updated[0]['name'] == '更新後的名稱'
+    assert updated[1] is second
+    assert [phone['id'] for phone in updated] == [phone['id'] for phone in phones]
+    with patch('index.serialize_json', wraps=index.serialize_json) as serialize:
+        assert client.get(f'/api/phones/{second["id"]}').headers['ETag'] == second_etag
+        serialize.assert_not_called()
+    assert json.loads(client.get('/api/phones').data)[0]['name'] == '更新後的名稱'
+
+
+def read_sse_events(response):
+    """解析 text/event-stream 回應中的事件"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_phone_stream_resumes_from_last_event_id(client, temp_phone_db, monkeypatch):
+    """測試變更串流送出 Last-Event-ID 之後的變更事件，新連線從目前版本開始"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    monkeypatch.setattr(index, 'PHONE_STREAM_MAX_SECONDS', 0)
+
+    response = client.get('/api/phones/stream')
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    [(start, event, data)] = read_sse_events(response)
+    assert event == 'ready' and data == {'catalog_version': start}
+
+    client.post('/api/phones', json=make_new_phone(), headers=WRITE_HEADERS)
+    client.patch('/api/phones/test_phone_c', json={'battery': '5000mAh'}, headers=WRITE_HEADERS)
+    client.delete('/api/phones/test_phone_c', headers=WRITE_HEADERS)
+
+    events = read_sse_events(client.get('/api/phones/stream', headers={'Last-Event-ID': str(start)}))
+    assert [event_id for event_id, _, _ in events] == [start + 1, start + 2, start + 3]
+    assert [(data['op'], data['version']) for _, _, data in events] == [('create', 1), ('update', 2), ('delete', None)]
+    assert events[1][2] == {'catalog_version': start + 2, 'id': 'test_phone_c', 'op': 'update',
+                            'version': 2, 'fields': ['battery']}
+
+    resumed = read_sse_events(client.get(f'/api/phones/stream?last_event_id={start + 2}'))
+    assert [event_id for event_id, _, _ in resumed] == [start + 3]
+
+    monkeypatch.setattr(index, 'PHONE_STREAM_BACKLOG_LIMIT', 2)
+    [(event_id, event, _)] = read_sse_events(client.get('/api/phones/stream', headers={'Last-Event-ID': str(start)}))
+    assert (event_id, event) == (start + 3, 'reset')
+    for invalid in ('abc', '-1', '²'):
+        assert client.get('/api/phones/stream', headers={'Last-Event-ID': invalid}).status_code == 400
+
+    # 資料庫被還原成較舊的版本時，較新的 Last-Event-ID 會收到 reset
+    [(event_id, event, _)] = read_sse_events(client.get('/api/phones/stream', headers={'Last-Event-ID': str(start + 50)}))
+    assert (event_id, event) == (start + 3, 'reset')
+
+
+def test_phone_stream_resets_when_changes_are_unavailable(client, temp_phone_db, monkeypatch):
+    """測試變更記錄無法讀取或已被清除時送出 reset，用戶端不會停在過期的版本"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    monkeypatch.setattr(index, 'PHONE_STREAM_MAX_SECONDS', 0)
+    monkeypatch.setattr(index, 'PHONE_STREAM_BACKLOG_LIMIT', 2)
+    start = index.phone_change_feed.poll()
+    client.post('/api/phones', json=make_new_phone(), headers=WRITE_HEADERS)
+    for battery in ('4600mAh', '4700mAh', '4800mAh'):
+        client.patch('/api/phones/test_phone_c', json={'battery': battery}, headers=WRITE_HEADERS)
+
+    # 只保留最新的 PHONE_STREAM_BACKLOG_LIMIT 筆記錄，需要已清除記錄的用戶端收到 reset
+    conn = sqlite3.connect(temp_phone_db)
+    assert [row[0] for row in conn.execute('SELECT version FROM phone_changes ORDER BY version')] == [start + 3, start + 4]
+    conn.close()
+    [(event_id, event, _)] = read_sse_events(client.get('/api/phones/stream', headers={'Last-Event-ID': str(start + 1)}))
+    assert (event_id, event) == (start + 4, 'reset')
+    assert [event_id for event_id, _, _ in read_sse_events(
+        client.get('/api/phones/stream', headers={'Last-Event-ID': str(start + 2)}))] == [start + 3, start + 4]
+
+    with patch('index.read_phone_changes', return_value=None):
+        [(event_id, event, _)] = read_sse_events(
+            client.get('/api/phones/stream', headers={'Last-Event-ID': str(start + 3)}))
+    assert (event_id, event) == (start + 4, 'reset')
+
+
+def test_phone_change_feed_serves_connects_from_polled_version():
+    """測試輪詢執行緒運作中時，新連線直接使用輪詢取得的版本，不查詢資料庫"""
+    import index
+
+    feed = index.PhoneChangeFeed(poll_interval=60)
+    with patch('index.read_catalog_version', return_value=7) as mock_read:
+        assert feed.current_version() == 7
+        feed._thread, feed.subscribers = object(), 1
+        assert feed.current_version() == 7
+        assert mock_read.call_count == 1
+        feed._polled_at -= 121
+        assert feed.current_version() == 7
+        assert mock_read.call_count == 2
+
+
+def test_phone_change_feed_wakes_waiting_streams():
+    """測試共用的變更通知在新版本出現時喚醒等待中的連線"""
+    import threading
+    import index
+
+    feed = index.PhoneChangeFeed(poll_interval=60)
+    feed.notify(5)
+    assert feed.wait(5, timeout=0.01) is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(feed.wait(5, timeout=5)))
+    waiter.start()
+    feed.notify(6)
+    waiter.join(timeout=5)
+    assert results == [6]
+
+    # 資料庫版本倒退時以資料庫的值為準，等待中的連線不會一直被喚醒
+    with patch('index.read_catalog_version', return_value=3):
+        assert feed.poll() == 3
+    assert feed.wait(6, timeout=0.01) == 3
+    assert feed.wait(3, timeout=0.01) is None
+
+
+def test_phone_stream_keeps_connection_open_when_configured(client, temp_phone_db, monkeypatch):
+    """測試設定連線保持時間時，串流會在等待期間送出新的變更"""
+    import index
+
+    monkeypatch.setattr(index, 'PHONE_STREAM_MAX_SECONDS', 0.5)
+    monkeypatch.setattr(index, 'PHONE_STREAM_HEARTBEAT_SECONDS', 0.1)
+    feed = index.PhoneChangeFeed(poll_interval=60)
+    monkeypatch.setattr(index, 'phone_change_feed', feed)
+    start = feed.poll()
+
+    stream = index.stream_phone_changes(start, start)
+    assert next(stream).startswith('retry:')
+    assert next(stream) == ': keep-alive\n\n'
+    monkeypatch.setattr(index, 'PHONES_WRITE_TOKEN', 'write-secret')
+    client.post('/api/phones', json=make_new_phone(), headers=WRITE_HEADERS)
+    assert next(stream).startswith(f'id: {start + 1}\nevent: change')
+    assert feed.subscribers == 1
+    stream.close()
+    assert feed.subscribers == 0
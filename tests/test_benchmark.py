@@ -0,0 +1,71 @@
+"""
+後端效能基準測試工具測試模組
+測試百分位數計算、基準比較與實際以 HTTP 量測應用程式
+"""
+import json
+import time
+from werkzeug.wrappers import Response
+
+import benchmark
+
+
+def slow_app(environ, start_response):
+    """測試用的 WSGI 應用程式，/slow 會延遲回應"""
+    if environ['PATH_INFO'] == '/slow':
+        time.sleep(0.01)
+    if environ['PATH_INFO'] == '/missing':
+        return Response('missing', status=404)(environ, start_response)
+    return Response('ok')(environ, start_response)
+
+
+def test_percentile_nearest_rank():
+    """測試最近排名法百分位數"""
+    values = [float(value) for value in range(1, 101)]
+    assert benchmark.percentile(values, 0.50) == 50.0
+    assert benchmark.percentile(values, 0.99) == 99.0
+    assert benchmark.percentile([3.0], 0.95) == 3.0
+    assert benchmark.percentile([], 0.5) == 0.0
+
+
+def test_run_benchmark_reports_each_route():
+    """測試以多執行緒伺服器量測每個路徑並統計錯誤"""
+    routes = [('fast', '/fast', {}), ('slow', '/slow', {}), ('missing', '/missing', {})]
+    results = benchmark.run_benchmark(slow_app, routes, requests=20, concurrency=4, warmup=2)
+
+    assert set(results) == {'fast', 'slow', 'missing'}
+    assert results['fast']['errors'] == 0
+    assert results['fast']['bytes'] == 40
+    assert results['slow']['p50_ms'] >= 10
+    assert results['slow']['p50_ms'] <= results['slow']['p95_ms'] <= results['slow']['p99_ms']
+    assert results['missing']['errors'] == 20
+
+
+def test_run_route_paces_requests_to_target_rate():
+    """測試指定速率時請求依排定時間送出"""
+    with benchmark.BenchmarkServer(slow_app) as server:
+        result = benchmark.run_route(server.host, server.port, '/fast', requests=10, concurrency=2, rps=100)
+    assert result['duration_s'] >= 0.09
+
+
+def test_compare_results_flags_regressions():
+    """測試超過容許範圍的延遲與吞吐量退步會被列出"""
+    baseline = {'routes': {'api': {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'rps': 500.0}}}
+    ok = {'api': {'errors': 0, 'p50_ms': 11.0, 'p95_ms': 24.0, 'p99_ms': 31.0, 'rps': 450.0}}
+    slow = {'api': {'errors': 0, 'p50_ms': 11.0, 'p95_ms': 40.0, 'p99_ms': 31.0, 'rps': 300.0}}
+
+    assert benchmark.compare_results(ok, baseline, tolerance=0.25) == []
+    regressions = benchmark.compare_results(slow, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('api: p95_ms')
+    # 低於最小差異的延遲變化視為雜訊
+    tiny = {'api': {'p50_ms': 0.1, 'p95_ms': 0.2, 'p99_ms': 0.3}}
+    noisy = {'api': {'errors': 0, 'p50_ms': 0.5, 'p95_ms': 0.9, 'p99_ms': 1.0, 'rps': 1.0}}
+    assert benchmark.compare_results(noisy, {'routes': tiny}) == []
+
+
+def test_stored_baseline_covers_default_routes():
+    """測試儲存的基準包含所有預設路徑的比較指標"""
+    with open(benchmark.DEFAULT_BASELINE_PATH, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    for name, _, _ in benchmark.DEFAULT_ROUTES:
+        assert set(baseline['routes'][name]) == set(benchmark.LATENCY_METRICS) | {benchmark.THROUGHPUT_METRIC}
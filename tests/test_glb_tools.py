@@ -0,0 +1,220 @@
+"""
+GLB 模型工具測試模組
+測試 GLB 解析、寫入與幾何最佳化功能
+"""
+import struct
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import glb_tools
+
+
+def build_quad_glb(with_unused_accessor=True):
+    """建立由兩個三角形組成、含重複頂點的測試用 GLB"""
+    positions = np.array([
+        [0, 0, 0], [1, 0, 0], [1, 1, 0],
+        [0, 0, 0], [1, 1, 0], [0, 1, 0],
+    ], dtype=np.float32)
+    normals = np.tile(np.array([[0, 0, 1]], dtype=np.float32), (6, 1))
+    uvs = positions[:, :2].copy()
+    unused = np.arange(12, dtype=np.float32)
+
+    bin_chunk = positions.tobytes() + normals.tobytes() + uvs.tobytes() + unused.tobytes()
+    views = [
+        {'buffer': 0, 'byteOffset': 0, 'byteLength': 72, 'target': 34962},
+        {'buffer': 0, 'byteOffset': 72, 'byteLength': 72, 'target': 34962},
+        {'buffer': 0, 'byteOffset': 144, 'byteLength': 48, 'target': 34962},
+        {'buffer': 0, 'byteOffset': 192, 'byteLength': 48},
+    ]
+    accessors = [
+        {'bufferView': 0, 'componentType': 5126, 'count': 6, 'type': 'VEC3',
+         'min': [0, 0, 0], 'max': [1, 1, 0]},
+        {'bufferView': 1, 'componentType': 5126, 'count': 6, 'type': 'VEC3'},
+        {'bufferView': 2, 'componentType': 5126, 'count': 6, 'type': 'VEC2'},
+    ]
+    if with_unused_accessor:
+        accessors.append({'bufferView': 3, 'componentType': 5126, 'count': 12, 'type': 'SCALAR'})
+    else:
+        views.pop()
+        bin_chunk = bin_chunk[:192]
+
+    gltf = {
+        'asset': {'version': '2.0'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'name': 'quad'}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0, 'NORMAL': 1, 'TEXCOORD_0': 2}}]}],
+        'accessors': accessors,
+        'bufferViews': views,
+        'buffers': [{'byteLength': len(bin_chunk)}],
+    }
+    return glb_tools.build_glb(gltf, bin_chunk)
+
+
+def test_build_and_parse_glb_roundtrip():
+    """測試 GLB 寫入後可正確解析"""
+    data = build_quad_glb()
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    assert magic == glb_tools.GLB_MAGIC
+    assert length == len(data)
+
+    gltf, bin_chunk = glb_tools.parse_glb(data)
+    positions = glb_tools.read_accessor(gltf, bin_chunk, 0)
+    assert positions.shape == (6, 3)
+
+
+def test_parse_glb_rejects_invalid_data():
+    """測試非 GLB 內容會引發錯誤"""
+    with pytest.raises(glb_tools.GLBError):
+        glb_tools.parse_glb(b'not a glb file at all')
+
+
+def test_optimize_glb_quantizes_and_dedupes():
+    """測試最佳化會量化屬性、合併重複頂點並移除未使用的 accessor"""
+    output, report = glb_tools.optimize_glb(build_quad_glb())
+    gltf, bin_chunk = glb_tools.parse_glb(output)
+
+    assert report['vertices_before'] == 6
+    assert report['vertices_after'] == 4
+    assert report['accessors_after'] == 4  # POSITION、NORMAL、TEXCOORD_0、indices
+    assert 'KHR_mesh_quantization' in gltf['extensionsRequired']
+
+    primitive = gltf['meshes'][0]['primitives'][0]
+    assert gltf['accessors'][primitive['attributes']['POSITION']]['componentType'] == glb_tools.SHORT
+    assert gltf['accessors'][primitive['attributes']['NORMAL']]['componentType'] == glb_tools.BYTE
+    assert gltf['accessors'][primitive['attributes']['TEXCOORD_0']]['componentType'] == glb_tools.UNSIGNED_SHORT
+
+    # 透過子節點的平移與縮放還原的位置應與原始位置相同
+    child = next(node for node in gltf['nodes'] if node.get('mesh') == 0)
+    positions = glb_tools.read_accessor_float(gltf, bin_chunk, primitive['attributes']['POSITION'])
+    indices = glb_tools.read_accessor(gltf, bin_chunk, primitive['indices']).ravel()
+    restored = positions[indices] * child['scale'][0] + np.array(child['translation'])
+    expected = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 0, 0], [1, 1, 0], [0, 1, 0]])
+    assert np.allclose(restored, expected, atol=1e-4)
+
+
+def test_optimize_glb_without_quantization_keeps_float():
+    """測試停用量化時保留浮點數格式"""
+    output, report = glb_tools.optimize_glb(build_quad_glb(False), quantize=False)
+    gltf, _ = glb_tools.parse_glb(output)
+    assert 'extensionsRequired' not in gltf
+    assert all(accessor['componentType'] in (glb_tools.FLOAT, glb_tools.UNSIGNED_SHORT)
+               for accessor in gltf['accessors'])
+    assert report['vertices_after'] == 4
+
+
+def test_decimate_glb_reduces_triangles():
+    """測試頂點叢集化會減少細分平面的三角形數"""
+    size = 20
+    grid = np.stack(np.meshgrid(np.linspace(0, 1, size), np.linspace(0, 1, size), indexing='ij'), axis=-1)
+    positions = np.concatenate([grid.reshape(-1, 2), np.zeros((size * size, 1))], axis=1).astype(np.float32)
+    quads = np.array([[i * size + j, (i + 1) * size + j, (i + 1) * size + j + 1, i * size + j + 1]
+                      for i in range(size - 1) for j in range(size - 1)])
+    indices = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]]).astype(np.uint32).ravel()
+
+    bin_chunk = positions.tobytes() + indices.tobytes()
+    gltf = {
+        'asset': {'version': '2.0'},
+        'nodes': [{'mesh': 0}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0}, 'indices': 1}]}],
+        'accessors': [
+            {'bufferView': 0, 'componentType': 5126, 'count': len(positions), 'type': 'VEC3',
+             'min': [0, 0, 0], 'max': [1, 1, 0]},
+            {'bufferView': 1, 'componentType': 5125, 'count': len(indices), 'type': 'SCALAR'},
+        ],
+        'bufferViews': [
+            {'buffer': 0, 'byteOffset': 0, 'byteLength': positions.nbytes},
+            {'buffer': 0, 'byteOffset': positions.nbytes, 'byteLength': indices.nbytes},
+        ],
+        'buffers': [{'byteLength': len(bin_chunk)}],
+    }
+    output, report = glb_tools.decimate_glb(glb_tools.build_glb(gltf, bin_chunk), resolution=4)
+    assert report['triangles_before'] == 2 * (size - 1) ** 2
+    assert 0 < report['triangles_after'] < report['triangles_before'] / 4
+
+    decimated, decimated_bin = glb_tools.parse_glb(output)
+    positions_after = glb_tools.read_accessor_float(decimated, decimated_bin, 0)
+    assert positions_after.min() >= 0 and positions_after.max() <= 1
+
+
+def test_ensure_lod_file_regenerates_only_when_source_changes(tmp_path):
+    """測試細節層級快取只在原始模型變更時重新產生"""
+    import os
+
+    source = tmp_path / 'quad.glb'
+    source.write_bytes(build_quad_glb())
+    cache_dir = tmp_path / 'lod'
+
+    lod_path = glb_tools.ensure_lod_file(str(source), 'low', str(cache_dir))
+    first_mtime = os.stat(lod_path).st_mtime_ns
+    assert glb_tools.ensure_lod_file(str(source), 'low', str(cache_dir)) == lod_path
+    assert glb_tools.is_lod_fresh(str(source), lod_path)
+
+    os.utime(source, ns=(first_mtime + 10**9, first_mtime + 10**9))
+    assert not glb_tools.is_lod_fresh(str(source), lod_path)
+    glb_tools.ensure_lod_file(str(source), 'low', str(cache_dir))
+    assert glb_tools.is_lod_fresh(str(source), lod_path)
+
+
+def test_ensure_lod_file_generates_once_for_concurrent_requests(tmp_path, monkeypatch):
+    """測試同一細節層級版本的並行請求只產生一次"""
+    import threading
+    import time
+
+    source = tmp_path / 'quad.glb'
+    source.write_bytes(build_quad_glb())
+    cache_dir = tmp_path / 'lod'
+    calls = []
+    generate_lod = glb_tools.generate_lod
+
+    def slow_generate(data, level):
+        calls.append(level)
+        time.sleep(0.05)
+        return generate_lod(data, level)
+
+    monkeypatch.setattr(glb_tools, 'generate_lod', slow_generate)
+    threads = [threading.Thread(target=glb_tools.ensure_lod_file, args=(str(source), 'low', str(cache_dir)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ['low']
+
+
+def test_ensure_lod_files_generates_every_level(tmp_path):
+    """測試預先產生目錄中所有模型的各細節層級版本"""
+    import os
+
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    (models_dir / 'quad.glb').write_bytes(build_quad_glb())
+    (models_dir / 'notes.txt').write_text('x')
+    cache_dir = tmp_path / 'lod'
+
+    assert glb_tools.ensure_lod_files(str(models_dir), str(cache_dir)) == {}
+    expected = {os.path.basename(glb_tools.get_lod_path(str(models_dir / 'quad.glb'), level, str(cache_dir)))
+                for level in glb_tools.LOD_LEVELS}
+    assert set(os.listdir(cache_dir)) == expected
+
+
+def test_summarize_glb_reads_json_chunk(tmp_path):
+    """測試只由 JSON 區塊取得模型統計與邊界"""
+    path = tmp_path / 'quad.glb'
+    path.write_bytes(build_quad_glb())
+
+    summary = glb_tools.summarize_glb(str(path))
+    assert summary['byte_size'] == path.stat().st_size
+    assert summary['meshes'] == 1
+    assert summary['triangles'] == 2
+    assert summary['vertices'] == 6
+    assert summary['bounding_box']['min'] == [0, 0, 0]
+    assert summary['bounding_box']['max'] == [1, 1, 0]
+
+
+def test_image_dimensions_png_header():
+    """測試由 PNG 檔頭讀取影像尺寸"""
+    header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 640, 480)
+    assert glb_tools.image_dimensions(header) == (640, 480)
+    assert glb_tools.image_dimensions(b'unknown') is None
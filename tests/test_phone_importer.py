@@ -0,0 +1,157 @@
+"""
+手機資料批次匯入測試模組
+測試 JSON / JSONL / CSV 串流解析與批次寫入功能
+"""
+import io
+import csv
+import json
+import sqlite3
+import pytest
+
+import phone_importer
+
+
+def make_phone(number):
+    """建立測試用手機資料"""
+    return {
+        'id': f'phone-{number}',
+        'name': f'測試手機 {number}',
+        'screen': '6.1吋',
+        'processor': 'A17',
+        'camera': '48MP',
+        'battery': '3000mAh',
+        'storage': '128GB',
+        'model_path': 'models/test.glb',
+        'special_features': '測試功能',
+    }
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """建立暫存的資料庫連線"""
+    connection = phone_importer.connect_for_import(str(tmp_path / 'phones.db'))
+    yield connection
+    connection.close()
+
+
+def test_json_array_streams_across_chunk_boundaries():
+    """測試 JSON 陣列中的物件跨越讀取區塊時仍能正確解析"""
+    phones = [make_phone(i) for i in range(50)]
+    f = io.StringIO(json.dumps(phones, ensure_ascii=False, indent=2))
+    assert list(phone_importer.iter_json_array(f, chunk_size=7)) == phones
+
+
+def test_json_array_rejects_truncated_input():
+    """測試不完整的 JSON 陣列會引發格式錯誤"""
+    f = io.StringIO(json.dumps([make_phone(1), make_phone(2)])[:-40])
+    with pytest.raises(phone_importer.ImportFormatError):
+        list(phone_importer.iter_json_array(f, chunk_size=16))
+
+
+def test_iter_records_detects_formats(tmp_path):
+    """測試依副檔名讀取 JSONL 與 CSV 檔案"""
+    phones = [make_phone(i) for i in range(3)]
+    jsonl_path = tmp_path / 'phones.jsonl'
+    jsonl_path.write_text('\n'.join(json.dumps(p, ensure_ascii=False) for p in phones) + '\n', encoding='utf-8')
+    csv_path = tmp_path / 'phones.csv'
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=phone_importer.PHONE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(phones)
+
+    assert list(phone_importer.iter_records(str(jsonl_path))) == phones
+    assert list(phone_importer.iter_records(str(csv_path))) == phones
+    with pytest.raises(phone_importer.ImportFormatError):
+        list(phone_importer.iter_records(str(tmp_path / 'phones.txt')))
+
+
+def test_import_phones_batches_and_builds_indexes(conn):
+    """測試批次匯入、略過無效資料並在載入後建立索引"""
+    records = [make_phone(i) for i in range(25)]
+    records.insert(10, {'id': 'broken'})
+    progress_calls = []
+
+    report = phone_importer.import_phones(conn, iter(records), batch_size=10,
+                                          progress=lambda rows, seconds: progress_calls.append(rows))
+
+    assert report['rows'] == 25
+    assert report['skipped'] == 1
+    assert report['batches'] == 3
+    assert '缺少欄位' in report['errors'][0]
+    assert progress_calls[-1] == 25
+    assert conn.execute('SELECT COUNT(*) FROM phones').fetchone()[0] == 25
+    index_names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {name for name, _ in phone_importer.PHONE_INDEXES} <= index_names
+
+
+def test_import_phones_replace_and_rollback(conn):
+    """測試取代既有資料，以及匯入失敗時整批回復"""
+    phone_importer.import_phones(conn, [make_phone(i) for i in range(5)])
+    phone_importer.import_phones(conn, [make_phone(100)], replace=True)
+    assert [row[0] for row in conn.execute('SELECT id FROM phones')] == ['phone-100']
+
+    def failing_records():
+        yield make_phone(200)
+        raise phone_importer.ImportFormatError('格式錯誤')
+
+    with pytest.raises(phone_importer.ImportFormatError):
+        phone_importer.import_phones(conn, failing_records(), batch_size=1, replace=True)
+    assert [row[0] for row in conn.execute('SELECT id FROM phones')] == ['phone-100']
+
+
+def test_import_phones_records_reset_change(conn):
+    """測試每次匯入在變更記錄中寫入一筆 reset，失敗的匯入不留下記錄"""
+    first = phone_importer.import_phones(conn, [make_phone(1)])
+    second = phone_importer.import_phones(conn, [make_phone(1), make_phone(2)])
+    assert second['catalog_version'] == first['catalog_version'] + 1
+
+    def failing_records():
+        yield make_phone(3)
+        raise phone_importer.ImportFormatError('格式錯誤')
+
+    with pytest.raises(phone_importer.ImportFormatError):
+        phone_importer.import_phones(conn, failing_records(), batch_size=1)
+    changes = conn.execute('SELECT version, phone_id, op FROM phone_changes ORDER BY version').fetchall()
+    # reset 取代之前的全部記錄，只保留最新的一筆
+    assert changes == [(second['catalog_version'], None, 'reset')]
+
+
+def test_main_imports_file(tmp_path, capsys):
+    """測試命令列匯入並輸出每秒筆數"""
+    source = tmp_path / 'phones.json'
+    source.write_text(json.dumps([make_phone(i) for i in range(3)], ensure_ascii=False), encoding='utf-8')
+    db_path = tmp_path / 'cli.db'
+
+    assert phone_importer.main([str(source), '--db', str(db_path)]) == 0
+    assert '匯入 3 筆' in capsys.readouterr().out
+    with sqlite3.connect(db_path) as check:
+        assert check.execute('SELECT COUNT(*) FROM phones').fetchone()[0] == 3
+
+
+def test_import_phones_parses_spec_columns(conn):
+    """測試匯入時解析數值規格，重新匯入時取代儲存容量選項"""
+    phone_importer.import_phones(conn, [{**make_phone(1), 'storage': '128 GB / 256 GB'}])
+    phone_importer.import_phones(conn, [{**make_phone(1), 'storage': '512 GB / 1 TB'}])
+
+    row = conn.execute('SELECT battery_mah, screen_inches, main_camera_mp FROM phones').fetchone()
+    assert row == (3000, 6.1, 48.0)
+    storage = conn.execute('SELECT storage_gb FROM phone_storage ORDER BY storage_gb').fetchall()
+    assert storage == [(512,), (1024,)]
+
+    conn.execute("DELETE FROM phones WHERE id = 'phone-1'")
+    assert conn.execute('SELECT COUNT(*) FROM phone_storage').fetchone()[0] == 0
+
+
+def test_write_phone_upserts_and_bumps_version(conn):
+    """測試單筆寫入沿用 UPSERT，更新時遞增資料版本並同步全文檢索與儲存容量"""
+    phone_importer.import_phones(conn, [make_phone(1)])
+    assert conn.execute('SELECT version FROM phones').fetchone()[0] == 1
+
+    conn.execute('BEGIN IMMEDIATE')
+    phone_importer.write_phone(conn, {**make_phone(1), 'name': '改名手機', 'storage': '256GB'})
+    conn.commit()
+
+    assert conn.execute('SELECT name, version FROM phones').fetchone() == ('改名手機', 2)
+    assert conn.execute("SELECT id FROM phones_fts JOIN phones ON phones.rowid = phones_fts.rowid "
+                        "WHERE phones_fts MATCH '改名手'").fetchall() == [('phone-1',)]
+    assert conn.execute('SELECT storage_gb FROM phone_storage').fetchall() == [(256,)]
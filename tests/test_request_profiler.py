@@ -0,0 +1,108 @@
+"""
+請求效能剖析測試模組
+測試剖析權杖、取樣、剖析檔案保留與彙整功能
+"""
+import os
+import time
+from werkzeug.test import Client, EnvironBuilder
+from werkzeug.wrappers import Response
+
+import request_profiler
+
+
+def wsgi_app(environ, start_response):
+    """測試用的 WSGI 應用程式"""
+    return Response('ok')(environ, start_response)
+
+
+def test_verify_token_checks_signature_path_and_expiry():
+    """測試權杖的簽章、路徑與有效期限驗證"""
+    token = request_profiler.sign_token('secret', '/api/phones', time.time() + 60)
+    assert request_profiler.verify_token('secret', '/api/phones', token)
+    assert not request_profiler.verify_token('other', '/api/phones', token)
+    assert not request_profiler.verify_token('secret', '/api/models', token)
+    assert not request_profiler.verify_token('secret', '/api/phones', token, now=time.time() + 120)
+    assert not request_profiler.verify_token('secret', '/api/phones', 'garbage')
+
+
+def test_middleware_profiles_signed_requests_only(tmp_path):
+    """測試只有帶有效權杖的請求會被剖析並寫入檔案"""
+    trigger = request_profiler.ProfileTrigger(secret='secret', sample_rate=0.0)
+    client = Client(request_profiler.ProfilingMiddleware(wsgi_app, str(tmp_path), trigger))
+
+    response = client.get('/api/phones')
+    assert response.get_data() == b'ok'
+    assert request_profiler.PROFILE_ID_HEADER not in response.headers
+    assert request_profiler.list_profiles(str(tmp_path)) == []
+
+    token = request_profiler.sign_token('secret', '/api/phones', time.time() + 60)
+    response = client.get('/api/phones', headers={'X-Profile-Token': token})
+    assert response.get_data() == b'ok'
+    profiles = request_profiler.list_profiles(str(tmp_path))
+    assert len(profiles) == 1
+    assert os.path.basename(profiles[0]).startswith(response.headers[request_profiler.PROFILE_ID_HEADER])
+
+
+def test_streaming_responses_are_not_buffered(tmp_path):
+    """測試 text/event-stream 回應不會被中介層完整讀取"""
+    produced = []
+
+    def stream_app(environ, start_response):
+        def events():
+            for i in range(3):
+                produced.append(i)
+                yield f'data: {i}\n\n'.encode('utf-8')
+        return Response(events(), mimetype='text/event-stream')(environ, start_response)
+
+    trigger = request_profiler.ProfileTrigger(sample_rate=1.0)
+    middleware = request_profiler.ProfilingMiddleware(stream_app, str(tmp_path), trigger)
+    headers = {}
+    app_iter = middleware(EnvironBuilder('/api/phones/stream').get_environ(),
+                          lambda status, response_headers, exc_info=None: headers.update(response_headers))
+    assert produced == []
+    assert request_profiler.PROFILE_ID_HEADER in headers
+    assert len(request_profiler.list_profiles(str(tmp_path))) == 1
+    assert next(iter(app_iter)) == b'data: 0\n\n'
+    assert produced == [0]
+    app_iter.close()
+
+
+def test_concurrent_requests_skip_profiling(tmp_path):
+    """測試已有請求在剖析時，其他請求不啟用剖析器"""
+    trigger = request_profiler.ProfileTrigger(sample_rate=1.0)
+    middleware = request_profiler.ProfilingMiddleware(wsgi_app, str(tmp_path), trigger)
+    client = Client(middleware)
+
+    with middleware._profile_lock:
+        response = client.get('/api/phones')
+    assert response.get_data() == b'ok'
+    assert request_profiler.PROFILE_ID_HEADER not in response.headers
+    assert request_profiler.list_profiles(str(tmp_path)) == []
+
+    assert request_profiler.PROFILE_ID_HEADER in client.get('/api/phones').headers
+
+
+def test_sampling_respects_path_prefixes_and_retention(tmp_path):
+    """測試取樣只套用於指定路徑，且剖析檔案數不超過上限"""
+    trigger = request_profiler.ProfileTrigger(sample_rate=1.0, path_prefixes=('/api/',))
+    client = Client(request_profiler.ProfilingMiddleware(wsgi_app, str(tmp_path), trigger, max_files=2))
+
+    client.get('/index.html')
+    assert request_profiler.list_profiles(str(tmp_path)) == []
+    for _ in range(4):
+        client.get('/api/phones')
+    assert len(request_profiler.list_profiles(str(tmp_path))) == 2
+
+
+def test_summary_cli(tmp_path, capsys):
+    """測試命令列彙整剖析檔案"""
+    trigger = request_profiler.ProfileTrigger(sample_rate=1.0)
+    client = Client(request_profiler.ProfilingMiddleware(wsgi_app, str(tmp_path), trigger))
+    client.get('/api/phones')
+    client.get('/api/models')
+
+    assert request_profiler.main(['summary', '--dir', str(tmp_path), '--match', 'api_phones']) == 0
+    output = capsys.readouterr().out
+    assert '彙整 1 個剖析檔案' in output
+    assert 'function calls' in output
+    assert request_profiler.main(['summary', '--dir', str(tmp_path / 'missing')]) == 1